@@ -14,7 +14,7 @@ from bs4 import BeautifulSoup
 
 import config
 from utils.validators import is_valid_url
-from utils.nlp_utils import extract_keywords, clean_text
+from utils.nlp_utils import extract_keywords, extract_keywords_many, clean_text
 
 class WebScraper:
     """
@@ -61,7 +61,7 @@ class WebScraper:
                 
             try:
                 self.logger.debug(f"Đang thu thập từ URL: {url}")
-                content = self._scrape_url(url)
+                content = self._fetch_page(url)
                 
                 if content:
                     self.logger.debug(f"Đã thu thập được nội dung từ URL: {url}")
@@ -73,6 +73,9 @@ class WebScraper:
             except Exception as e:
                 self.logger.error(f"Lỗi khi thu thập từ URL {url}: {e}")
         
+        # Trích xuất thực thể cho tất cả các trang trong một lô
+        self._annotate(results)
+        
         self.logger.info(f"Đã thu thập được {len(results)} thông tin từ web")
         return results
     
@@ -224,6 +227,34 @@ class WebScraper:
         """
         Thu thập nội dung từ một URL
         
+        Args:
+            url: URL cần thu thập
+            
+        Returns:
+            dict/None: Thông tin thu thập được hoặc None nếu thất bại
+        """
+        result = self._fetch_page(url)
+        if result:
+            self._annotate([result])
+        return result
+    
+    def _annotate(self, results: List[Dict[str, Any]]):
+        """
+        Thêm thực thể và mối quan hệ vào các trang đã tải, trích xuất từ khóa theo lô
+        
+        Args:
+            results: Các trang do _fetch_page trả về (được cập nhật tại chỗ)
+        """
+        texts = [result["title"] + " " + result["content"] for result in results]
+        for result, keywords in zip(results, extract_keywords_many(texts, max_keywords=20)):
+            entities = self._extract_math_entities(result["title"], result["content"], keywords)
+            result["entities"] = entities
+            result["relations"] = self._extract_math_relations(result["title"], result["content"], entities)
+    
+    def _fetch_page(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Tải và trích xuất nội dung từ một URL (chưa có thực thể và mối quan hệ)
+        
         Args:
             url: URL cần thu thập
             
@@ -262,9 +293,7 @@ class WebScraper:
                 "url": url,
                 "source": urlparse(url).netloc,
                 "timestamp": time.time(),
-                "confidence": 0.7,  # Mức độ tin cậy mặc định cho dữ liệu web
-                "entities": self._extract_math_entities(title, content),
-                "relations": self._extract_math_relations(title, content)
+                "confidence": 0.7  # Mức độ tin cậy mặc định cho dữ liệu web
             }
             
             return result
@@ -333,8 +362,9 @@ class WebScraper:
         
         return content
     
-    def _extract_math_entities(self, title: str, content: str) -> List[Dict[str, Any]]:
-        """Trích xuất các thực thể liên quan đến toán học từ nội dung"""
+    def _extract_math_entities(self, title: str, content: str,
+                               keywords: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Trích xuất các thực thể liên quan đến toán học từ nội dung (keywords: từ khóa đã trích xuất sẵn)"""
         entities = []
         
         # Các từ khóa toán học lớp 1
@@ -346,7 +376,8 @@ class WebScraper:
         ]
         
         # Trích xuất cụm từ khóa
-        keywords = extract_keywords(title + " " + content, max_keywords=20)
+        if keywords is None:
+            keywords = extract_keywords(title + " " + content, max_keywords=20)
         
         # Thêm các thực thể từ từ khóa trích xuất được
         for keyword in keywords:
@@ -378,12 +409,14 @@ class WebScraper:
         
         return entities
     
-    def _extract_math_relations(self, title: str, content: str) -> List[Dict[str, Any]]:
-        """Trích xuất các mối quan hệ toán học từ nội dung"""
+    def _extract_math_relations(self, title: str, content: str,
+                                entities: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Trích xuất các mối quan hệ toán học từ nội dung (entities: thực thể đã trích xuất sẵn)"""
         relations = []
         
         # Trích xuất các thực thể
-        entities = self._extract_math_entities(title, content)
+        if entities is None:
+            entities = self._extract_math_entities(title, content)
         
         # Tìm các mối quan hệ giữa các thực thể
         for i, entity1 in enumerate(entities):
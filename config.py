@@ -21,10 +21,101 @@ CACHE_DIR = os.path.join(DATA_DIR, "cache")
 
 # Thiết lập Knowledge Base
 KB_CONFIG = {
+    'backend': 'memory',           # 'memory' (NetworkX + file JSON), 'sqlite' hoặc 'sharded'
+    'sqlite_file': os.path.join(KNOWLEDGE_GRAPH_DIR, "knowledge_graph.db"),
+    'shard_dir': os.path.join(KNOWLEDGE_GRAPH_DIR, "shards"),
     'graph_file': os.path.join(KNOWLEDGE_GRAPH_DIR, "knowledge_graph.json"),
+    'binary_graph_file': os.path.join(KNOWLEDGE_GRAPH_DIR, "knowledge_graph.kgb"),
+    'snapshot_format': 'json',     # 'json' hoặc 'binary' (tải nhanh hơn, file .kgb)
     'initial_knowledge': os.path.join(KNOWLEDGE_GRAPH_DIR, "initial_knowledge.json"),
+    # Kiến thức khởi tạo: các file seed (JSON hoặc JSONL) được nạp khi khởi động nếu nội dung thay đổi
+    'seed_files': [
+        os.path.join(KNOWLEDGE_GRAPH_DIR, "initial_data.json"),
+        os.path.join(KNOWLEDGE_GRAPH_DIR, "initial_knowledge.json")
+    ],
+    'seed_state_file': os.path.join(KNOWLEDGE_GRAPH_DIR, "seed_state.json"),
+    'seed_chunk_size': 500,        # Số bản ghi mỗi lô khi nạp seed
+    'bootstrap_on_start': True,
+    'import_chunk_size': 1000,     # Số bản ghi mỗi lô khi nhập file JSONL (kb import)
+    # Nhật ký lần cuối mỗi node được trả về trong kết quả truy vấn (dùng khi nén KB)
+    'access_log_file': os.path.join(KNOWLEDGE_GRAPH_DIR, "access_log.json"),
+    # Nén KB (kb compact): gộp/xóa node ngữ cảnh và xóa node độ tin cậy thấp không được dùng
+    'compaction': {
+        'context_ttl_days': 30,        # Node ngữ cảnh không được truy vấn/cập nhật trong thời gian này bị xóa
+        'node_ttl_days': 90,           # Tuổi tối thiểu của node độ tin cậy thấp trước khi bị xóa
+        'confidence_floor': 0.7,       # Node có độ tin cậy dưới mức này là ứng viên xóa
+        'protected_origins': ['seed'], # Node có origin thuộc danh sách này không bao giờ bị xóa
+        'merge_contexts': True,        # Gộp các node ngữ cảnh có cùng tập từ (khác dấu câu, hoa thường)
+        'auto_every_learns': 0         # Engine tự nén sau mỗi N lần học (0 để tắt)
+    },
     'max_results': 10,
-    'similarity_threshold': 0.5
+    # Độ liên quan tối thiểu của kết quả truy vấn; độ liên quan được quy theo kết quả đứng đầu
+    # nên ngưỡng cao sẽ cắt các node phụ (ví dụ, kiến thức liên quan) chỉ vì chúng xếp sau
+    'similarity_threshold': 0.1,
+    # Xếp hạng BM25 theo trường cho truy vấn
+    'bm25_k1': 1.2,                # Mức bão hòa tần suất từ
+    'bm25_b': 0.75,                # Mức chuẩn hóa theo độ dài trường
+    'field_weights': {'id': 1.0, 'name': 1.0, 'description': 0.8, 'content': 0.6, 'other': 0.5},
+    'query_cache_size': 256,       # Số kết quả truy vấn được đệm (LRU), 0 để tắt
+    'traversal_max_nodes': 5000,   # Số node tối đa một lần duyệt đồ thị được thăm
+    # Khung nhìn CSR được vá theo thay đổi cấu trúc cho tới khi số thay đổi chờ vượt
+    # tỉ lệ này của số edge (tối thiểu 256), sau đó dựng lại từ đầu; 0 để luôn dựng lại
+    'csr_patch_ratio': 0.25,
+    'retrieval_mode': 'keyword',   # 'keyword' hoặc 'spreading' (lan truyền qua các quan hệ)
+    # Lan truyền kích hoạt: hạt giống từ khớp từ khóa, lan k bước qua ma trận kề có trọng số
+    'spreading': {
+        'hops': 2,
+        'decay': 0.5,              # Hệ số suy giảm mỗi bước
+        'seed_count': 50,          # Số node khớp từ khóa dùng làm hạt giống
+        'direction': 'both',       # Lan theo chiều edge ('out'), ngược chiều ('in') hoặc cả hai
+        'relation_weights': {
+            'prerequisite_for': 0.8,
+            'example_of': 0.7,
+            'solution_for': 0.7,
+            'formula_for': 0.7,
+            'visualization_of': 0.5,
+            'contains': 0.4,
+            'related_to': 0.3
+        },
+        'default_relation_weight': 0.2,
+        'expand_in_reasoner': True  # Reasoner bổ sung ví dụ và kiến thức tiên quyết liên quan
+    },
+    # Snapshot phẳng chỉ đọc (mảng .npy dùng qua mmap) cho nhiều process worker
+    'mmap_snapshot': {
+        'dir': os.path.join(KNOWLEDGE_GRAPH_DIR, "mmap"),
+        'keep': 2,                 # Số phiên bản giữ lại (worker có thể còn dùng phiên bản trước)
+        'publish_on_learn': False  # Engine công bố phiên bản mới sau mỗi lần học
+    },
+    # Backend 'sharded': mỗi chủ đề của MATH_CATEGORIES là một shard, tải khi cần
+    'sharding': {
+        'max_loaded_nodes': 50000,  # Giải phóng shard ít dùng khi số node đã tải vượt mức này
+        'default_shard': 'general', # Shard cho node không thuộc chủ đề nào
+        'lookup_buckets': 64,       # Số file của mỗi bảng tra cứu node/token (chỉ dùng khi tạo thư mục shard mới)
+        # Cụm từ khóa để xếp node vào chủ đề (ngoài tên chủ đề và chủ đề con)
+        'category_keywords': {
+            'counting': ['đếm', 'số thứ tự', 'dãy số', 'liền trước', 'liền sau', 'count'],
+            'operations': ['phép cộng', 'phép trừ', 'phép nhân', 'phép chia', 'cộng', 'trừ', 'nhân', 'chia',
+                           'tổng', 'hiệu', 'tích', 'thương', 'plus', 'minus', 'times', 'divide',
+                           'multiplication', 'division'],
+            'comparison': ['so sánh', 'lớn hơn', 'bé hơn', 'nhỏ hơn', 'bằng nhau'],
+            'place_value': ['hàng đơn vị', 'hàng chục', 'hàng trăm', 'chữ số'],
+            'measurement': ['đo', 'độ dài', 'cân nặng', 'đồng hồ', 'giờ', 'phút', 'tiền',
+                            'cm', 'mét', 'kg', 'lít'],
+            'geometry': ['hình vuông', 'hình tròn', 'hình tam giác', 'hình chữ nhật', 'tam giác',
+                         'khối', 'hình dạng', 'quy luật', 'shape', 'pattern']
+        }
+    },
+    # Chế độ journal: ghi nối từng thay đổi thay vì ghi lại toàn bộ đồ thị mỗi lần lưu
+    'journal_mode': False,
+    'journal_file': os.path.join(KNOWLEDGE_GRAPH_DIR, "knowledge_graph.journal"),
+    'journal_fsync_batch': 50,     # Số bản ghi tối đa trước mỗi lần fsync
+    'checkpoint_interval': 500,    # Số thay đổi giữa hai lần ghi snapshot đầy đủ
+    # Backup dạng delta nén gzip và chính sách lưu giữ
+    'backup_enabled': True,
+    'backup_dir': os.path.join(KNOWLEDGE_GRAPH_DIR, "backups"),
+    'backup_keep_last': 5,         # Luôn giữ N backup gần nhất
+    'backup_keep_hourly': 24,      # Giữ một backup mỗi giờ trong N giờ gần nhất
+    'backup_keep_daily': 7         # Giữ một backup mỗi ngày trong N ngày gần nhất
 }
 
 # Thiết lập Web Scraper
@@ -75,6 +166,18 @@ INFO_COLLECTOR_CONFIG = {
     'timeout': 30
 }
 
+# Thiết lập xử lý ngôn ngữ tự nhiên
+NLP_CONFIG = {
+    # 'spacy', 'nltk', 'vi' (bộ tách từ tiếng Việt), 'regex' hoặc 'auto' (spacy nếu có mô hình, nếu không thì vi)
+    'backend': 'auto',
+    'nltk_download': False,        # Tự tải dữ liệu NLTK còn thiếu khi dùng lần đầu (cần mạng)
+    'spacy_models': ['vi_core_news_sm', 'en_core_web_sm'],  # Thử lần lượt, dùng mô hình đầu tiên tải được
+    'warmup_on_start': False,      # Tải mô hình khi khởi động engine thay vì ở truy vấn đầu tiên
+    'pipe_batch_size': 64,         # Số văn bản mỗi lô khi xử lý hàng loạt (nlp.pipe)
+    'pipe_n_process': 1,           # Số process cho nlp.pipe (>1 để song song hóa khi nạp dữ liệu lớn)
+    'keyword_cache_size': 4096     # Số kết quả extract_keywords được đệm (LRU), 0 để tắt
+}
+
 # Cấu trúc tri thức toán học lớp 1
 MATH_CATEGORIES = {
     "counting": ["count_objects", "number_sequence", "before_after"],
@@ -7,10 +7,15 @@ import time
 import re
 from typing import Dict, Any, List, Tuple
 
-from core.knowledge_base import KnowledgeBase
+from core.knowledge_base import create_knowledge_base
+from core.kb_bootstrap import bootstrap_knowledge
+from core.kb_mmap import publish_snapshot
+from core.kb_compaction import Compactor
 from core.learner import Learner
 from core.reasoner import Reasoner
 from collectors.collector import InformationCollector
+from utils.nlp_pipeline import warmup_backends
+from utils.nlp_utils import keyword_cache_stats
 import config
 
 class AGIEngine:
@@ -21,7 +26,15 @@ class AGIEngine:
         self.logger = logging.getLogger("AGIEngine")
         
         # Khởi tạo Knowledge Base
-        self.kb = KnowledgeBase()
+        self.kb = create_knowledge_base()
+        
+        # Nạp kiến thức khởi tạo (bỏ qua các file seed không đổi từ lần nạp trước)
+        if config.KB_CONFIG.get('bootstrap_on_start', True):
+            bootstrap_knowledge(self.kb)
+        
+        # Nạp trước backend NLP để truy vấn đầu tiên không phải chờ
+        if config.NLP_CONFIG.get('warmup_on_start', False):
+            warmup_backends()
         
         # Khởi tạo Learner
         self.learner = Learner(self.kb)
@@ -32,8 +45,31 @@ class AGIEngine:
         # Khởi tạo Information Collector
         self.collector = InformationCollector()
         
+        # Số lần học thành công, dùng để tự nén KB định kỳ
+        self._learn_count = 0
+        
         self.logger.info("AGI Engine đã được khởi tạo")
     
+    def _publish_snapshot(self):
+        """Công bố snapshot chỉ đọc cho các process worker sau khi học (nếu được bật)"""
+        if not config.KB_CONFIG.get('mmap_snapshot', {}).get('publish_on_learn', False):
+            return
+        try:
+            publish_snapshot(self.kb)
+        except Exception as e:
+            self.logger.error(f"Không thể công bố snapshot: {e}")
+    
+    def _maybe_compact(self):
+        """Nén KB sau mỗi KB_CONFIG['compaction']['auto_every_learns'] lần học (nếu được bật)"""
+        self._learn_count += 1
+        every = config.KB_CONFIG.get('compaction', {}).get('auto_every_learns', 0)
+        if not every or self._learn_count % every:
+            return
+        try:
+            Compactor(self.kb).run()
+        except Exception as e:
+            self.logger.error(f"Không thể nén KB: {e}")
+    
     def process_request(self, request):
         """
         Xử lý yêu cầu từ người dùng
@@ -69,7 +105,9 @@ class AGIEngine:
                 # 3. Tích hợp thông tin mới vào KB
                 if new_info:
                     self.logger.info(f"Học {len(new_info) if isinstance(new_info, list) else 1} thông tin mới")
-                    self.learner.learn(new_info, request)
+                    if self.learner.learn(new_info, request):
+                        self._maybe_compact()
+                        self._publish_snapshot()
                     # Truy vấn lại KB sau khi học
                     kb_results = self.kb.query(request)
                     self.logger.debug(f"Sau khi học, tìm được {len(kb_results)} kết quả từ KB")
@@ -194,22 +232,18 @@ class AGIEngine:
         Returns:
             dict: Thông tin thống kê
         """
-        return {
-            "nodes": len(self.kb.graph.nodes),
-            "edges": len(self.kb.graph.edges),
-            "types": self._count_node_types()
-        }
+        with self.kb.reading():
+            return {
+                "nodes": len(self.kb.graph.nodes),
+                "edges": len(self.kb.graph.edges),
+                "types": self._count_node_types(),
+                "query_cache": self.kb.cache_stats(),
+                "keyword_cache": keyword_cache_stats()
+            }
     
     def _count_node_types(self):
         """Đếm số lượng node theo từng loại"""
-        type_count = {}
-        for _, attrs in self.kb.graph.nodes(data=True):
-            node_type = attrs.get("type", "unknown")
-            if node_type in type_count:
-                type_count[node_type] += 1
-            else:
-                type_count[node_type] = 1
-        return type_count
+        return self.kb.count_node_types()
     
     def _generate_math_visualization(self, operation, numbers, result):
         """
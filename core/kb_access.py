@@ -0,0 +1,115 @@
+"""
+KB Access - Ghi nhận thời điểm các node được trả về trong kết quả truy vấn
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+class AccessLog:
+    """
+    Nhật ký truy cập node: lần cuối và số lần mỗi node nằm trong kết quả truy vấn.
+
+    Được cập nhật trong bộ nhớ trên đường truy vấn (chỉ giữ một khóa nhỏ của riêng
+    nhật ký) và ghi xuống file khi knowledge base lưu. Thời điểm bắt đầu ghi nhận
+    (since) cho biết node "chưa từng được truy vấn" là tính từ lúc nào.
+    """
+
+    def __init__(self, path: str):
+        """
+        Khởi tạo nhật ký, đọc file nếu đã có
+
+        Args:
+            path: File lưu nhật ký
+        """
+        self.logger = logging.getLogger("AccessLog")
+        self.path = path
+        self._lock = threading.Lock()
+        # node -> [lần truy cập cuối (ISO 8601), số lần]
+        self._entries: Dict[str, list] = {}
+        self.since = datetime.now().isoformat()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            # Lưu ngay để thời điểm bắt đầu ghi nhận không bị dời sau mỗi lần khởi động
+            self._dirty = True
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.since = data.get("since", self.since)
+            self._entries = {node_id: list(entry) for node_id, entry in data.get("nodes", {}).items()}
+        except Exception as e:
+            self.logger.warning(f"Không đọc được nhật ký truy cập {self.path}: {e}")
+            self._dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def touch(self, node_ids: Iterable[str]):
+        """
+        Ghi nhận các node vừa được trả về
+
+        Args:
+            node_ids: ID của các node
+        """
+        stamp = datetime.now().isoformat()
+        with self._lock:
+            for node_id in node_ids:
+                entry = self._entries.get(node_id)
+                if entry is None:
+                    self._entries[node_id] = [stamp, 1]
+                else:
+                    entry[0] = stamp
+                    entry[1] += 1
+            self._dirty = True
+
+    def last_access(self, node_id: str) -> Optional[str]:
+        """Lần cuối node được trả về (None nếu chưa từng)"""
+        entry = self._entries.get(node_id)
+        return entry[0] if entry else None
+
+    def count(self, node_id: str) -> int:
+        """Số lần node được trả về"""
+        entry = self._entries.get(node_id)
+        return entry[1] if entry else 0
+
+    def merge(self, source: str, target: str):
+        """Chuyển lịch sử truy cập của node source sang node target (khi gộp node)"""
+        with self._lock:
+            entry = self._entries.pop(source, None)
+            if entry is None:
+                return
+            current = self._entries.get(target)
+            if current is None:
+                self._entries[target] = entry
+            else:
+                current[0] = max(current[0], entry[0])
+                current[1] += entry[1]
+            self._dirty = True
+
+    def forget(self, node_ids: Iterable[str]):
+        """Bỏ lịch sử truy cập của các node đã bị xóa"""
+        with self._lock:
+            for node_id in node_ids:
+                if self._entries.pop(node_id, None) is not None:
+                    self._dirty = True
+
+    def flush(self):
+        """Ghi nhật ký xuống file nếu có thay đổi (ghi file tạm rồi đổi tên)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"since": self.since, "nodes": self._entries}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except Exception as e:
+                self.logger.error(f"Không ghi được nhật ký truy cập {self.path}: {e}")
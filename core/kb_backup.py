@@ -0,0 +1,325 @@
+"""
+KB Backup - Quản lý backup dạng delta nén và chính sách lưu giữ cho đồ thị kiến thức
+"""
+
+import os
+import re
+import gzip
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import networkx as nx
+
+STAMP_FORMAT = "%Y%m%d_%H%M%S"
+BACKUP_PATTERN = re.compile(r"^kg_(\d{8}_\d{6})\.delta\.json\.gz$")
+
+def graph_state(graph: nx.DiGraph) -> Dict:
+    """
+    Chuyển đồ thị thành trạng thái dạng dictionary để so sánh
+
+    Args:
+        graph: Đồ thị cần chuyển
+
+    Returns:
+        dict: {"nodes": {id: attrs}, "edges": {(u, v): attrs}}
+    """
+    return {
+        "nodes": {node: dict(attrs) for node, attrs in graph.nodes(data=True)},
+        "edges": {(u, v): dict(attrs) for u, v, attrs in graph.edges(data=True)}
+    }
+
+def diff_states(new: Dict, old: Dict) -> Dict:
+    """
+    Tạo delta biến trạng thái new thành trạng thái old
+
+    Mọi edge bị xóa đều được liệt kê tường minh (kể cả edge của node bị xóa)
+    để các delta có thể gộp với nhau một cách chính xác.
+
+    Args:
+        new: Trạng thái xuất phát
+        old: Trạng thái đích
+
+    Returns:
+        dict: Delta gồm nodes_set, nodes_del, edges_set, edges_del
+    """
+    new_nodes, old_nodes = new["nodes"], old["nodes"]
+    new_edges, old_edges = new["edges"], old["edges"]
+
+    return {
+        "nodes_set": {n: attrs for n, attrs in old_nodes.items() if new_nodes.get(n) != attrs},
+        "nodes_del": [n for n in new_nodes if n not in old_nodes],
+        "edges_set": [[u, v, attrs] for (u, v), attrs in old_edges.items() if new_edges.get((u, v)) != attrs],
+        "edges_del": [[u, v] for (u, v) in new_edges if (u, v) not in old_edges]
+    }
+
+def diff_graphs(new: nx.DiGraph, old: nx.DiGraph, nodes: Optional[Iterable] = None,
+                edges: Iterable[Tuple] = ()) -> Dict:
+    """
+    Tạo delta biến đồ thị new thành đồ thị old như diff_states, nhưng chỉ so sánh các
+    node/edge có thể đã thay đổi thay vì chuyển cả hai đồ thị thành trạng thái
+
+    Args:
+        new: Đồ thị xuất phát
+        old: Đồ thị đích
+        nodes: Các node có thể đã thay đổi (None: so sánh toàn bộ đồ thị)
+        edges: Các edge (u, v) có thể đã thay đổi; edge nối với node trong nodes luôn được xét
+
+    Returns:
+        dict: Delta gồm nodes_set, nodes_del, edges_set, edges_del
+    """
+    if nodes is None:
+        return diff_states(graph_state(new), graph_state(old))
+
+    # dict giữ thứ tự và bỏ trùng
+    nodes = dict.fromkeys(nodes)
+    edges = dict.fromkeys(edges)
+    # Thêm hoặc xóa node kéo theo các edge nối với nó
+    for node in nodes:
+        for graph in (new, old):
+            if node in graph:
+                edges.update(dict.fromkeys((node, target) for target in graph.successors(node)))
+                edges.update(dict.fromkeys((source, node) for source in graph.predecessors(node)))
+
+    delta = {"nodes_set": {}, "nodes_del": [], "edges_set": [], "edges_del": []}
+    for node in nodes:
+        if node in old:
+            attrs = old.nodes[node]
+            if node not in new or new.nodes[node] != attrs:
+                delta["nodes_set"][node] = dict(attrs)
+        elif node in new:
+            delta["nodes_del"].append(node)
+
+    for u, v in edges:
+        if old.has_edge(u, v):
+            attrs = old[u][v]
+            if not new.has_edge(u, v) or new[u][v] != attrs:
+                delta["edges_set"].append([u, v, dict(attrs)])
+        elif new.has_edge(u, v):
+            delta["edges_del"].append([u, v])
+    return delta
+
+def apply_delta(graph: nx.DiGraph, delta: Dict):
+    """
+    Áp dụng delta lên đồ thị (thay đổi trực tiếp)
+
+    Args:
+        graph: Đồ thị cần áp dụng
+        delta: Delta tạo bởi diff_states hoặc compose_deltas
+    """
+    for u, v in delta.get("edges_del", []):
+        if graph.has_edge(u, v):
+            graph.remove_edge(u, v)
+
+    for node in delta.get("nodes_del", []):
+        if node in graph:
+            graph.remove_node(node)
+
+    for node, attrs in delta.get("nodes_set", {}).items():
+        graph.add_node(node)
+        graph.nodes[node].clear()
+        graph.nodes[node].update(attrs)
+
+    for u, v, attrs in delta.get("edges_set", []):
+        if u in graph and v in graph:
+            graph.add_edge(u, v)
+            graph[u][v].clear()
+            graph[u][v].update(attrs)
+
+def compose_deltas(first: Dict, second: Dict) -> Dict:
+    """
+    Gộp hai delta thành một delta tương đương với áp dụng first rồi second
+
+    Args:
+        first: Delta áp dụng trước
+        second: Delta áp dụng sau
+
+    Returns:
+        dict: Delta đã gộp
+    """
+    nodes_set = dict(first.get("nodes_set", {}))
+    nodes_del = set(first.get("nodes_del", []))
+    for node in second.get("nodes_del", []):
+        nodes_set.pop(node, None)
+        nodes_del.add(node)
+    for node, attrs in second.get("nodes_set", {}).items():
+        nodes_set[node] = attrs
+        nodes_del.discard(node)
+
+    edges_set = {(u, v): attrs for u, v, attrs in first.get("edges_set", [])}
+    edges_del = {(u, v) for u, v in first.get("edges_del", [])}
+    for u, v in second.get("edges_del", []):
+        edges_set.pop((u, v), None)
+        edges_del.add((u, v))
+    for u, v, attrs in second.get("edges_set", []):
+        edges_set[(u, v)] = attrs
+        edges_del.discard((u, v))
+
+    return {
+        "nodes_set": nodes_set,
+        "nodes_del": sorted(nodes_del),
+        "edges_set": [[u, v, attrs] for (u, v), attrs in edges_set.items()],
+        "edges_del": [[u, v] for (u, v) in sorted(edges_del)]
+    }
+
+class BackupManager:
+    """
+    Quản lý backup của đồ thị kiến thức dưới dạng delta ngược nén gzip.
+
+    Mỗi backup kg_<stamp>.delta.json.gz biến trạng thái ngay sau nó (backup mới hơn
+    hoặc snapshot hiện tại) thành trạng thái của đồ thị trước lần lưu tại thời điểm stamp.
+    Khôi phục một thời điểm bằng cách áp dụng lần lượt các delta từ mới đến cũ.
+    """
+
+    def __init__(self, backup_dir: str, keep_last: int = 5, keep_hourly: int = 24, keep_daily: int = 7):
+        """
+        Khởi tạo backup manager
+
+        Args:
+            backup_dir: Thư mục lưu backup
+            keep_last: Số backup gần nhất luôn được giữ
+            keep_hourly: Số giờ gần nhất được giữ một backup mỗi giờ
+            keep_daily: Số ngày gần nhất được giữ một backup mỗi ngày
+        """
+        self.logger = logging.getLogger("BackupManager")
+        self.backup_dir = backup_dir
+        self.keep_last = keep_last
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+    def list_backups(self) -> List[str]:
+        """
+        Liệt kê các thời điểm backup hiện có
+
+        Returns:
+            list: Các stamp (YYYYMMDD_HHMMSS) sắp xếp từ cũ đến mới
+        """
+        stamps = []
+        for filename in os.listdir(self.backup_dir):
+            match = BACKUP_PATTERN.match(filename)
+            if match:
+                stamps.append(match.group(1))
+        return sorted(stamps)
+
+    def create(self, current: Dict, previous: Dict, stamp: Optional[str] = None) -> Optional[str]:
+        """
+        Tạo backup cho trạng thái previous khi nó bị thay bằng current
+
+        Args:
+            current: Trạng thái sắp được ghi làm snapshot
+            previous: Trạng thái của snapshot đang có trên đĩa
+            stamp: Thời điểm backup (mặc định: hiện tại)
+
+        Returns:
+            str/None: Stamp của backup đã tạo, None nếu không có thay đổi
+        """
+        return self.create_delta(diff_states(current, previous), stamp)
+
+    def create_delta(self, delta: Dict, stamp: Optional[str] = None) -> Optional[str]:
+        """
+        Tạo backup từ delta ngược đã tính sẵn (xem diff_graphs)
+
+        Args:
+            delta: Delta biến snapshot sắp ghi thành snapshot đang có trên đĩa
+            stamp: Thời điểm backup (mặc định: hiện tại)
+
+        Returns:
+            str/None: Stamp của backup đã tạo, None nếu delta rỗng
+        """
+        stamp = stamp or datetime.now().strftime(STAMP_FORMAT)
+        if not any(delta.values()):
+            self.logger.debug("Snapshot không thay đổi, bỏ qua backup")
+            return None
+
+        # Trùng stamp: gộp với backup cũ hơn cùng stamp để không mất chuỗi delta
+        if stamp in self.list_backups():
+            delta = compose_deltas(delta, self._read(stamp))
+
+        self._write(stamp, delta)
+        self.logger.debug(f"Đã tạo backup delta {stamp}")
+        self.prune()
+        return stamp
+
+    def restore(self, stamp: str, current_graph: nx.DiGraph) -> nx.DiGraph:
+        """
+        Dựng lại đồ thị tại một thời điểm backup
+
+        Args:
+            stamp: Thời điểm backup cần khôi phục
+            current_graph: Đồ thị của snapshot hiện tại
+
+        Returns:
+            networkx.DiGraph: Đồ thị tại thời điểm stamp
+        """
+        stamps = self.list_backups()
+        if stamp not in stamps:
+            raise ValueError(f"Không tìm thấy backup: {stamp}")
+
+        graph = current_graph.copy()
+        for s in reversed(stamps):
+            if s < stamp:
+                break
+            apply_delta(graph, self._read(s))
+
+        return graph
+
+    def prune(self) -> List[str]:
+        """
+        Xóa các backup nằm ngoài chính sách lưu giữ.
+        Delta của backup bị xóa được gộp vào backup cũ hơn liền kề để chuỗi không bị đứt.
+
+        Returns:
+            list: Các stamp đã bị xóa
+        """
+        stamps = self.list_backups()
+        keep = self._select_retained(stamps)
+
+        removed = []
+        # Duyệt từ mới đến cũ để gộp delta vào backup cũ hơn liền kề
+        for i in range(len(stamps) - 1, -1, -1):
+            stamp = stamps[i]
+            if stamp in keep:
+                continue
+
+            if i > 0:
+                older = stamps[i - 1]
+                self._write(older, compose_deltas(self._read(stamp), self._read(older)))
+            os.remove(self._path(stamp))
+            removed.append(stamp)
+
+        if removed:
+            self.logger.info(f"Đã xóa {len(removed)} backup ngoài chính sách lưu giữ")
+        return removed
+
+    def _select_retained(self, stamps: List[str]) -> set:
+        """Chọn các backup được giữ: N gần nhất, mới nhất mỗi giờ và mới nhất mỗi ngày"""
+        keep = set(stamps[-self.keep_last:]) if self.keep_last > 0 else set()
+
+        for bucket_len, limit in ((11, self.keep_hourly), (8, self.keep_daily)):
+            buckets = set()
+            for stamp in reversed(stamps):
+                bucket = stamp[:bucket_len]
+                if bucket in buckets:
+                    continue
+                if len(buckets) >= limit:
+                    break
+                buckets.add(bucket)
+                keep.add(stamp)
+
+        return keep
+
+    def _path(self, stamp: str) -> str:
+        return os.path.join(self.backup_dir, f"kg_{stamp}.delta.json.gz")
+
+    def _read(self, stamp: str) -> Dict:
+        with gzip.open(self._path(stamp), 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, stamp: str, delta: Dict):
+        tmp_path = self._path(stamp) + ".tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(delta, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self._path(stamp))
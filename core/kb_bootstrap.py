@@ -0,0 +1,336 @@
+"""
+KB Bootstrap - Nạp kiến thức khởi tạo từ các file seed vào Knowledge Base
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import config
+from utils.graph_utils import create_node_id
+from utils.validators import validate_entity, validate_relation
+
+logger = logging.getLogger("KBBootstrap")
+
+# Kích thước mỗi lần đọc file seed
+READ_SIZE = 64 * 1024
+
+# Các mảng được đọc từ file seed JSON và loại bản ghi tương ứng
+SEED_SECTIONS = {"entities": "entity", "relations": "relation"}
+
+_decoder = json.JSONDecoder()
+
+class SeedFormatError(Exception):
+    """Lỗi khi file seed không đúng định dạng"""
+    pass
+
+class _JSONStream:
+    """Bộ đọc JSON tăng dần: giữ một phần nhỏ của file trong bộ đệm và giải mã từng giá trị"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Đọc thêm dữ liệu vào bộ đệm, bỏ phần đã xử lý. Trả về False nếu đã hết file"""
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Ký tự khác khoảng trắng kế tiếp (chuỗi rỗng nếu hết file)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Đọc một ký tự cấu trúc thuộc chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise SeedFormatError(f"Cần một trong '{chars}' nhưng gặp '{char or 'EOF'}'")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Giải mã giá trị JSON kế tiếp, đọc thêm từ file cho đến khi giá trị hoàn chỉnh"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # Số hoặc literal ở cuối bộ đệm có thể còn tiếp ở phần chưa đọc
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise SeedFormatError(f"JSON không hợp lệ: {e}") from e
+            self._fill()
+
+    def array(self) -> Iterator[Any]:
+        """Giải mã lần lượt các phần tử của một mảng JSON"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+def iter_seed_records(path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Đọc lần lượt các bản ghi của một file seed mà không nạp toàn bộ file vào bộ nhớ
+
+    Hỗ trợ hai định dạng:
+    - JSON: {"entities": [...], "relations": [...]} (các khóa khác được bỏ qua)
+    - JSONL (.jsonl): mỗi dòng một thực thể, hoặc một quan hệ nếu có trường relation_type
+
+    Args:
+        path: Đường dẫn file seed
+
+    Yields:
+        tuple: ('entity' hoặc 'relation', bản ghi)
+
+    Raises:
+        SeedFormatError: Nếu file không đúng định dạng
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".jsonl"):
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise SeedFormatError(f"{path}:{line_no}: {e}") from e
+                yield ("relation" if isinstance(record, dict) and "relation_type" in record else "entity"), record
+            return
+
+        stream = _JSONStream(f)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key in SEED_SECTIONS and stream.peek() == "[":
+                for record in stream.array():
+                    yield SEED_SECTIONS[key], record
+            else:
+                stream.value()
+            if stream.expect(",}") == "}":
+                return
+
+def file_sha256(path: str) -> str:
+    """Mã băm SHA-256 của file, đọc theo từng khối"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SeedLoader:
+    """
+    Nạp các file seed vào Knowledge Base theo từng khối qua add_nodes_from/add_edges_from.
+
+    Thực thể được nạp trước quan hệ (đọc file hai lượt) nên thứ tự trong file không quan trọng.
+    Mã băm nội dung của mỗi file đã nạp được ghi vào file trạng thái; lần khởi động sau
+    file không đổi sẽ được bỏ qua mà không cần đọc.
+    """
+
+    def __init__(self, kb, state_path: Optional[str] = None, chunk_size: Optional[int] = None):
+        """
+        Khởi tạo bộ nạp
+
+        Args:
+            kb: Knowledge base cần nạp
+            state_path: File trạng thái (mặc định KB_CONFIG['seed_state_file'])
+            chunk_size: Số bản ghi mỗi khối (mặc định KB_CONFIG['seed_chunk_size'])
+        """
+        self.kb = kb
+        self.logger = logging.getLogger("SeedLoader")
+        self.state_path = state_path or config.KB_CONFIG['seed_state_file']
+        self.chunk_size = max(1, chunk_size or config.KB_CONFIG.get('seed_chunk_size', 500))
+        self.backend = config.KB_CONFIG.get('backend', 'memory')
+
+    def _read_state(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Không đọc được trạng thái seed {self.state_path}: {e}")
+            return {}
+
+    def _write_state(self, state: Dict[str, Dict]):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def load(self, paths: Optional[List[str]] = None, force: bool = False) -> Dict[str, Dict]:
+        """
+        Nạp các file seed đã thay đổi kể từ lần nạp trước
+
+        Args:
+            paths: Các file seed (mặc định KB_CONFIG['seed_files']); file không tồn tại được bỏ qua
+            force: Nạp lại kể cả khi nội dung không đổi
+
+        Returns:
+            dict: {đường dẫn: {status: 'loaded'|'skipped'|'error', entities, relations}}
+        """
+        if paths is None:
+            paths = config.KB_CONFIG.get('seed_files', [])
+
+        state = self._read_state()
+        results = {}
+        for path in paths:
+            if not os.path.exists(path):
+                self.logger.debug(f"Bỏ qua file seed không tồn tại: {path}")
+                continue
+
+            key = os.path.normpath(path)
+            digest = file_sha256(path)
+            previous = state.get(key, {})
+            # Knowledge base rỗng (ví dụ đã xóa đồ thị) hoặc đổi backend thì phải nạp lại
+            if (not force and previous.get("sha256") == digest and previous.get("backend") == self.backend
+                    and len(self.kb.graph.nodes) > 0):
+                self.logger.info(f"File seed không đổi, bỏ qua: {path}")
+                results[path] = {"status": "skipped", "entities": previous.get("entities", 0),
+                                 "relations": previous.get("relations", 0)}
+                continue
+
+            try:
+                entities, relations = self.load_file(path)
+            except (OSError, SeedFormatError) as e:
+                self.logger.error(f"Lỗi khi nạp file seed {path}: {e}")
+                results[path] = {"status": "error", "entities": 0, "relations": 0}
+                continue
+
+            state[key] = {
+                "sha256": digest,
+                "backend": self.backend,
+                "entities": entities,
+                "relations": relations,
+                "loaded_at": datetime.now().isoformat()
+            }
+            self._write_state(state)
+            results[path] = {"status": "loaded", "entities": entities, "relations": relations}
+        return results
+
+    def load_file(self, path: str) -> Tuple[int, int]:
+        """
+        Nạp một file seed (không kiểm tra mã băm)
+
+        Args:
+            path: Đường dẫn file seed
+
+        Returns:
+            tuple: (số thực thể, số quan hệ) đã nạp
+        """
+        source = os.path.basename(path)
+        # Tên thực thể -> node ID, để quan hệ không ghi loại của hai đầu vẫn tìm được node
+        name_ids: Dict[str, str] = {}
+
+        entities = self._load_chunks(path, "entity", lambda records: self._insert_entities(records, source, name_ids))
+        relations = self._load_chunks(path, "relation", lambda records: self._insert_relations(records, source, name_ids))
+        self.kb.save()
+
+        self.logger.info(f"Đã nạp {entities} thực thể và {relations} quan hệ từ {path}")
+        return entities, relations
+
+    def _load_chunks(self, path, kind, insert) -> int:
+        """Đọc các bản ghi một loại và chèn theo từng khối, trả về số bản ghi đã chèn"""
+        count = 0
+        chunk = []
+        for record_kind, record in iter_seed_records(path):
+            if record_kind != kind:
+                continue
+            chunk.append(record)
+            if len(chunk) >= self.chunk_size:
+                count += insert(chunk)
+                chunk = []
+        if chunk:
+            count += insert(chunk)
+        return count
+
+    def _insert_entities(self, records, source, name_ids) -> int:
+        nodes = []
+        for entity in records:
+            if not validate_entity(entity):
+                continue
+            node_type = entity.get("type", "entity")
+            node_id = create_node_id(entity["name"], node_type)
+            attributes = {
+                "name": entity["name"],
+                "type": node_type,
+                "description": entity.get("description", ""),
+                "origin": "seed",
+                "source": source,
+                "confidence": entity.get("confidence", config.MIN_CONFIDENCE)
+            }
+            for prop_name, prop_value in entity.get("properties", {}).items():
+                attributes[f"prop_{prop_name}"] = prop_value
+            name_ids[entity["name"].lower().strip()] = node_id
+            nodes.append((node_id, attributes))
+
+        # Mỗi khối là một lô; đồ thị chỉ được lưu một lần khi nạp xong file
+        with self.kb.batch(save=False):
+            self.kb.add_nodes_from(nodes)
+        return len(nodes)
+
+    def _insert_relations(self, records, source, name_ids) -> int:
+        edges = []
+        for relation in records:
+            if not validate_relation(relation):
+                continue
+            source_id = self._endpoint_id(relation["source"], relation.get("source_type"), name_ids)
+            target_id = self._endpoint_id(relation["target"], relation.get("target_type"), name_ids)
+            attributes = {
+                "description": relation.get("description", ""),
+                "origin": "seed",
+                "source": source,
+                "confidence": relation.get("confidence", config.MIN_CONFIDENCE)
+            }
+            for prop_name, prop_value in relation.get("properties", {}).items():
+                attributes[f"prop_{prop_name}"] = prop_value
+            edges.append((source_id, target_id, relation["relation_type"], attributes))
+
+        with self.kb.batch(save=False):
+            return self.kb.add_edges_from(edges)
+
+    @staticmethod
+    def _endpoint_id(name, node_type, name_ids) -> str:
+        if node_type:
+            return create_node_id(name, node_type)
+        return name_ids.get(name.lower().strip()) or create_node_id(name, "entity")
+
+def bootstrap_knowledge(kb, force: bool = False) -> Dict[str, Dict]:
+    """
+    Nạp các file seed trong KB_CONFIG['seed_files'] vào knowledge base
+
+    Args:
+        kb: Knowledge base cần nạp
+        force: Nạp lại kể cả khi file không đổi
+
+    Returns:
+        dict: Kết quả theo từng file (xem SeedLoader.load)
+    """
+    return SeedLoader(kb).load(force=force)
@@ -0,0 +1,96 @@
+"""
+KB Cache - Bộ nhớ đệm LRU cho kết quả truy vấn Knowledge Base
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class QueryCache:
+    """
+    Bộ nhớ đệm LRU, mỗi mục được gắn với thế hệ (generation) của đồ thị lúc tạo.
+    Mục có thế hệ khác thế hệ hiện tại bị coi là cũ và không bao giờ được trả về.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Khởi tạo bộ nhớ đệm
+
+        Args:
+            max_entries: Số mục tối đa (0 để tắt bộ nhớ đệm)
+        """
+        self.logger = logging.getLogger("QueryCache")
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Nhiều luồng đọc có thể dùng bộ nhớ đệm cùng lúc
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        """
+        Lấy kết quả đã lưu
+
+        Args:
+            key: Khóa truy vấn
+            generation: Thế hệ hiện tại của đồ thị
+
+        Returns:
+            Kết quả đã lưu, None nếu không có hoặc đã cũ
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, generation: int, value: Any):
+        """
+        Lưu kết quả
+
+        Args:
+            key: Khóa truy vấn
+            generation: Thế hệ của đồ thị khi tính kết quả
+            value: Kết quả
+        """
+        if not self.max_entries:
+            return
+
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Xóa mọi mục"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Thống kê sử dụng bộ nhớ đệm
+
+        Returns:
+            dict: hits, misses, evictions, size, max_entries
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries
+        }
@@ -0,0 +1,232 @@
+"""
+KB Compaction - Nén Knowledge Base: gộp và xóa node ngữ cảnh cũ, xóa node độ tin cậy thấp không được dùng
+"""
+
+import os
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import config
+from utils.nlp_utils import tokenize
+
+logger = logging.getLogger("KBCompaction")
+
+def _parse_time(value) -> Optional[datetime]:
+    """Đọc thời điểm ISO 8601 (None nếu không hợp lệ)"""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+class Compactor:
+    """
+    Nén knowledge base theo KB_CONFIG['compaction']:
+    - Node ngữ cảnh (mỗi câu hỏi học được tạo một node 'context') có cùng tập từ được
+      gộp làm một; node ngữ cảnh không được truy vấn hay cập nhật trong context_ttl_days
+      hoặc không còn liên kết tới thực thể nào bị xóa
+    - Node có độ tin cậy dưới confidence_floor, chưa từng xuất hiện trong kết quả truy vấn
+      và không thay đổi trong node_ttl_days bị xóa
+
+    Hoạt động cuối cùng của một node là thời điểm muộn nhất trong: updated_at/created_at,
+    lần cuối được truy vấn (AccessLog) và thời điểm bắt đầu ghi nhận truy cập, để lần nén
+    đầu tiên sau khi bật ghi nhận không xóa các node chưa kịp được theo dõi.
+    Node có origin thuộc protected_origins (mặc định kiến thức seed) không bao giờ bị xóa.
+    """
+
+    def __init__(self, kb, settings: Optional[Dict] = None):
+        """
+        Khởi tạo bộ nén
+
+        Args:
+            kb: Knowledge base cần nén
+            settings: Ghi đè các tham số của KB_CONFIG['compaction']
+        """
+        self.kb = kb
+        settings = {**config.KB_CONFIG.get('compaction', {}), **(settings or {})}
+        self.context_ttl = timedelta(days=settings.get('context_ttl_days', 30))
+        self.node_ttl = timedelta(days=settings.get('node_ttl_days', 90))
+        self.confidence_floor = settings.get('confidence_floor', 0.7)
+        self.protected_origins = set(settings.get('protected_origins', ['seed']))
+        self.merge_contexts = settings.get('merge_contexts', True)
+
+    def _last_activity(self, node_id: str, attrs: Dict) -> datetime:
+        """Thời điểm hoạt động cuối cùng của node"""
+        access_log = self.kb.access_log
+        stamps = [_parse_time(attrs.get("updated_at")) or _parse_time(attrs.get("created_at")),
+                  _parse_time(access_log.last_access(node_id)),
+                  _parse_time(access_log.since)]
+        return max((stamp for stamp in stamps if stamp is not None), default=datetime.min)
+
+    def _evict_reason(self, node_id: str, attrs: Dict, last_activity: datetime, now: datetime) -> Optional[str]:
+        """Lý do xóa node (None nếu giữ lại)"""
+        if attrs.get("origin") in self.protected_origins:
+            return None
+
+        if attrs.get("type") == "context":
+            return "stale_context" if now - last_activity > self.context_ttl else None
+
+        confidence = attrs.get("confidence")
+        if not isinstance(confidence, (int, float)) or confidence >= self.confidence_floor:
+            return None
+        if self.kb.access_log.last_access(node_id) is not None:
+            return None
+        return "low_confidence" if now - last_activity > self.node_ttl else None
+
+    def _incident_edges(self, node_id: str) -> List[Tuple[str, str, Dict]]:
+        """
+        Mọi edge ra và vào của node dạng (source, target, attrs).
+        Đọc trực tiếp từ đồ thị thay vì get_related_nodes(), vốn bị giới hạn bởi
+        traversal_max_nodes và sẽ làm mất edge của các node có nhiều quan hệ.
+        """
+        graph = self.kb.graph
+        edges = [(source, target, dict(attrs)) for source, target, attrs in graph.out_edges(node_id, data=True)]
+        edges += [(source, target, dict(attrs)) for source, target, attrs in graph.in_edges(node_id, data=True)
+                  if source != node_id]
+        return edges
+
+    def plan(self, now: Optional[datetime] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Tính các node cần gộp và xóa (không thay đổi knowledge base)
+
+        Args:
+            now: Thời điểm tính TTL (mặc định hiện tại)
+
+        Returns:
+            dict: {'merge': {node ngữ cảnh trùng: node giữ lại}, 'evict': {node: lý do}}
+        """
+        now = now or datetime.now()
+        graph = self.kb.graph
+
+        activity = {}
+        contexts: Dict[Tuple[str, ...], List[str]] = {}
+        for node_id, attrs in graph.nodes(data=True):
+            activity[node_id] = self._last_activity(node_id, attrs)
+            if self.merge_contexts and attrs.get("type") == "context" and attrs.get("origin") not in self.protected_origins:
+                key = tuple(sorted(set(tokenize(str(attrs.get("name") or "")))))
+                if key:
+                    contexts.setdefault(key, []).append(node_id)
+
+        # Mỗi nhóm giữ lại node hoạt động gần nhất; hoạt động của nhóm là của node mới nhất
+        merge = {}
+        for members in contexts.values():
+            if len(members) < 2:
+                continue
+            survivor = max(members, key=lambda node_id: (activity[node_id], node_id))
+            for node_id in members:
+                if node_id != survivor:
+                    merge[node_id] = survivor
+
+        evict = {}
+        for node_id, attrs in graph.nodes(data=True):
+            if node_id in merge:
+                continue
+            reason = self._evict_reason(node_id, attrs, activity[node_id], now)
+            if reason:
+                evict[node_id] = reason
+
+        # Node ngữ cảnh không còn liên kết tới thực thể nào sau khi gộp và xóa
+        linked: Dict[str, bool] = {}
+        for node_id, attrs in graph.nodes(data=True):
+            if attrs.get("type") != "context" or node_id in evict or attrs.get("origin") in self.protected_origins:
+                continue
+            owner = merge.get(node_id, node_id)
+            has_target = any(target not in evict and target not in merge
+                             for _, target, _ in self._incident_edges(node_id) if target != node_id)
+            linked[owner] = linked.get(owner, False) or has_target
+        for node_id, has_target in linked.items():
+            if not has_target:
+                evict[node_id] = "orphan_context"
+
+        return {"merge": merge, "evict": evict}
+
+    def _estimate_bytes(self, plan: Dict[str, Dict[str, str]]) -> Tuple[int, int]:
+        """Số edge và số byte (JSON) của các node sẽ bị gộp hoặc xóa cùng các edge của chúng"""
+        removed = set(plan["merge"]) | set(plan["evict"])
+        edges = {}
+        size = 0
+        for node_id in removed:
+            node = self.kb.get_node(node_id)
+            if node is None:
+                continue
+            size += len(json.dumps(node[1], ensure_ascii=False, default=str))
+            for source, target, attrs in self._incident_edges(node_id):
+                edges[(source, target)] = attrs
+        size += sum(len(json.dumps(attrs, ensure_ascii=False, default=str)) for attrs in edges.values())
+        return len(edges), size
+
+    def _storage_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in self.kb.storage_files() if os.path.exists(path))
+
+    def _merge(self, duplicate: str, survivor: str, edges: List[Tuple[str, str, Dict]]):
+        """Chuyển các edge của node ngữ cảnh trùng sang node giữ lại rồi xóa node trùng"""
+        graph = self.kb.graph
+        for source, target, edge in edges:
+            attrs = dict(edge)
+            relation_type = attrs.pop("relation_type", None) or "related_to"
+            source = survivor if source == duplicate else source
+            target = survivor if target == duplicate else target
+            if source != target and not graph.has_edge(source, target):
+                self.kb.add_edge(source, target, relation_type, attrs)
+        self.kb.remove_node(duplicate)
+
+    def run(self, dry_run: bool = False, now: Optional[datetime] = None) -> Dict:
+        """
+        Nén knowledge base: gộp, xóa, dựng lại chỉ mục và ghi checkpoint
+
+        Args:
+            dry_run: Chỉ tính những gì sẽ được thu hồi, không thay đổi gì
+            now: Thời điểm tính TTL (mặc định hiện tại)
+
+        Returns:
+            dict: merged (số node ngữ cảnh đã gộp), evicted ({lý do: số node}),
+                nodes, edges (số node/edge thu hồi), bytes (dung lượng trên đĩa thu hồi;
+                với dry_run là ước lượng theo kích thước JSON)
+        """
+        kb = self.kb
+        if dry_run:
+            with kb.reading():
+                plan = self.plan(now)
+                edges, size = self._estimate_bytes(plan)
+            return {"dry_run": True, "merged": len(plan["merge"]), "evicted": dict(Counter(plan["evict"].values())),
+                    "nodes": len(plan["merge"]) + len(plan["evict"]), "edges": edges, "bytes": size}
+
+        kb.checkpoint()
+        bytes_before = self._storage_bytes()
+
+        # Luồng đọc vẫn truy vấn phiên bản trước lô cho đến khi nén xong
+        with kb.batch(save=False):
+            nodes_before, edges_before = len(kb.graph.nodes), len(kb.graph.edges)
+            plan = self.plan(now)
+            # Đọc edge của các node trùng trước khi sửa đồ thị
+            moves = {duplicate: self._incident_edges(duplicate) for duplicate in plan["merge"]}
+            for duplicate, survivor in plan["merge"].items():
+                self._merge(duplicate, survivor, moves[duplicate])
+            for node_id in plan["evict"]:
+                if node_id in kb.graph.nodes:
+                    kb.remove_node(node_id)
+            nodes_after, edges_after = len(kb.graph.nodes), len(kb.graph.edges)
+
+        for duplicate, survivor in plan["merge"].items():
+            kb.access_log.merge(duplicate, survivor)
+        kb.access_log.forget(plan["evict"])
+
+        kb.rebuild_indexes()
+        kb.checkpoint()
+        kb.access_log.flush()
+
+        report = {
+            "dry_run": False,
+            "merged": len(plan["merge"]),
+            "evicted": dict(Counter(plan["evict"].values())),
+            "nodes": nodes_before - nodes_after,
+            "edges": edges_before - edges_after,
+            "bytes": bytes_before - self._storage_bytes()
+        }
+        logger.info(f"Đã nén KB: thu hồi {report['nodes']} nodes, {report['edges']} edges, {report['bytes']} bytes "
+                    f"(gộp {report['merged']} ngữ cảnh, xóa {report['evicted']})")
+        return report
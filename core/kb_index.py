@@ -0,0 +1,456 @@
+"""
+KB Index - Chỉ mục ngược theo trường và xếp hạng BM25 cho Knowledge Base
+"""
+
+import math
+import heapq
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.kb_versions import CowMap, cow_copy
+from utils.nlp_utils import ALL_STOPWORDS, fold_diacritics, tokenize
+
+# Các thuộc tính không được đưa vào chỉ mục (thời gian không mang ý nghĩa tìm kiếm)
+NON_INDEXED_ATTRIBUTES = {"created_at", "updated_at"}
+
+# Các thuộc tính được đánh chỉ mục thành trường riêng; các thuộc tính khác gộp vào trường 'other'
+NAMED_FIELDS = ("name", "description", "content")
+
+# Trọng số mặc định của từng trường khi tính điểm
+DEFAULT_FIELD_WEIGHTS = {"id": 1.0, "name": 1.0, "description": 0.8, "content": 0.6, "other": 0.5}
+
+# Số kết quả tối đa mặc định của một lần tìm kiếm
+DEFAULT_TOP_K = 50
+
+# Phiên bản cách ghi token vào posting; chỉ mục lưu trên đĩa có phiên bản khác phải dựng lại
+# (2: thêm dạng bỏ dấu của token có dấu, xem index_terms())
+INDEX_FORMAT = 2
+
+def field_tokens(node_id: str, attrs: Dict) -> Dict[str, Counter]:
+    """
+    Lấy token cần đánh chỉ mục của một node theo từng trường
+
+    Args:
+        node_id: ID của node
+        attrs: Thuộc tính của node
+
+    Returns:
+        dict: {trường: Counter(token -> số lần xuất hiện)}, bỏ qua trường rỗng
+    """
+    fields = {"id": Counter(tokenize(node_id))}
+    other = Counter()
+    for key, value in attrs.items():
+        if key in NON_INDEXED_ATTRIBUTES or not isinstance(value, (str, int, float)):
+            continue
+        if key in NAMED_FIELDS:
+            fields[key] = Counter(tokenize(value))
+        else:
+            other.update(tokenize(value))
+    fields["other"] = other
+    return {field: tokens for field, tokens in fields.items() if tokens}
+
+def index_terms(tokens: Counter) -> Counter:
+    """
+    Các khóa posting của một trường: token gốc cộng dạng bỏ dấu của token có dấu.
+
+    Dạng bỏ dấu được tính một lần khi đánh chỉ mục nên lúc tìm kiếm mỗi token vẫn là
+    một lần tra dict: "phép" chỉ khớp chữ có dấu, còn "phep" khớp cả "phép" lẫn "phep".
+
+    Args:
+        tokens: Counter(token -> số lần xuất hiện) của trường
+
+    Returns:
+        Counter: Khóa posting -> số lần xuất hiện
+    """
+    terms = Counter(tokens)
+    for token, tf in tokens.items():
+        folded = fold_diacritics(token)
+        if folded != token:
+            terms[folded] += tf
+    return terms
+
+def query_terms(keywords: List[str]) -> List[str]:
+    """
+    Các token khác nhau của danh sách từ khóa, giữ thứ tự xuất hiện.
+
+    Stopword bị bỏ ở cả dạng không dấu: "la" sẽ khớp mọi chữ "là" qua dạng bỏ dấu
+    trong chỉ mục (xem index_terms()).
+    """
+    terms = []
+    for keyword in keywords:
+        for token in tokenize(keyword):
+            if token not in terms and token not in ALL_STOPWORDS:
+                terms.append(token)
+    return terms
+
+class KeywordIndex:
+    """
+    Chỉ mục ngược theo trường (id, name, description, content, other).
+    Mỗi posting lưu số lần xuất hiện của token trong trường; độ dài trường và
+    số node chứa token được cập nhật dần để tính BM25 mà không cần duyệt đồ thị.
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Khởi tạo chỉ mục rỗng
+
+        Args:
+            field_weights: Trọng số của từng trường (mặc định DEFAULT_FIELD_WEIGHTS)
+            k1: Tham số bão hòa tần suất của BM25
+            b: Tham số chuẩn hóa độ dài của BM25
+        """
+        self.logger = logging.getLogger("KeywordIndex")
+        self.field_weights = dict(field_weights or DEFAULT_FIELD_WEIGHTS)
+        self.k1 = k1
+        self.b = b
+
+        # trường -> token -> {node: số lần xuất hiện}
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(dict)
+        # trường -> {node: độ dài trường}
+        self._lengths: Dict[str, Dict[str, int]] = defaultdict(dict)
+        # trường -> tổng độ dài trường của mọi node
+        self._total_lengths: Dict[str, int] = defaultdict(int)
+        # token -> số node chứa token (ở bất kỳ trường nào)
+        self._df: Dict[str, int] = {}
+        # node -> token theo trường, dùng khi xóa hoặc cập nhật node
+        self._node_tokens: Dict[str, Dict[str, Counter]] = {}
+        # Các posting list (trường, token) đã sao chép riêng; None nếu chỉ mục không tách từ chỉ mục khác
+        self._owned = None
+
+    def __len__(self):
+        return len(self._node_tokens)
+
+    def __contains__(self, node_id):
+        return node_id in self._node_tokens
+
+    def build(self, nodes: Iterable[Tuple[str, Dict]]):
+        """
+        Xây dựng lại toàn bộ chỉ mục
+
+        Args:
+            nodes: Các cặp (node_id, attributes), ví dụ graph.nodes(data=True)
+        """
+        self.clear()
+        for node_id, attrs in nodes:
+            self.add(node_id, attrs)
+        self.logger.debug(f"Đã xây dựng chỉ mục cho {len(self._node_tokens)} nodes "
+                          f"với {len(self._df)} token")
+
+    def fork(self) -> "KeywordIndex":
+        """
+        Tách chỉ mục copy-on-write: các bảng token/node là CowMap dùng chung dữ liệu với
+        chỉ mục gốc (chi phí không tỉ lệ với số node hay số token), mỗi posting list chỉ
+        được sao chép khi bản tách sửa nó lần đầu nên chỉ mục gốc không bị thay đổi
+
+        Returns:
+            KeywordIndex: Bản tách
+        """
+        forked = self.__class__.__new__(self.__class__)
+        forked.__dict__.update(self.__dict__)
+        forked._postings = defaultdict(dict, {field: CowMap.share(tokens) for field, tokens in self._postings.items()})
+        forked._lengths = defaultdict(dict, {field: CowMap.share(lengths) for field, lengths in self._lengths.items()})
+        forked._total_lengths = defaultdict(int, self._total_lengths)
+        forked._df = CowMap.share(self._df)
+        forked._node_tokens = CowMap.share(self._node_tokens)
+        forked._owned = set()
+        return forked
+
+    def _writable_postings(self, field: str, token: str) -> Dict[str, int]:
+        """Posting list của token trong trường, sao chép trước nếu còn dùng chung với chỉ mục gốc"""
+        postings = self._postings[field]
+        nodes = postings.get(token)
+        if nodes is None:
+            nodes = postings[token] = {}
+        elif self._owned is not None and (field, token) not in self._owned:
+            nodes = postings[token] = cow_copy(nodes)
+        if self._owned is not None:
+            self._owned.add((field, token))
+        return nodes
+
+    def clear(self):
+        """Xóa toàn bộ chỉ mục"""
+        self._postings.clear()
+        self._lengths.clear()
+        self._total_lengths.clear()
+        self._df.clear()
+        self._node_tokens.clear()
+
+    def add(self, node_id: str, attrs: Dict):
+        """
+        Thêm hoặc cập nhật chỉ mục cho một node
+
+        Args:
+            node_id: ID của node
+            attrs: Toàn bộ thuộc tính hiện tại của node
+        """
+        if node_id in self._node_tokens:
+            self.remove(node_id)
+
+        fields = field_tokens(node_id, attrs)
+        terms = {field: index_terms(tokens) for field, tokens in fields.items()}
+        for field, tokens in fields.items():
+            for token, tf in terms[field].items():
+                self._writable_postings(field, token)[node_id] = tf
+            # Độ dài trường tính theo token gốc, dạng bỏ dấu không làm trường dài thêm
+            length = sum(tokens.values())
+            self._lengths[field][node_id] = length
+            self._total_lengths[field] += length
+
+        df = self._df
+        for token in set().union(*terms.values()):
+            df[token] = df.get(token, 0) + 1
+
+        self._node_tokens[node_id] = fields
+
+    def remove(self, node_id: str):
+        """
+        Xóa một node khỏi chỉ mục
+
+        Args:
+            node_id: ID của node cần xóa
+        """
+        fields = self._node_tokens.pop(node_id, None)
+        if fields is None:
+            return
+
+        terms = {field: index_terms(tokens) for field, tokens in fields.items()}
+        for field, tokens in terms.items():
+            postings = self._postings[field]
+            for token in tokens:
+                if token not in postings:
+                    continue
+                nodes = self._writable_postings(field, token)
+                nodes.pop(node_id, None)
+                if not nodes:
+                    del postings[token]
+            self._total_lengths[field] -= self._lengths[field].pop(node_id, 0)
+
+        df = self._df
+        for token in set().union(*terms.values()):
+            count = df.get(token, 0) - 1
+            if count > 0:
+                df[token] = count
+            else:
+                df.pop(token, None)
+
+    def search(self, keywords: List[str], top_k: int = DEFAULT_TOP_K,
+               min_relevance: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Tìm các node liên quan đến từ khóa, xếp hạng bằng BM25 theo trường
+
+        Chỉ các posting list của token trong câu hỏi được duyệt nên chi phí
+        không phụ thuộc vào kích thước đồ thị. Điểm BM25 được quy về [0, 1]:
+        kết quả đứng đầu nhận độ liên quan bằng tỷ lệ các token của câu hỏi
+        mà nó chứa, các kết quả khác tỷ lệ theo điểm BM25 so với kết quả đầu.
+
+        Args:
+            keywords: Danh sách từ khóa
+            top_k: Số kết quả tối đa
+            min_relevance: Độ liên quan tối thiểu của kết quả
+
+        Returns:
+            list: Danh sách (node_id, relevance), sắp xếp giảm dần theo độ liên quan
+        """
+        terms = query_terms(keywords)
+        node_count, total_lengths = self._collection_stats()
+        if not terms or node_count == 0 or top_k <= 0:
+            return []
+
+        scores: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, set] = defaultdict(set)
+        for term in terms:
+            df, postings = self._term_postings(term)
+            idf = math.log(1 + (node_count - df + 0.5) / (df + 0.5))
+
+            for node_id, field, tf, length in postings:
+                weight = self.field_weights.get(field, 0.0)
+                if not weight:
+                    continue
+                avg_length = total_lengths.get(field, 0) / node_count or 1.0
+                norm = 1 - self.b + self.b * length / avg_length
+                scores[node_id] += weight * idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                matched[node_id].add(term)
+
+        if not scores:
+            return []
+
+        # Hòa điểm được xếp theo node ID để phân trang ổn định
+        top = heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+        top_node, top_score = top[0]
+        coverage = len(matched[top_node]) / len(terms)
+
+        results = []
+        for node_id, score in top:
+            relevance = coverage * score / top_score
+            if relevance < min_relevance:
+                break
+            results.append((node_id, relevance))
+        return results
+
+    def _collection_stats(self) -> Tuple[int, Dict[str, int]]:
+        """Số node trong chỉ mục và tổng độ dài của từng trường"""
+        return len(self._node_tokens), self._total_lengths
+
+    def _term_postings(self, term: str) -> Tuple[int, List[Tuple[str, str, int, int]]]:
+        """
+        Các posting của một token
+
+        Returns:
+            tuple: (số node chứa token, [(node_id, trường, số lần xuất hiện, độ dài trường)])
+        """
+        postings = []
+        for field, field_postings in self._postings.items():
+            nodes = field_postings.get(term)
+            if not nodes:
+                continue
+            lengths = self._lengths[field]
+            postings.extend((node_id, field, tf, lengths[node_id]) for node_id, tf in nodes.items())
+        return self._df.get(term, 0), postings
+
+class GraphIndex:
+    """
+    Chỉ mục phụ của đồ thị, cập nhật dần khi thêm/xóa:
+    - loại node -> tập node
+    - (node, loại quan hệ) -> các node kế tiếp qua quan hệ đó
+    """
+
+    def __init__(self):
+        """Khởi tạo chỉ mục rỗng"""
+        # loại node -> {node: None} (dict giữ thứ tự thêm)
+        self._types: Dict[str, Dict[str, None]] = defaultdict(dict)
+        # node -> loại node
+        self._node_type: Dict[str, str] = {}
+        # node -> loại quan hệ -> {node kế tiếp: None}
+        self._out: Dict[str, Dict[str, Dict[str, None]]] = {}
+        # node -> {node đứng trước: loại quan hệ}, dùng khi xóa node
+        self._in: Dict[str, Dict[str, str]] = {}
+        # Các mục ('type'|'out'|'in', khóa) đã sao chép riêng; None nếu chỉ mục không tách từ chỉ mục khác
+        self._owned = None
+
+    def fork(self) -> "GraphIndex":
+        """
+        Tách chỉ mục copy-on-write (xem KeywordIndex.fork)
+
+        Returns:
+            GraphIndex: Bản tách
+        """
+        forked = self.__class__.__new__(self.__class__)
+        forked.__dict__.update(self.__dict__)
+        forked._types = defaultdict(dict, self._types)
+        forked._node_type = CowMap.share(self._node_type)
+        forked._out = CowMap.share(self._out)
+        forked._in = CowMap.share(self._in)
+        forked._owned = set()
+        return forked
+
+    def _writable(self, kind: str, key: str):
+        """Mục của bảng 'type', 'out' hoặc 'in' (tạo nếu chưa có), sao chép trước nếu còn dùng chung với chỉ mục gốc"""
+        table = {"type": self._types, "out": self._out, "in": self._in}[kind]
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = defaultdict(dict) if kind == "out" else {}
+        elif self._owned is not None and (kind, key) not in self._owned:
+            if kind == "out":
+                entry = defaultdict(dict, {relation: cow_copy(targets) for relation, targets in entry.items()})
+            else:
+                entry = cow_copy(entry)
+            table[key] = entry
+        if self._owned is not None:
+            self._owned.add((kind, key))
+        return entry
+
+    def build(self, graph):
+        """
+        Xây dựng lại toàn bộ chỉ mục từ đồ thị
+
+        Args:
+            graph: Đồ thị NetworkX
+        """
+        self._types.clear()
+        self._node_type.clear()
+        self._out.clear()
+        self._in.clear()
+        if self._owned is not None:
+            self._owned = set()
+        for node_id, node_type in graph.nodes(data="type"):
+            self.set_node_type(node_id, node_type)
+        for source, target, relation_type in graph.edges(data="relation_type"):
+            self.add_edge(source, target, relation_type)
+
+    def set_node_type(self, node_id: str, node_type: Optional[str]):
+        """Thêm node hoặc cập nhật loại của node"""
+        node_type = node_type or "unknown"
+        previous = self._node_type.get(node_id)
+        if previous == node_type:
+            return
+        if previous is not None:
+            self._discard_type(node_id, previous)
+        self._writable("type", node_type)[node_id] = None
+        self._node_type[node_id] = node_type
+
+    def remove_node(self, node_id: str):
+        """Xóa node cùng mọi edge vào/ra của nó khỏi chỉ mục"""
+        node_type = self._node_type.pop(node_id, None)
+        if node_type is not None:
+            self._discard_type(node_id, node_type)
+
+        for relations in self._out.pop(node_id, {}).values():
+            for target in relations:
+                if target in self._in:
+                    self._writable("in", target).pop(node_id, None)
+        for source, relation_type in self._in.pop(node_id, {}).items():
+            self._discard_out(source, target=node_id, relation_type=relation_type)
+
+    def add_edge(self, source: str, target: str, relation_type: Optional[str]):
+        """Thêm edge hoặc cập nhật loại quan hệ của edge"""
+        relation_type = relation_type or ""
+        previous = self._in.get(target, {}).get(source)
+        if previous is not None and previous != relation_type:
+            self._discard_out(source, target, previous)
+        self._writable("out", source)[relation_type][target] = None
+        self._writable("in", target)[source] = relation_type
+
+    def remove_edge(self, source: str, target: str):
+        """Xóa edge khỏi chỉ mục"""
+        if source not in self._in.get(target, {}):
+            return
+        relation_type = self._writable("in", target).pop(source)
+        if relation_type is not None:
+            self._discard_out(source, target, relation_type)
+
+    def type_counts(self) -> Dict[str, int]:
+        """Số node theo từng loại"""
+        return {node_type: len(nodes) for node_type, nodes in self._types.items()}
+
+    def nodes_of_type(self, node_type: str) -> List[str]:
+        """Các node thuộc một loại"""
+        return list(self._types.get(node_type, ()))
+
+    def neighbors(self, node_id: str, relation_type: str) -> List[str]:
+        """Các node kế tiếp của node qua một loại quan hệ"""
+        relations = self._out.get(node_id)
+        if not relations:
+            return []
+        return list(relations.get(relation_type, ()))
+
+    def _discard_type(self, node_id: str, node_type: str):
+        if node_type not in self._types:
+            return
+        nodes = self._writable("type", node_type)
+        nodes.pop(node_id, None)
+        if not nodes:
+            del self._types[node_type]
+
+    def _discard_out(self, source: str, target: str, relation_type: str):
+        if not self._out.get(source):
+            return
+        relations = self._writable("out", source)
+        targets = relations.get(relation_type)
+        if targets is None:
+            return
+        targets.pop(target, None)
+        if not targets:
+            del relations[relation_type]
+        if not relations:
+            del self._out[source]
@@ -0,0 +1,114 @@
+"""
+KB Journal - Nhật ký ghi trước (write-ahead journal) cho các thay đổi của Knowledge Base
+"""
+
+import os
+import json
+import logging
+from typing import Dict, Iterator, List
+
+class KBJournal:
+    """
+    Nhật ký chỉ ghi nối (append-only), mỗi thay đổi là một dòng JSON gọn.
+    Các bản ghi được gom lại và fsync theo lô để giảm chi phí ghi đĩa.
+    """
+
+    def __init__(self, path: str, fsync_batch: int = 50):
+        """
+        Khởi tạo journal
+
+        Args:
+            path: Đường dẫn file journal
+            fsync_batch: Số bản ghi tối đa được giữ trong bộ đệm trước khi fsync
+        """
+        self.logger = logging.getLogger("KBJournal")
+        self.path = path
+        self.fsync_batch = max(1, fsync_batch)
+
+        # Bộ đệm các bản ghi chưa được ghi xuống đĩa
+        self._pending: List[str] = []
+
+        # Số bản ghi kể từ checkpoint gần nhất (kể cả các bản ghi đã có trong file)
+        self.records = 0
+
+    def append(self, op: str, **fields):
+        """
+        Thêm một bản ghi thay đổi vào journal
+
+        Args:
+            op: Loại thay đổi (add_node, add_edge, remove_node, remove_edge)
+            **fields: Dữ liệu của thay đổi
+        """
+        record = {"op": op}
+        record.update(fields)
+        self._pending.append(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str))
+        self.records += 1
+
+        if len(self._pending) >= self.fsync_batch:
+            self.flush()
+
+    def flush(self):
+        """Ghi các bản ghi trong bộ đệm xuống file và fsync"""
+        if not self._pending:
+            return
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(self._pending) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.logger.debug(f"Đã ghi {len(self._pending)} bản ghi vào journal")
+        self._pending = []
+
+    def replay(self) -> Iterator[Dict]:
+        """
+        Đọc lại các bản ghi trong journal theo thứ tự
+
+        Chỉ dòng cuối bị ghi dở (do tiến trình dừng đột ngột) được bỏ qua và cắt khỏi file
+        để các bản ghi mới không bị nối sau nó. Toàn bộ file được kiểm tra trước khi trả về
+        bản ghi đầu tiên nên không có bản ghi nào được áp dụng nếu journal bị hỏng.
+
+        Yields:
+            dict: Bản ghi thay đổi
+
+        Raises:
+            ValueError: Nếu một bản ghi không phải dòng cuối bị hỏng (áp dụng tiếp các bản ghi
+                sau nó có thể tạo ra trạng thái chưa từng tồn tại)
+        """
+        if not os.path.exists(self.path):
+            return
+
+        records = []
+        torn_offset = torn_line = None
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line_no, raw in enumerate(f, 1):
+                line_offset, offset = offset, offset + len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                if torn_offset is not None:
+                    raise ValueError(f"Journal {self.path} bị hỏng ở dòng {torn_line} (không phải dòng cuối), "
+                                     f"cần khôi phục từ backup")
+                try:
+                    records.append(json.loads(line.decode('utf-8')))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    torn_offset, torn_line = line_offset, line_no
+
+        if torn_offset is not None:
+            self.logger.warning(f"Bỏ qua bản ghi ghi dở ở cuối journal (byte {torn_offset})")
+            with open(self.path, 'r+b') as f:
+                f.truncate(torn_offset)
+                os.fsync(f.fileno())
+
+        for record in records:
+            self.records += 1
+            yield record
+
+    def truncate(self):
+        """Xóa toàn bộ journal sau khi đã ghi checkpoint"""
+        self._pending = []
+        self.records = 0
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
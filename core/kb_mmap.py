@@ -0,0 +1,428 @@
+"""
+KB Mmap - Snapshot phẳng, chỉ đọc của Knowledge Base dưới dạng các mảng NumPy ánh xạ bộ nhớ (mmap),
+dùng chung giữa nhiều process worker mà không cần sao chép đồ thị và chỉ mục vào từng process
+"""
+
+import os
+import json
+import shutil
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+from core.knowledge_base import index_options, spreading_options, rank_by_spreading
+from core.kb_index import INDEX_FORMAT, KeywordIndex, field_tokens, index_terms, query_terms
+from core.kb_cache import QueryCache
+from utils.csr_graph import CSRGraph, CSR_ARRAYS
+from utils.nlp_utils import extract_keywords
+
+logger = logging.getLogger("KBMmap")
+
+# File trỏ tới phiên bản snapshot hiện hành trong thư mục snapshot
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+def _encode_strings(strings) -> Tuple[np.ndarray, np.ndarray]:
+    """Ghép các chuỗi thành một khối byte UTF-8 và mảng vị trí (n + 1 phần tử)"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+    return blob, offsets
+
+class StringTable:
+    """Dãy chuỗi chỉ đọc đọc trực tiếp từ khối byte UTF-8 và mảng vị trí (có thể là mảng mmap)"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class StringIndex:
+    """Ánh xạ chuỗi -> vị trí bằng tìm kiếm nhị phân trên thứ tự đã sắp xếp, không dựng dict"""
+
+    def __init__(self, table: StringTable, order: np.ndarray):
+        """
+        Args:
+            table: Dãy chuỗi
+            order: Vị trí của các chuỗi theo thứ tự tăng dần
+        """
+        self.table = table
+        self.order = order
+
+    def get(self, key: str, default=None):
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self.table[int(self.order[mid])]
+            if value < key:
+                lo = mid + 1
+            elif value > key:
+                hi = mid
+            else:
+                return int(self.order[mid])
+        return default
+
+    def __getitem__(self, key: str) -> int:
+        position = self.get(key)
+        if position is None:
+            raise KeyError(key)
+        return position
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+def _sorted_order(strings: List[str]) -> np.ndarray:
+    return np.array(sorted(range(len(strings)), key=strings.__getitem__), dtype=np.int32)
+
+def publish_snapshot(kb, directory: Optional[str] = None, keep: Optional[int] = None) -> str:
+    """
+    Ghi một phiên bản snapshot phẳng của knowledge base rồi công bố nó bằng cách
+    thay file CURRENT một cách nguyên tử. Worker đang dùng phiên bản cũ vẫn đọc được
+    cho đến khi chuyển sang phiên bản mới.
+
+    Mỗi phiên bản là một thư mục các file .npy:
+    - Bảng node: node ID, thuộc tính (JSON) dạng khối byte + vị trí, thứ tự sắp xếp của ID
+    - Ma trận kề CSR chiều ra và chiều vào, mã loại quan hệ, thuộc tính edge (JSON) theo chiều ra
+    - Chỉ mục ngược: token đã sắp xếp, posting (node, trường, tần suất) theo token,
+      độ dài từng trường của mỗi node
+
+    Args:
+        kb: Knowledge base nguồn
+        directory: Thư mục snapshot (mặc định KB_CONFIG['mmap_snapshot']['dir'])
+        keep: Số phiên bản giữ lại (mặc định KB_CONFIG['mmap_snapshot']['keep'])
+
+    Returns:
+        str: Tên phiên bản đã công bố
+    """
+    settings = config.KB_CONFIG.get('mmap_snapshot', {})
+    directory = directory or settings['dir']
+    keep = max(1, keep or settings.get('keep', 2))
+    os.makedirs(directory, exist_ok=True)
+
+    version = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    tmp_dir = os.path.join(directory, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+
+    try:
+        # Giữ một phiên bản để mọi mảng mô tả cùng một trạng thái của đồ thị
+        with kb.reading():
+            view = kb.csr_view()
+            arrays, meta = _flatten(kb, view)
+            meta["generation"] = kb.generation
+
+        meta.update({"format": FORMAT_VERSION, "version": version, "created_at": datetime.now().isoformat()})
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        os.rename(tmp_dir, os.path.join(directory, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    current_tmp = os.path.join(directory, CURRENT_FILE + ".tmp")
+    with open(current_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+
+    _prune_versions(directory, keep)
+    logger.info(f"Đã công bố snapshot {version} với {meta['nodes']} nodes và {meta['edges']} edges")
+    return version
+
+def _flatten(kb, view: CSRGraph) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Dựng các mảng của snapshot từ khung nhìn CSR và thuộc tính trong knowledge base"""
+    node_ids = list(view.node_ids)
+    n = len(node_ids)
+    arrays = dict(view.arrays())
+
+    arrays["node_ids"], arrays["node_id_offsets"] = _encode_strings(node_ids)
+    arrays["node_order"] = _sorted_order(node_ids)
+
+    # Thuộc tính node và chỉ mục ngược được tính trong cùng một lượt duyệt node
+    fields = list(config.KB_CONFIG.get('field_weights') or {})
+    field_codes = {field: code for code, field in enumerate(fields)}
+    field_lengths = np.zeros((n, len(fields)), dtype=np.int32)
+    postings: Dict[str, List[Tuple[int, int, int]]] = defaultdict(list)
+    node_attrs = []
+    for i, node_id in enumerate(node_ids):
+        attrs = kb.graph.nodes[node_id]
+        node_attrs.append(json.dumps(attrs, ensure_ascii=False, default=str))
+        for field, tokens in field_tokens(node_id, attrs).items():
+            code = field_codes.get(field)
+            if code is None:
+                code = field_codes[field] = len(fields)
+                fields.append(field)
+                field_lengths = np.pad(field_lengths, ((0, 0), (0, 1)))
+            field_lengths[i, code] = sum(tokens.values())
+            for token, tf in index_terms(tokens).items():
+                postings[token].append((i, code, tf))
+    arrays["node_attrs"], arrays["node_attr_offsets"] = _encode_strings(node_attrs)
+    arrays["field_lengths"] = field_lengths
+
+    # Posting được sắp theo token để tìm token bằng tìm kiếm nhị phân
+    terms = sorted(postings)
+    arrays["terms"], arrays["term_offsets"] = _encode_strings(terms)
+    term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(postings[term]) for term in terms], out=term_ptr[1:])
+    flat = np.array([entry for term in terms for entry in postings[term]], dtype=np.int64).reshape(-1, 3)
+    arrays["term_ptr"] = term_ptr
+    arrays["post_nodes"] = flat[:, 0].astype(np.int32)
+    arrays["post_fields"] = flat[:, 1].astype(np.int8)
+    arrays["post_tf"] = flat[:, 2].astype(np.int32)
+    arrays["term_df"] = np.array([len({node for node, _, _ in postings[term]}) for term in terms], dtype=np.int32)
+
+    # Thuộc tính edge theo thứ tự của ma trận kề chiều ra
+    rows = np.repeat(np.arange(n), np.diff(view.out_indptr))
+    edge_attrs = [
+        json.dumps(kb.graph.get_edge_data(node_ids[u], node_ids[v]) or {}, ensure_ascii=False, default=str)
+        for u, v in zip(rows.tolist(), view.out_indices.tolist())
+    ]
+    arrays["edge_attrs"], arrays["edge_attr_offsets"] = _encode_strings(edge_attrs)
+
+    meta = {
+        "nodes": n,
+        "edges": int(view.edge_count),
+        "index_format": INDEX_FORMAT,
+        "relation_names": list(view.relation_names),
+        "fields": fields,
+        "total_lengths": {field: int(field_lengths[:, code].sum()) for code, field in enumerate(fields)}
+    }
+    return arrays, meta
+
+def _prune_versions(directory: str, keep: int):
+    """Xóa các phiên bản cũ ngoài keep phiên bản mới nhất (worker đang mmap file đã xóa vẫn đọc được)"""
+    versions = sorted(name for name in os.listdir(directory)
+                      if not name.startswith(".") and os.path.isdir(os.path.join(directory, name)))
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+class _SnapshotKeywordIndex(KeywordIndex):
+    """Chỉ mục BM25 đọc posting từ các mảng của snapshot"""
+
+    def __init__(self, snapshot: "MmapSnapshot", **kwargs):
+        super().__init__(**kwargs)
+        self.snapshot = snapshot
+
+    def _collection_stats(self):
+        return self.snapshot.meta["nodes"], self.snapshot.meta["total_lengths"]
+
+    def _term_postings(self, term):
+        snapshot = self.snapshot
+        position = snapshot.term_index.get(term)
+        if position is None:
+            return 0, []
+
+        start, end = int(snapshot.arrays["term_ptr"][position]), int(snapshot.arrays["term_ptr"][position + 1])
+        nodes = snapshot.arrays["post_nodes"][start:end]
+        fields = snapshot.arrays["post_fields"][start:end]
+        tfs = snapshot.arrays["post_tf"][start:end]
+        lengths = snapshot.arrays["field_lengths"][nodes, fields]
+        names = snapshot.meta["fields"]
+        postings = [
+            (snapshot.node_ids[node], names[field], tf, length)
+            for node, field, tf, length in zip(nodes.tolist(), fields.tolist(), tfs.tolist(), lengths.tolist())
+        ]
+        return int(snapshot.arrays["term_df"][position]), postings
+
+class MmapSnapshot:
+    """
+    Knowledge base chỉ đọc gắn vào snapshot đã công bố bằng mmap.
+
+    Các mảng được hệ điều hành chia sẻ giữa mọi process gắn vào cùng một phiên bản;
+    mỗi process chỉ giữ vài đối tượng nhỏ. Trước mỗi thao tác, file CURRENT được kiểm tra
+    (một lần stat) để chuyển sang phiên bản mới nếu đã có.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Gắn vào phiên bản hiện hành
+
+        Args:
+            directory: Thư mục snapshot (mặc định KB_CONFIG['mmap_snapshot']['dir'])
+
+        Raises:
+            FileNotFoundError: Nếu chưa có phiên bản nào được công bố
+        """
+        self.logger = logging.getLogger("MmapSnapshot")
+        self.directory = directory or config.KB_CONFIG.get('mmap_snapshot', {})['dir']
+        self.version = None
+        self._current_mtime = None
+        self.query_cache = QueryCache(config.KB_CONFIG.get('query_cache_size', 256))
+        self._attach(self._read_current())
+
+    def _read_current(self) -> str:
+        path = os.path.join(self.directory, CURRENT_FILE)
+        self._current_mtime = os.stat(path).st_mtime_ns
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+
+    def _attach(self, version: str):
+        version_dir = os.path.join(self.directory, version)
+        with open(os.path.join(version_dir, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Định dạng snapshot không được hỗ trợ: {meta.get('format')}")
+
+        arrays = {}
+        for name in os.listdir(version_dir):
+            if name.endswith(".npy"):
+                arrays[name[:-4]] = np.load(os.path.join(version_dir, name), mmap_mode="r")
+
+        self.meta = meta
+        self.arrays = arrays
+        self.node_ids = StringTable(arrays["node_ids"], arrays["node_id_offsets"])
+        self.node_index = StringIndex(self.node_ids, arrays["node_order"])
+        self.term_index = StringIndex(StringTable(arrays["terms"], arrays["term_offsets"]),
+                                      np.arange(len(arrays["term_offsets"]) - 1))
+        self.node_attrs = StringTable(arrays["node_attrs"], arrays["node_attr_offsets"])
+        self.edge_attrs = StringTable(arrays["edge_attrs"], arrays["edge_attr_offsets"])
+        self.view = CSRGraph.from_arrays(self.node_ids, self.node_index, meta["relation_names"],
+                                         {name: arrays[name] for name in CSR_ARRAYS})
+        self.index = _SnapshotKeywordIndex(self, **index_options())
+        self.version = version
+        self.logger.info(f"Đã gắn vào snapshot {version} ({meta['nodes']} nodes, {meta['edges']} edges)")
+        if meta.get("index_format", 1) != INDEX_FORMAT:
+            # Bố cục mảng không đổi nên snapshot cũ vẫn dùng được, chỉ thiếu posting dạng bỏ dấu
+            self.logger.warning(f"Snapshot {version} được công bố trước khi có chỉ mục bỏ dấu, "
+                                f"truy vấn không dấu chỉ khớp sau khi công bố lại (python main.py kb publish)")
+
+    def refresh(self) -> bool:
+        """
+        Chuyển sang phiên bản mới nếu CURRENT đã thay đổi
+
+        Returns:
+            bool: True nếu đã chuyển phiên bản
+        """
+        try:
+            mtime = os.stat(os.path.join(self.directory, CURRENT_FILE)).st_mtime_ns
+            if mtime == self._current_mtime:
+                return False
+            version = self._read_current()
+            if version == self.version:
+                return False
+            self._attach(version)
+            return True
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Không thể chuyển sang snapshot mới, tiếp tục dùng {self.version}: {e}")
+            return False
+
+    def _attrs(self, position: int) -> Dict:
+        return json.loads(self.node_attrs[position])
+
+    def get_node(self, node_id):
+        """
+        Lấy thông tin của một node
+
+        Returns:
+            tuple: (node_id, attributes) nếu tồn tại, None nếu không
+        """
+        self.refresh()
+        position = self.node_index.get(node_id)
+        if position is None:
+            return None
+        return node_id, self._attrs(position)
+
+    def query(self, query_text, limit=None, offset=0, min_relevance=None, mode=None):
+        """
+        Truy vấn snapshot, cùng tham số và kết quả như KnowledgeBase.query
+
+        Returns:
+            list: Danh sách (node_id, attributes, relevance)
+        """
+        self.refresh()
+        keywords = extract_keywords(query_text)
+        if not keywords:
+            return []
+
+        if limit is None:
+            limit = config.KB_CONFIG.get('max_results', 10)
+        if min_relevance is None:
+            min_relevance = config.KB_CONFIG.get('similarity_threshold', 0.0)
+        if mode is None:
+            mode = config.KB_CONFIG.get('retrieval_mode', 'keyword')
+        offset = max(0, offset)
+
+        # Kết quả được đệm theo phiên bản snapshot thay cho thế hệ của đồ thị
+        cache_key = (frozenset(query_terms(keywords)), limit, offset, min_relevance, mode)
+        relevant_nodes = self.query_cache.get(cache_key, self.version)
+        if relevant_nodes is None:
+            if mode == 'spreading':
+                seeds = self.index.search(keywords, top_k=spreading_options().get('seed_count', 50))
+                ranked = rank_by_spreading(self.view, seeds, offset + limit, min_relevance)
+            else:
+                ranked = self.index.search(keywords, top_k=offset + limit, min_relevance=min_relevance)
+            relevant_nodes = [(node, self._attrs(self.node_index[node]), relevance)
+                              for node, relevance in ranked[offset:]]
+            self.query_cache.put(cache_key, self.version, relevant_nodes)
+
+        return [(node, dict(attrs), relevance) for node, attrs, relevance in relevant_nodes]
+
+    def _edge_position(self, source: int, target: int) -> Optional[int]:
+        indptr, indices = self.arrays["out_indptr"], self.arrays["out_indices"]
+        start = int(indptr[source])
+        matches = np.flatnonzero(indices[start:int(indptr[source + 1])] == target)
+        return start + int(matches[0]) if len(matches) else None
+
+    def get_related_nodes(self, node_id, relation_type=None, max_depth=1, direction="out", max_nodes=None):
+        """
+        Lấy các node liên quan, cùng tham số và kết quả như KnowledgeBase.get_related_nodes
+
+        Returns:
+            list: Danh sách (node_id, thuộc tính node, thuộc tính edge dẫn tới node)
+        """
+        self.refresh()
+        root = self.node_index.get(node_id)
+        if root is None:
+            return []
+        if max_nodes is None:
+            max_nodes = config.KB_CONFIG.get('traversal_max_nodes')
+
+        view = self.view
+        relation = view.relation_code(relation_type)
+        if relation == -1:
+            return []
+
+        related = []
+        levels = view.bfs_edges([root], max_depth, relation, direction, max_nodes, return_outgoing=True)
+        for sources, targets, outgoing in levels:
+            for src, dst, forward in zip(sources.tolist(), targets.tolist(), outgoing.tolist()):
+                position = self._edge_position(src, dst) if forward else self._edge_position(dst, src)
+                related.append((view.node_ids[dst], self._attrs(dst), json.loads(self.edge_attrs[position])))
+        return related
+
+    def find_paths(self, start_node, end_node, max_length=3):
+        """
+        Tìm các đường đi giữa hai node
+
+        Returns:
+            list: Các đường đi (list các node ID)
+        """
+        self.refresh()
+        start, end = self.node_index.get(start_node), self.node_index.get(end_node)
+        if start is None or end is None:
+            return []
+        return [[self.node_ids[i] for i in path] for path in self.view.simple_paths(start, end, max_length)]
+
+    def stats(self) -> Dict:
+        """
+        Thống kê phiên bản đang dùng
+
+        Returns:
+            dict: version, generation, nodes, edges, created_at
+        """
+        return {key: self.meta.get(key) for key in ("version", "generation", "nodes", "edges", "created_at")}
@@ -0,0 +1,1092 @@
+"""
+Sharded Knowledge Base - Chia đồ thị kiến thức thành các shard theo chủ đề toán học,
+mỗi shard là một file riêng, chỉ được tải khi cần và có thể giải phóng khi vượt giới hạn bộ nhớ
+"""
+
+import os
+import json
+import zlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import networkx as nx
+
+import config
+from core.knowledge_base import KnowledgeBase, index_options, spreading_options, rank_by_spreading, _reader, _writer
+from core.kb_index import KeywordIndex, GraphIndex, index_terms
+from core.kb_cache import QueryCache
+from core.kb_access import AccessLog
+from core.kb_snapshot import BINARY_EXTENSION, read_snapshot, write_snapshot
+from utils.csr_graph import CSRGraph, UNKNOWN_RELATION
+from utils.graph_utils import find_paths
+from utils.nlp_utils import tokenize
+from utils.rwlock import RWLock
+
+# File bảng định tuyến dùng chung: số node/edge của từng shard và thống kê chỉ mục
+MANIFEST_FILE = "index.json"
+# 2: bảng token -> shard có thêm dạng bỏ dấu của token (xem kb_index.index_terms)
+# 3: node -> shard, edge giữa các shard và bảng token -> shard chuyển sang các file bảng tra cứu
+MANIFEST_VERSION = 3
+# Tiền tố tên file của các bảng tra cứu (mỗi bảng chia thành nhiều file theo băm của khóa)
+ROUTES_PREFIX = "routes"
+CROSS_OUT_PREFIX = "cross_out"
+CROSS_IN_PREFIX = "cross_in"
+TERMS_PREFIX = "terms"
+
+# Các thuộc tính dùng để chọn chủ đề cho node
+CLASSIFIED_ATTRIBUTES = ("name", "description", "content")
+
+class ShardClassifier:
+    """
+    Chọn shard cho node theo các chủ đề của config.MATH_CATEGORIES.
+    Node có thuộc tính 'category' là một chủ đề hợp lệ được xếp vào chủ đề đó;
+    các node khác được so khớp các cụm từ khóa của từng chủ đề trên ID, tên,
+    mô tả và nội dung. Node không khớp chủ đề nào thuộc shard mặc định.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], keywords: Dict[str, List[str]], default_shard: str):
+        """
+        Khởi tạo bộ phân loại
+
+        Args:
+            categories: Chủ đề -> các chủ đề con (config.MATH_CATEGORIES)
+            keywords: Chủ đề -> các cụm từ khóa bổ sung
+            default_shard: Shard cho node không khớp chủ đề nào
+        """
+        self.default_shard = default_shard
+        # chủ đề -> các cụm token cần khớp (tên chủ đề, chủ đề con và từ khóa)
+        self._phrases: Dict[str, List[str]] = {}
+        for category, topics in categories.items():
+            phrases = (tokenize(phrase) for phrase in [category, *topics, *keywords.get(category, [])])
+            self._phrases[category] = [" ".join(tokens) for tokens in phrases if tokens]
+
+    def classify(self, node_id: str, attrs: Dict) -> str:
+        """
+        Chọn shard cho một node
+
+        Args:
+            node_id: ID của node
+            attrs: Thuộc tính của node
+
+        Returns:
+            str: Tên shard
+        """
+        category = attrs.get("category")
+        if isinstance(category, str) and category in self._phrases:
+            return category
+
+        tokens = tokenize(node_id)
+        for key in CLASSIFIED_ATTRIBUTES:
+            tokens.extend(tokenize(attrs.get(key, "")))
+        text = f" {' '.join(tokens)} "
+
+        # Chủ đề có nhiều cụm từ khóa xuất hiện nhất; hòa thì theo thứ tự trong cấu hình
+        best, best_score = self.default_shard, 0
+        for category, phrases in self._phrases.items():
+            score = sum(text.count(f" {phrase} ") for phrase in phrases)
+            if score > best_score:
+                best, best_score = category, score
+        return best
+
+class _Shard:
+    """Một shard đã tải: đồ thị các node cùng chủ đề (với các edge bên trong shard) và chỉ mục BM25 của chúng"""
+
+    def __init__(self, name: str, graph: nx.DiGraph):
+        self.name = name
+        self.graph = graph
+        self.index = KeywordIndex(**index_options())
+        self.index.build(graph.nodes(data=True))
+        # Shard có thay đổi chưa ghi không bao giờ bị giải phóng
+        self.dirty = False
+
+class _ShardNodeView:
+    """Giao diện giống graph.nodes của NetworkX; chỉ tải shard khi cần thuộc tính của node"""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __contains__(self, node_id):
+        return node_id in self.graph
+
+    def __len__(self):
+        return len(self.graph)
+
+    def __getitem__(self, node_id):
+        return self.graph.shard_for(node_id).graph.nodes[node_id]
+
+    def __iter__(self):
+        return iter(list(self.graph._routes.keys()))
+
+    def __call__(self, data=False):
+        if not data:
+            return iter(self)
+        return ((node_id, attrs) for shard in self.graph.iter_shards() for node_id, attrs in shard.graph.nodes(data=True))
+
+class _ShardEdgeView:
+    """Giao diện giống graph.edges của NetworkX; duyệt lần lượt từng shard rồi đến các edge giữa các shard"""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return self.graph.number_of_edges()
+
+    def __iter__(self):
+        return ((u, v) for u, v, _ in self(data=True))
+
+    def __call__(self, data=False):
+        edges = self.graph.iter_edges()
+        if not data:
+            return ((u, v) for u, v, _ in edges)
+        if data is True:
+            return edges
+        return ((u, v, attrs.get(data)) for u, v, attrs in edges)
+
+class _BucketedMap:
+    """
+    Bảng tra cứu khóa -> giá trị (giá trị dạng JSON) chia thành nhiều file theo băm của khóa.
+
+    Mỗi file chỉ được đọc khi tra cứu một khóa thuộc nó, nên tra một node hay một token
+    không phải đọc cả bảng. Giá trị trả về là đối tượng gốc: sau khi sửa tại chỗ phải gọi
+    touch() để file chứa khóa được ghi lại khi save().
+    """
+
+    def __init__(self, directory: str, prefix: str, buckets: int):
+        """
+        Khởi tạo bảng rỗng (chưa đọc file nào)
+
+        Args:
+            directory: Thư mục chứa các file của bảng
+            prefix: Tiền tố tên file
+            buckets: Số file của bảng
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.buckets = buckets
+        self._data: Dict[int, Dict] = {}
+        self._dirty = set()
+
+    def _path(self, bucket: int) -> str:
+        return os.path.join(self.directory, f"{self.prefix}-{bucket:03d}.json")
+
+    def _bucket_of(self, key: str) -> int:
+        # Băm ổn định giữa các tiến trình (hash() của str thay đổi theo từng lần chạy)
+        return zlib.crc32(str(key).encode('utf-8')) % self.buckets
+
+    def _load(self, bucket: int) -> Dict:
+        data = self._data.get(bucket)
+        if data is None:
+            data = {}
+            path = self._path(bucket)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            # Nhiều luồng đọc có thể cùng đọc một file: giữ bản được lưu trước
+            data = self._data.setdefault(bucket, data)
+        return data
+
+    def get(self, key: str, default=None):
+        return self._load(self._bucket_of(key)).get(key, default)
+
+    def __contains__(self, key):
+        return key in self._load(self._bucket_of(key))
+
+    def __getitem__(self, key: str):
+        return self._load(self._bucket_of(key))[key]
+
+    def __setitem__(self, key: str, value):
+        bucket = self._bucket_of(key)
+        self._load(bucket)[key] = value
+        self._dirty.add(bucket)
+
+    def setdefault(self, key: str, default):
+        """Như dict.setdefault; file chứa khóa được coi là có thay đổi"""
+        bucket = self._bucket_of(key)
+        self._dirty.add(bucket)
+        return self._load(bucket).setdefault(key, default)
+
+    def pop(self, key: str, default=None):
+        bucket = self._bucket_of(key)
+        data = self._load(bucket)
+        if key not in data:
+            return default
+        self._dirty.add(bucket)
+        return data.pop(key)
+
+    def touch(self, key: str):
+        """Đánh dấu file chứa khóa có thay đổi (sau khi sửa giá trị tại chỗ)"""
+        self._dirty.add(self._bucket_of(key))
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        """Duyệt mọi khóa (đọc mọi file của bảng)"""
+        for bucket in range(self.buckets):
+            yield from list(self._load(bucket).items())
+
+    def keys(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def clear(self):
+        """Làm rỗng bảng; mọi file được ghi lại khi save()"""
+        self._data = {bucket: {} for bucket in range(self.buckets)}
+        self._dirty = set(range(self.buckets))
+
+    def save(self):
+        """Ghi các file có thay đổi (ghi ra file tạm rồi đổi tên)"""
+        for bucket in sorted(self._dirty):
+            path = self._path(bucket)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._load(bucket), f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        self._dirty = set()
+
+class ShardedGraph:
+    """
+    Đồ thị kiến thức chia theo shard, có giao diện tối thiểu giống networkx.DiGraph.
+
+    Mỗi shard lưu các node cùng chủ đề và các edge giữa chúng trong một file snapshot.
+    Bảng định tuyến dùng chung (index.json) chỉ giữ số node, số edge của từng shard và
+    thống kê chỉ mục nên được đọc ngay khi khởi động. Các bảng tra cứu theo node hoặc
+    token (node -> (shard, loại), các edge nối hai shard khác nhau, số node chứa mỗi token
+    trong từng shard) được chia thành nhiều file theo băm của khóa và chỉ được đọc khi tra cứu.
+    Shard được tải khi truy cập lần đầu; khi tổng số node đã tải vượt giới hạn, các shard
+    không có thay đổi chưa ghi và ít được dùng nhất bị giải phóng.
+    """
+
+    def __init__(self, shard_dir: str, classifier: ShardClassifier, max_loaded_nodes: Optional[int] = None,
+                 binary: bool = False, lookup_buckets: int = 64):
+        """
+        Khởi tạo đồ thị rỗng (chưa đọc bảng định tuyến)
+
+        Args:
+            shard_dir: Thư mục chứa các file shard và bảng định tuyến
+            classifier: Bộ chọn shard cho node mới
+            max_loaded_nodes: Số node tối đa của các shard đang tải (None: không giới hạn)
+            binary: Ghi shard dạng nhị phân (.kgb) thay vì JSON
+            lookup_buckets: Số file của mỗi bảng tra cứu khi tạo bảng định tuyến mới
+        """
+        self.logger = logging.getLogger("ShardedGraph")
+        self.shard_dir = shard_dir
+        self.manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+        self.classifier = classifier
+        self.max_loaded_nodes = max_loaded_nodes
+        self.binary = binary
+        self.lookup_buckets = lookup_buckets
+        os.makedirs(shard_dir, exist_ok=True)
+
+        self.nodes = _ShardNodeView(self)
+        self.edges = _ShardEdgeView(self)
+
+        # Các shard đang tải, theo thứ tự dùng gần nhất ở cuối.
+        # Nhiều luồng đọc có thể cùng tải shard nên việc tải/giải phóng được bảo vệ bởi khóa.
+        self._loaded: "OrderedDict[str, _Shard]" = OrderedDict()
+        self._shard_lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+        self._reset_manifest(lookup_buckets)
+
+    def _reset_manifest(self, buckets: int):
+        # node -> [shard, loại node]
+        self._routes = _BucketedMap(self.shard_dir, ROUTES_PREFIX, buckets)
+        # node nguồn -> {node đích: thuộc tính} cho các edge nối hai shard
+        self._cross = _BucketedMap(self.shard_dir, CROSS_OUT_PREFIX, buckets)
+        # node đích -> [node nguồn] của các edge nối hai shard
+        self._cross_in = _BucketedMap(self.shard_dir, CROSS_IN_PREFIX, buckets)
+        # token -> {shard: số node trong shard chứa token}
+        self.term_shards = _BucketedMap(self.shard_dir, TERMS_PREFIX, buckets)
+        # shard -> số node, số edge bên trong shard
+        self._node_counts: Counter = Counter()
+        self._edge_counts: Counter = Counter()
+        # loại node ('unknown' nếu không có) -> số node
+        self._type_counts: Counter = Counter()
+        self._cross_count = 0
+        # trường -> tổng độ dài trường của mọi node (cho BM25)
+        self.field_lengths: Counter = Counter()
+        self._manifest_dirty = False
+
+    def _lookup_tables(self) -> List[_BucketedMap]:
+        return [self._routes, self._cross, self._cross_in, self.term_shards]
+
+    def __contains__(self, node_id):
+        return node_id in self._routes
+
+    def __len__(self):
+        return sum(self._node_counts.values())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    # ----- Bảng định tuyến -----
+
+    def load_manifest(self) -> bool:
+        """
+        Đọc bảng định tuyến từ đĩa (không tải shard và bảng tra cứu nào)
+
+        Returns:
+            bool: True nếu đã có bảng định tuyến
+        """
+        self._reset_manifest(self.lookup_buckets)
+        if not os.path.exists(self.manifest_path):
+            return False
+
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        version = manifest.get("version", 1)
+        if version < 3:
+            self._migrate_manifest(manifest)
+            return True
+
+        self._reset_manifest(manifest.get("buckets", self.lookup_buckets))
+        self._node_counts = Counter(manifest.get("node_counts", {}))
+        self._edge_counts = Counter(manifest.get("edge_counts", {}))
+        self._type_counts = Counter(manifest.get("type_counts", {}))
+        self._cross_count = manifest.get("cross_edge_count", 0)
+        self.field_lengths = Counter(manifest.get("field_lengths", {}))
+        return True
+
+    def _migrate_manifest(self, manifest: Dict):
+        """Chuyển bảng định tuyến của phiên bản cũ (mọi bảng nằm trong index.json) sang các bảng tra cứu"""
+        for table in self._lookup_tables():
+            table.clear()
+
+        for node_id, (name, node_type) in manifest.get("nodes", {}).items():
+            self._routes[node_id] = [name, node_type]
+            self._node_counts[name] += 1
+            self._count_type(node_type, 1)
+        for source, target, attrs in manifest.get("cross_edges", []):
+            self._cross.setdefault(source, {})[target] = attrs
+            self._cross_in.setdefault(target, []).append(source)
+            self._cross_count += 1
+        self._edge_counts = Counter(manifest.get("edge_counts", {}))
+
+        if manifest.get("version", 1) < 2:
+            self._rebuild_term_stats()
+        else:
+            for token, shards in manifest.get("terms", {}).items():
+                self.term_shards[token] = shards
+            self.field_lengths = Counter(manifest.get("field_lengths", {}))
+
+        self._write_manifest()
+        self.logger.info(f"Đã chuyển bảng định tuyến của {len(self)} node sang {self.lookup_buckets} file tra cứu")
+
+    def _rebuild_term_stats(self):
+        """Tính lại thống kê token từ chỉ mục của từng shard (bảng định tuyến ghi bởi phiên bản cũ)"""
+        self.term_shards.clear()
+        self.field_lengths = Counter()
+        for shard in self.iter_shards():
+            for fields in shard.index._node_tokens.values():
+                self.account_tokens(shard.name, fields, 1)
+        self.logger.info(f"Đã tính lại bảng token của {len(self.shard_names())} shard")
+
+    def _write_manifest(self):
+        # Bảng tra cứu được ghi trước để bảng định tuyến không trỏ tới dữ liệu chưa có trên đĩa
+        for table in self._lookup_tables():
+            table.save()
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "buckets": self._routes.buckets,
+            "node_counts": {name: count for name, count in self._node_counts.items() if count > 0},
+            "edge_counts": dict(self._edge_counts),
+            "type_counts": {node_type: count for node_type, count in self._type_counts.items() if count > 0},
+            "cross_edge_count": self._cross_count,
+            "field_lengths": dict(self.field_lengths)
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_dirty = False
+
+    def _count_type(self, node_type: Optional[str], sign: int):
+        self._type_counts[node_type or "unknown"] += sign
+        if self._type_counts[node_type or "unknown"] <= 0:
+            del self._type_counts[node_type or "unknown"]
+
+    def shard_of(self, node_id: str) -> Optional[str]:
+        """Tên shard chứa node (None nếu node không tồn tại), không cần tải shard"""
+        route = self._routes.get(node_id)
+        return route[0] if route else None
+
+    def type_counts(self) -> Dict[str, int]:
+        """Số node theo từng loại, đọc từ bảng định tuyến"""
+        return dict(self._type_counts)
+
+    def nodes_of_type(self, node_type: str) -> List[str]:
+        """Các node thuộc một loại, đọc từ bảng tra cứu node (đọc mọi file của bảng)"""
+        if node_type not in self._type_counts:
+            return []
+        return [node_id for node_id, (_, current) in self._routes.items() if (current or "unknown") == node_type]
+
+    def account_tokens(self, shard_name: str, fields: Dict[str, Counter], sign: int):
+        """
+        Cập nhật thống kê token dùng chung khi một node được thêm (sign=1) hoặc bỏ (sign=-1) khỏi chỉ mục
+
+        Args:
+            shard_name: Shard chứa node
+            fields: Token theo trường của node (như field_tokens())
+            sign: 1 hoặc -1
+        """
+        for field, tokens in fields.items():
+            self.field_lengths[field] += sign * sum(tokens.values())
+        for token in set().union(*(index_terms(tokens) for tokens in fields.values())):
+            shards = self.term_shards.setdefault(token, {})
+            shards[shard_name] = shards.get(shard_name, 0) + sign
+            if shards[shard_name] <= 0:
+                del shards[shard_name]
+                if not shards:
+                    self.term_shards.pop(token)
+        self._manifest_dirty = True
+
+    # ----- Tải và giải phóng shard -----
+
+    def _shard_path(self, name: str, binary: Optional[bool] = None) -> str:
+        if binary is None:
+            binary = self.binary
+        return os.path.join(self.shard_dir, name + (BINARY_EXTENSION if binary else ".json"))
+
+    def shard_names(self) -> List[str]:
+        """Tên các shard đang có node hoặc đang được tải"""
+        names = {name for name, count in self._node_counts.items() if count > 0}
+        names.update(self._loaded)
+        return sorted(names)
+
+    def shard(self, name: str) -> _Shard:
+        """
+        Lấy một shard, tải từ đĩa nếu chưa có trong bộ nhớ
+
+        Args:
+            name: Tên shard
+
+        Returns:
+            _Shard: Shard đã tải (shard mới chưa có file là shard rỗng)
+        """
+        with self._shard_lock:
+            shard = self._loaded.get(name)
+            if shard is not None:
+                self._loaded.move_to_end(name)
+                return shard
+
+            graph = nx.DiGraph()
+            for binary in (self.binary, not self.binary):
+                path = self._shard_path(name, binary)
+                if os.path.exists(path):
+                    graph = read_snapshot(path)
+                    self.loads += 1
+                    self.logger.debug(f"Đã tải shard {name} với {len(graph.nodes)} nodes")
+                    break
+
+            shard = _Shard(name, graph)
+            self._loaded[name] = shard
+            self._evict(keep=name)
+            return shard
+
+    def shard_for(self, node_id: str) -> _Shard:
+        """
+        Shard chứa một node
+
+        Raises:
+            KeyError: Nếu node không tồn tại
+        """
+        route = self._routes.get(node_id)
+        if route is None:
+            raise KeyError(node_id)
+        return self.shard(route[0])
+
+    def indexed_shard(self, node_id: str) -> Optional[_Shard]:
+        """Shard đang tải có chỉ mục chứa node (kể cả node vừa bị xóa khỏi đồ thị)"""
+        name = self.shard_of(node_id)
+        if name is not None:
+            return self.shard(name)
+        with self._shard_lock:
+            for shard in self._loaded.values():
+                if node_id in shard.index:
+                    return shard
+        return None
+
+    def _evict(self, keep: str):
+        """Giải phóng các shard không có thay đổi, ít dùng nhất, đến khi về dưới giới hạn node"""
+        if self.max_loaded_nodes is None:
+            return
+        loaded_nodes = sum(len(shard.graph) for shard in self._loaded.values())
+        for name in list(self._loaded):
+            if loaded_nodes <= self.max_loaded_nodes:
+                break
+            shard = self._loaded[name]
+            if name == keep or shard.dirty:
+                continue
+            del self._loaded[name]
+            loaded_nodes -= len(shard.graph)
+            self.evictions += 1
+            self.logger.debug(f"Đã giải phóng shard {name}")
+
+    def iter_shards(self) -> Iterator[_Shard]:
+        """Duyệt lần lượt mọi shard (các shard cũ có thể bị giải phóng trong lúc duyệt)"""
+        for name in self.shard_names():
+            yield self.shard(name)
+
+    def loaded_shards(self) -> List[str]:
+        """Tên các shard đang nằm trong bộ nhớ"""
+        with self._shard_lock:
+            return list(self._loaded)
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Thống kê từng shard
+
+        Returns:
+            dict: {shard: {nodes, edges, loaded, dirty}}
+        """
+        with self._shard_lock:
+            loaded = dict(self._loaded)
+        return {
+            name: {
+                "nodes": self._node_counts.get(name, 0),
+                "edges": self._edge_counts.get(name, 0),
+                "loaded": name in loaded,
+                "dirty": name in loaded and loaded[name].dirty
+            }
+            for name in self.shard_names()
+        }
+
+    # ----- Ghi xuống đĩa -----
+
+    def save(self) -> int:
+        """
+        Ghi các shard có thay đổi rồi ghi bảng định tuyến.
+        Mỗi file được ghi ra file tạm rồi đổi tên nên không bao giờ bị ghi dở.
+
+        Returns:
+            int: Số shard đã ghi
+        """
+        with self._shard_lock:
+            dirty = [shard for shard in self._loaded.values() if shard.dirty]
+            for shard in dirty:
+                path = self._shard_path(shard.name)
+                tmp_path = path + ".tmp"
+                write_snapshot(shard.graph, tmp_path, binary=self.binary)
+                os.replace(tmp_path, path)
+                # File ở định dạng còn lại (nếu đã đổi snapshot_format) đã cũ
+                stale = self._shard_path(shard.name, not self.binary)
+                if os.path.exists(stale):
+                    os.remove(stale)
+                shard.dirty = False
+
+            if dirty or self._manifest_dirty:
+                self._write_manifest()
+            self._evict(keep=None)
+        return len(dirty)
+
+    def discard_changes(self):
+        """Bỏ mọi thay đổi chưa ghi: giải phóng các shard có thay đổi, đọc lại bảng định tuyến và bỏ các bảng tra cứu đã đọc"""
+        with self._shard_lock:
+            for name in [name for name, shard in self._loaded.items() if shard.dirty]:
+                del self._loaded[name]
+            self.load_manifest()
+
+    # ----- Giao diện giống networkx.DiGraph -----
+
+    def add_node(self, node_id: str, /, **attrs):
+        """Thêm hoặc cập nhật node; node mới được xếp vào shard theo chủ đề"""
+        route = self._routes.get(node_id)
+        name = route[0] if route else self.classifier.classify(node_id, attrs)
+        shard = self.shard(name)
+        shard.graph.add_node(node_id, **attrs)
+        shard.dirty = True
+
+        node_type = shard.graph.nodes[node_id].get("type")
+        if route is None:
+            self._node_counts[name] += 1
+        else:
+            self._count_type(route[1], -1)
+        self._count_type(node_type, 1)
+        self._routes[node_id] = [name, node_type]
+        self._manifest_dirty = True
+
+    def remove_node(self, node_id: str):
+        """Xóa node cùng mọi edge vào/ra của nó"""
+        shard = self.shard_for(node_id)
+        graph = shard.graph
+        self._edge_counts[shard.name] -= graph.in_degree(node_id) + graph.out_degree(node_id) - graph.has_edge(node_id, node_id)
+        graph.remove_node(node_id)
+        shard.dirty = True
+
+        targets, sources = self._cross.pop(node_id, {}), self._cross_in.pop(node_id, [])
+        for target in targets:
+            self._unlink_cross_in(target, node_id)
+        for source in sources:
+            self._unlink_cross_out(source, node_id)
+        self._cross_count -= len(targets) + len(sources)
+
+        route = self._routes.pop(node_id)
+        self._node_counts[shard.name] -= 1
+        self._count_type(route[1], -1)
+        self._manifest_dirty = True
+
+    def _unlink_cross_out(self, source: str, target: str):
+        """Bỏ edge giữa hai shard khỏi bảng chiều ra của node nguồn"""
+        targets = self._cross[source]
+        del targets[target]
+        if targets:
+            self._cross.touch(source)
+        else:
+            self._cross.pop(source)
+
+    def _unlink_cross_in(self, target: str, source: str):
+        """Bỏ edge giữa hai shard khỏi bảng chiều vào của node đích"""
+        sources = self._cross_in[target]
+        sources.remove(source)
+        if sources:
+            self._cross_in.touch(target)
+        else:
+            self._cross_in.pop(target)
+
+    def add_edge(self, source: str, target: str, /, **attrs):
+        """Thêm hoặc cập nhật edge giữa hai node đã tồn tại"""
+        source_shard, target_shard = self.shard_of(source), self.shard_of(target)
+        if source_shard is None or target_shard is None:
+            raise nx.NetworkXError(f"Node không tồn tại: {source if source_shard is None else target}")
+
+        if source_shard == target_shard:
+            shard = self.shard(source_shard)
+            if not shard.graph.has_edge(source, target):
+                self._edge_counts[source_shard] += 1
+            shard.graph.add_edge(source, target, **attrs)
+            shard.dirty = True
+        else:
+            targets = self._cross.setdefault(source, {})
+            if target not in targets:
+                self._cross_in.setdefault(target, []).append(source)
+                self._cross_count += 1
+            targets.setdefault(target, {}).update(attrs)
+        self._manifest_dirty = True
+
+    def remove_edge(self, source: str, target: str):
+        """Xóa edge"""
+        if not self.has_edge(source, target):
+            raise nx.NetworkXError(f"Edge {source}-{target} không tồn tại")
+
+        name = self.shard_of(source)
+        if name == self.shard_of(target):
+            shard = self.shard(name)
+            shard.graph.remove_edge(source, target)
+            shard.dirty = True
+            self._edge_counts[name] -= 1
+        else:
+            self._unlink_cross_out(source, target)
+            self._unlink_cross_in(target, source)
+            self._cross_count -= 1
+        self._manifest_dirty = True
+
+    def has_edge(self, source: str, target: str) -> bool:
+        source_shard, target_shard = self.shard_of(source), self.shard_of(target)
+        if source_shard is None or target_shard is None:
+            return False
+        if source_shard != target_shard:
+            return target in self._cross.get(source, {})
+        return self.shard(source_shard).graph.has_edge(source, target)
+
+    def get_edge_data(self, source: str, target: str, default=None):
+        if not self.has_edge(source, target):
+            return default
+        return self[source][target]
+
+    def __getitem__(self, node_id: str) -> Dict[str, Dict]:
+        """Các node kế tiếp của node cùng thuộc tính edge (thuộc tính là dict gốc, không phải bản sao)"""
+        adjacency = dict(self.shard_for(node_id).graph.succ[node_id])
+        adjacency.update(self._cross.get(node_id, {}))
+        return adjacency
+
+    def neighbors_data(self, node_id: str, direction: str = "out") -> Iterator[Tuple[str, Dict]]:
+        """
+        Các node kề của node cùng thuộc tính edge nối chúng
+
+        Args:
+            node_id: ID của node
+            direction: 'out' (node kế tiếp), 'in' (node đứng trước) hoặc 'both'
+        """
+        graph = self.shard_for(node_id).graph
+        if direction in ("out", "both"):
+            yield from graph.succ[node_id].items()
+            yield from self._cross.get(node_id, {}).items()
+        if direction in ("in", "both"):
+            yield from graph.pred[node_id].items()
+            for source in self._cross_in.get(node_id, ()):
+                yield source, self._cross[source][node_id]
+
+    def out_edges(self, node_id: str, data: bool = False) -> List[tuple]:
+        return [(node_id, target, attrs) if data else (node_id, target)
+                for target, attrs in self.neighbors_data(node_id, "out")]
+
+    def in_edges(self, node_id: str, data: bool = False) -> List[tuple]:
+        return [(source, node_id, attrs) if data else (source, node_id)
+                for source, attrs in self.neighbors_data(node_id, "in")]
+
+    def number_of_edges(self) -> int:
+        return sum(self._edge_counts.values()) + self._cross_count
+
+    def iter_edges(self) -> Iterator[Tuple[str, str, Dict]]:
+        """Mọi edge (u, v, thuộc tính): lần lượt từng shard rồi đến các edge giữa các shard"""
+        for shard in self.iter_shards():
+            yield from shard.graph.edges(data=True)
+        for source, targets in self._cross.items():
+            for target, attrs in targets.items():
+                yield source, target, attrs
+
+class ShardedKeywordIndex(KeywordIndex):
+    """
+    Chỉ mục BM25 phân tán theo shard: mỗi shard đã tải giữ posting của các node trong shard,
+    còn số node chứa mỗi token và tổng độ dài trường nằm trong bảng định tuyến dùng chung.
+    Một truy vấn chỉ tải các shard có chứa ít nhất một token của câu hỏi, và điểm BM25
+    được tính theo thống kê của toàn bộ đồ thị nên không phụ thuộc cách chia shard.
+    """
+
+    def __init__(self, graph: ShardedGraph, **kwargs):
+        """
+        Khởi tạo chỉ mục
+
+        Args:
+            graph: Đồ thị chia shard sở hữu các chỉ mục con
+            **kwargs: Tham số BM25 truyền cho KeywordIndex
+        """
+        super().__init__(**kwargs)
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph)
+
+    def __contains__(self, node_id):
+        return node_id in self.graph
+
+    def build(self, nodes):
+        for node_id, attrs in nodes:
+            self.add(node_id, attrs)
+
+    def add(self, node_id: str, attrs: Dict):
+        shard = self.graph.shard_for(node_id)
+        previous = shard.index._node_tokens.get(node_id)
+        if previous is not None:
+            self.graph.account_tokens(shard.name, previous, -1)
+        shard.index.add(node_id, attrs)
+        self.graph.account_tokens(shard.name, shard.index._node_tokens[node_id], 1)
+
+    def remove(self, node_id: str):
+        shard = self.graph.indexed_shard(node_id)
+        if shard is None or node_id not in shard.index:
+            return
+        self.graph.account_tokens(shard.name, shard.index._node_tokens[node_id], -1)
+        shard.index.remove(node_id)
+
+    def shards_for(self, terms: List[str]) -> List[str]:
+        """Các shard chứa ít nhất một token (không cần tải shard)"""
+        names = set()
+        for term in terms:
+            names.update(self.graph.term_shards.get(term, ()))
+        return sorted(names)
+
+    def _collection_stats(self):
+        return len(self.graph), self.graph.field_lengths
+
+    def _term_postings(self, term):
+        shards = dict(self.graph.term_shards.get(term, {}))
+        postings = []
+        for name in shards:
+            postings.extend(self.graph.shard(name).index._term_postings(term)[1])
+        return sum(shards.values()), postings
+
+class _ShardGraphIndex(GraphIndex):
+    """Chỉ mục phụ đọc từ bảng định tuyến của ShardedGraph: loại node có sẵn, quan hệ đọc từ shard khi cần"""
+
+    def __init__(self, graph: ShardedGraph):
+        super().__init__()
+        self.graph = graph
+
+    # Bảng định tuyến được ShardedGraph cập nhật cùng lúc với đồ thị
+    def build(self, graph):
+        pass
+
+    def set_node_type(self, node_id, node_type):
+        pass
+
+    def remove_node(self, node_id):
+        pass
+
+    def add_edge(self, source, target, relation_type):
+        pass
+
+    def remove_edge(self, source, target):
+        pass
+
+    def type_counts(self):
+        return self.graph.type_counts()
+
+    def nodes_of_type(self, node_type):
+        return self.graph.nodes_of_type(node_type)
+
+    def neighbors(self, node_id, relation_type):
+        return [target for target, attrs in self.graph.neighbors_data(node_id, "out")
+                if attrs.get("relation_type") == relation_type]
+
+class ShardedKnowledgeBase(KnowledgeBase):
+    """
+    Knowledge Base chia đồ thị thành các shard theo chủ đề (config.MATH_CATEGORIES).
+
+    Khởi động chỉ đọc bảng định tuyến, không tải shard nào. Truy vấn từ khóa chỉ tải
+    các shard chứa token của câu hỏi (câu hỏi về "đồng hồ" chỉ tải shard measurement),
+    duyệt quan hệ, lan truyền kích hoạt và tìm đường đi chỉ tải shard của các node đi qua.
+    Chỉ khung nhìn CSR của toàn bộ đồ thị (csr_view, ví dụ khi xuất snapshot mmap) đọc lần lượt mọi shard.
+
+    Mỗi shard được ghi nguyên tử và bảng định tuyến ghi sau cùng nên không dùng journal
+    và backup delta. Lô thay đổi bị lỗi được hoàn tác bằng cách đọc lại từ đĩa, vì vậy
+    cũng bỏ các thay đổi chưa lưu từ trước khi mở lô.
+
+    Shard được tải và bỏ theo nhu cầu nên không dựng phiên bản (MVCC): truy vấn giữ khóa đọc.
+    """
+
+    _mvcc = False
+
+    def __init__(self):
+        """Khởi tạo knowledge base chia shard"""
+        self.logger = logging.getLogger("KnowledgeBase")
+        self._lock = RWLock()
+
+        # Tạo thư mục lưu trữ nếu chưa tồn tại
+        os.makedirs(config.KNOWLEDGE_GRAPH_DIR, exist_ok=True)
+        self.graph_path = config.KB_CONFIG['graph_file']
+        self.binary_graph_path = config.KB_CONFIG['binary_graph_file']
+        self.shard_dir = config.KB_CONFIG['shard_dir']
+
+        self.journal = None
+        self.backups = None
+
+        settings = config.KB_CONFIG.get('sharding', {})
+        classifier = ShardClassifier(config.MATH_CATEGORIES, settings.get('category_keywords', {}),
+                                     settings.get('default_shard', 'general'))
+        self._graph = ShardedGraph(self.shard_dir, classifier,
+                                   max_loaded_nodes=settings.get('max_loaded_nodes'),
+                                   binary=config.KB_CONFIG.get('snapshot_format', 'json') == 'binary',
+                                   lookup_buckets=settings.get('lookup_buckets', 64))
+        self._init_versions()
+        self.index = ShardedKeywordIndex(self._graph, **index_options())
+        self.graph_index = _ShardGraphIndex(self._graph)
+        self.query_cache = QueryCache(config.KB_CONFIG.get('query_cache_size', 256))
+        self.access_log = AccessLog(config.KB_CONFIG['access_log_file'])
+        self._reset_batch()
+
+        # Chia snapshot một khối cũ thành các shard ở lần chạy đầu tiên
+        if not self._graph.load_manifest():
+            self._split_snapshot()
+
+        self.logger.info(f"Knowledge Base (sharded) đã khởi tạo với {len(self.graph.nodes)} nodes "
+                         f"và {len(self.graph.edges)} edges trong {len(self._graph.shard_names())} shard")
+
+    @property
+    def graph(self):
+        """Đồ thị chia shard với giao diện giống networkx.DiGraph"""
+        return self._graph
+
+    def _split_snapshot(self):
+        """Chia snapshot một khối (nếu có) thành các shard và ghi bảng định tuyến"""
+        path = self._current_snapshot_file()
+        if path is None:
+            return
+
+        try:
+            source = self._read_graph_file(path)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi đọc {path} để chia shard: {e}")
+            return
+
+        with self._lock.write_lock():
+            for node_id, attrs in source.nodes(data=True):
+                self._graph.add_node(node_id, **attrs)
+                self.index.add(node_id, attrs)
+            for source_id, target_id, attrs in source.edges(data=True):
+                self._graph.add_edge(source_id, target_id, **attrs)
+            self._graph.save()
+
+        self.logger.info(f"Đã chia {path} thành {len(self._graph.shard_names())} shard")
+
+    @_writer
+    def save(self):
+        """Ghi các shard có thay đổi và bảng định tuyến (dời đến cuối lô nếu đang trong lô)"""
+        if self._batch_depth:
+            self._batch_save = True
+            return
+
+        self.access_log.flush()
+        try:
+            written = self._graph.save()
+        except Exception as e:
+            self.logger.error(f"Lỗi khi lưu đồ thị kiến thức: {e}")
+            return
+
+        if written:
+            self.logger.info(f"Đã lưu {written} shard của đồ thị kiến thức")
+
+    def checkpoint(self):
+        """Mỗi lần lưu đã là một checkpoint đầy đủ"""
+        self.save()
+
+    def storage_files(self):
+        if not os.path.isdir(self.shard_dir):
+            return []
+        return [os.path.join(self.shard_dir, name) for name in sorted(os.listdir(self.shard_dir))
+                if not name.endswith(".tmp")]
+
+    def _rollback_batch(self):
+        """Hoàn tác lô bằng cách đọc lại các shard có thay đổi và bảng định tuyến từ đĩa"""
+        self.logger.warning(f"Đã hoàn tác lô {self._batch_changes} thay đổi do lỗi")
+        self._graph.discard_changes()
+        self._batch_reindex = set()
+        self._mark_changed(structure=True)
+
+    def _put_edge(self, source, target, relation_type, attributes, preserve_timestamps=False):
+        attributes["relation_type"] = relation_type
+        if not (preserve_timestamps and "created_at" in attributes):
+            attributes["created_at"] = self.now()
+
+        old = self._graph.get_edge_data(source, target)
+        exists = old is not None
+        old_relation = old.get("relation_type") if exists else None
+        self._graph.add_edge(source, target, **attributes)
+        self._mark_changed(structure=not exists or old_relation != relation_type,
+                           change=("add_edge", source, target, relation_type))
+
+        if not self._batch_depth:
+            self.logger.debug(f"Đã {'cập nhật' if exists else 'thêm'} edge: {source} -> {target} ({relation_type})")
+
+    def _traverse(self, roots, max_depth, direction, relation_type=None, max_nodes=None):
+        """
+        Duyệt theo chiều rộng qua bảng định tuyến và các shard của node đi qua
+
+        Yields:
+            tuple: (node nguồn, node mới, thuộc tính edge) theo thứ tự thăm
+        """
+        visited = set(roots)
+        frontier = list(roots)
+        found = 0
+        for _ in range(max_depth):
+            next_frontier = []
+            for src_id in frontier:
+                for dst_id, edge in self._graph.neighbors_data(src_id, direction):
+                    if dst_id in visited:
+                        continue
+                    if relation_type is not None and edge.get("relation_type") != relation_type:
+                        continue
+                    if max_nodes is not None and found >= max_nodes:
+                        return
+                    visited.add(dst_id)
+                    next_frontier.append(dst_id)
+                    found += 1
+                    yield src_id, dst_id, edge
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+    @_reader
+    def get_related_nodes(self, node_id, relation_type=None, max_depth=1, direction="out", max_nodes=None):
+        if node_id not in self.graph.nodes:
+            self.logger.warning(f"Node không tồn tại: {node_id}")
+            return []
+
+        if max_nodes is None:
+            max_nodes = config.KB_CONFIG.get('traversal_max_nodes')
+
+        return [(dst_id, dict(self.graph.nodes[dst_id]), dict(edge))
+                for _, dst_id, edge in self._traverse([node_id], max_depth, direction, relation_type, max_nodes)]
+
+    @_reader
+    def get_subgraph(self, node_ids, max_depth=1, direction="both", relation_type=None, max_nodes=None):
+        # Đồ thị con là bản sao nhỏ dựng từ các shard đi qua, không phải khung nhìn
+        if max_nodes is None:
+            max_nodes = config.KB_CONFIG.get('traversal_max_nodes')
+
+        roots = [node_id for node_id in node_ids if node_id in self.graph.nodes]
+        selected = set(roots)
+        selected.update(dst_id for _, dst_id, _ in self._traverse(roots, max_depth, direction, relation_type, max_nodes))
+
+        subgraph = nx.DiGraph()
+        for node_id in selected:
+            subgraph.add_node(node_id, **self.graph.nodes[node_id])
+        for node_id in selected:
+            for target, attrs in self._graph.neighbors_data(node_id, "out"):
+                if target in selected:
+                    subgraph.add_edge(node_id, target, **attrs)
+        return subgraph
+
+    @_reader
+    def find_paths(self, start_node, end_node, max_length=3):
+        # Mọi đường đi tối đa max_length edge nằm trong vùng max_length bước theo chiều ra từ start_node
+        if start_node not in self._graph or end_node not in self._graph:
+            return []
+        view = self._local_csr([start_node], max_length, "out")
+        if end_node not in view.index:
+            return []
+        return find_paths(self.graph, start_node, end_node, max_length, view=view)
+
+    def _spread(self, seeds, top_k, min_relevance, hops=None):
+        """Lan truyền kích hoạt trên vùng quanh các hạt giống thay vì khung nhìn CSR của toàn bộ đồ thị"""
+        if hops is None:
+            hops = spreading_options().get('hops', 2)
+        view = self._local_csr([node for node, relevance in seeds if relevance > 0], hops)
+        return rank_by_spreading(view, seeds, top_k, min_relevance, hops)
+
+    def _local_csr(self, roots, depth, direction="both"):
+        """
+        Khung nhìn CSR của vùng quanh các node gốc: các node cách gốc tối đa depth bước theo hướng
+        direction cùng mọi edge (theo hướng đó) của các node cách gốc ít hơn depth bước.
+        Lan truyền hoặc tìm đường đi tối đa depth bước từ các gốc trên vùng này cho cùng kết quả
+        như trên toàn bộ đồ thị, nhưng chỉ tải shard của các node bên trong vùng.
+
+        Args:
+            roots (list): Các node gốc (node không tồn tại bị bỏ qua)
+            depth (int): Số bước tối đa
+            direction (str, optional): 'out', 'in' hoặc 'both'
+
+        Returns:
+            CSRGraph: Khung nhìn chỉ đọc của vùng
+        """
+        directions = ("out", "in") if direction == "both" else (direction,)
+        graph = nx.DiGraph()
+        frontier = [node_id for node_id in dict.fromkeys(roots) if node_id in self._graph]
+        graph.add_nodes_from(frontier)
+        for _ in range(depth):
+            next_frontier = []
+            for node_id in frontier:
+                for d in directions:
+                    for other, edge in self._graph.neighbors_data(node_id, d):
+                        if other not in graph:
+                            graph.add_node(other)
+                            next_frontier.append(other)
+                        source, target = (node_id, other) if d == "out" else (other, node_id)
+                        graph.add_edge(source, target, relation_type=edge.get("relation_type") or UNKNOWN_RELATION)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return CSRGraph.from_networkx(graph)
+
+    @_reader
+    def csr_view(self):
+        """Khung nhìn CSR của toàn bộ đồ thị (đọc lần lượt mọi shard khi dựng), vá theo các thay đổi sau đó"""
+        return self._patched_csr(self._build_csr)
+
+    def _build_csr(self):
+        """Dựng khung nhìn CSR từ đầu bằng cấu trúc của mọi shard"""
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.graph.nodes)
+        graph.add_edges_from((u, v, {"relation_type": rel or UNKNOWN_RELATION})
+                             for u, v, rel in self.graph.edges(data="relation_type"))
+        return CSRGraph.from_networkx(graph)
+
+    def shard_stats(self):
+        """
+        Thống kê các shard
+
+        Returns:
+            dict: {shard: {nodes, edges, loaded, dirty}}
+        """
+        return self._graph.stats()
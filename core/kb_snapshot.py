@@ -0,0 +1,192 @@
+"""
+KB Snapshot - Đọc/ghi snapshot đồ thị kiến thức ở dạng JSON (node-link) và dạng nhị phân
+"""
+
+import os
+import gc
+import json
+import time
+import zlib
+import pickle
+import struct
+import logging
+import tracemalloc
+from typing import Dict
+
+import networkx as nx
+
+logger = logging.getLogger("KBSnapshot")
+
+# Header snapshot nhị phân: magic, phiên bản, CRC32 của payload, độ dài payload
+BINARY_MAGIC = b"SAGIKG\x00\x01"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct(">8sHIQ")
+BINARY_EXTENSION = ".kgb"
+
+class SnapshotError(Exception):
+    """Lỗi khi snapshot không hợp lệ (sai magic, phiên bản hoặc checksum)"""
+    pass
+
+def is_binary_snapshot(path: str) -> bool:
+    """Kiểm tra đường dẫn có phải snapshot nhị phân không (theo phần mở rộng)"""
+    return path.endswith(BINARY_EXTENSION)
+
+def read_json_snapshot(path: str) -> nx.DiGraph:
+    """
+    Đọc snapshot JSON dạng node-link
+
+    Args:
+        path: Đường dẫn file JSON
+
+    Returns:
+        networkx.DiGraph: Đồ thị đã đọc
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        graph_data = json.load(f)
+    return nx.node_link_graph(graph_data)
+
+def write_json_snapshot(graph: nx.DiGraph, path: str):
+    """
+    Ghi snapshot JSON dạng node-link
+
+    Args:
+        graph: Đồ thị cần ghi
+        path: Đường dẫn file JSON
+    """
+    graph_data = nx.node_link_data(graph)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(graph_data, f, ensure_ascii=False, indent=2)
+
+def read_binary_snapshot(path: str) -> nx.DiGraph:
+    """
+    Đọc snapshot nhị phân, kiểm tra header và checksum
+
+    Args:
+        path: Đường dẫn file .kgb
+
+    Returns:
+        networkx.DiGraph: Đồ thị đã đọc
+
+    Raises:
+        SnapshotError: Nếu file không đúng định dạng hoặc bị hỏng
+    """
+    with open(path, 'rb') as f:
+        header = f.read(BINARY_HEADER.size)
+        if len(header) != BINARY_HEADER.size:
+            raise SnapshotError(f"Header snapshot không đầy đủ: {path}")
+
+        magic, version, checksum, length = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC:
+            raise SnapshotError(f"Không phải snapshot nhị phân: {path}")
+        if version != BINARY_VERSION:
+            raise SnapshotError(f"Phiên bản snapshot không được hỗ trợ: {version}")
+
+        payload = f.read(length)
+
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise SnapshotError(f"Checksum snapshot không khớp: {path}")
+
+    data = pickle.loads(payload)
+    graph = nx.DiGraph(**data["graph"])
+    graph.add_nodes_from(data["nodes"])
+    graph.add_edges_from(data["edges"])
+    return graph
+
+def write_binary_snapshot(graph: nx.DiGraph, path: str):
+    """
+    Ghi snapshot nhị phân (pickle protocol 5 kèm header và CRC32)
+
+    Args:
+        graph: Đồ thị cần ghi
+        path: Đường dẫn file .kgb
+    """
+    data = {
+        "graph": dict(graph.graph),
+        "nodes": list(graph.nodes(data=True)),
+        "edges": list(graph.edges(data=True))
+    }
+    payload = pickle.dumps(data, protocol=5)
+    with open(path, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, zlib.crc32(payload), len(payload)))
+        f.write(payload)
+
+def read_snapshot(path: str) -> nx.DiGraph:
+    """Đọc snapshot, chọn định dạng theo phần mở rộng"""
+    if is_binary_snapshot(path):
+        return read_binary_snapshot(path)
+    return read_json_snapshot(path)
+
+def write_snapshot(graph: nx.DiGraph, path: str, binary: bool = None):
+    """
+    Ghi snapshot
+
+    Args:
+        graph: Đồ thị cần ghi
+        path: Đường dẫn file
+        binary: Ghi dạng nhị phân hay JSON (mặc định: theo phần mở rộng của path)
+    """
+    if binary is None:
+        binary = is_binary_snapshot(path)
+    if binary:
+        write_binary_snapshot(graph, path)
+    else:
+        write_json_snapshot(graph, path)
+
+def convert_snapshot(src: str, dst: str) -> nx.DiGraph:
+    """
+    Chuyển đổi snapshot giữa JSON và nhị phân (theo phần mở rộng của src và dst)
+
+    Args:
+        src: File nguồn
+        dst: File đích
+
+    Returns:
+        networkx.DiGraph: Đồ thị đã chuyển đổi
+    """
+    graph = read_snapshot(src)
+    tmp_path = dst + ".tmp"
+    write_snapshot(graph, tmp_path, binary=is_binary_snapshot(dst))
+    os.replace(tmp_path, dst)
+    logger.info(f"Đã chuyển {src} -> {dst} ({len(graph.nodes)} nodes, {len(graph.edges)} edges)")
+    return graph
+
+def benchmark_snapshot_formats(json_path: str, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    So sánh thời gian tải và bộ nhớ đỉnh giữa snapshot JSON và nhị phân
+
+    Args:
+        json_path: Snapshot JSON dùng làm dữ liệu gốc
+        repeat: Số lần đo cho mỗi định dạng (lấy thời gian nhỏ nhất)
+
+    Returns:
+        dict: {format: {"load_seconds", "peak_mb", "file_kb"}}
+    """
+    binary_path = os.path.splitext(json_path)[0] + ".bench" + BINARY_EXTENSION
+    convert_snapshot(json_path, binary_path)
+
+    results = {}
+    try:
+        for name, path in (("json", json_path), ("binary", binary_path)):
+            # Đo thời gian không bật tracemalloc để tránh sai lệch
+            best = float("inf")
+            for _ in range(max(1, repeat)):
+                gc.collect()
+                start = time.perf_counter()
+                read_snapshot(path)
+                best = min(best, time.perf_counter() - start)
+
+            gc.collect()
+            tracemalloc.start()
+            read_snapshot(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = {
+                "load_seconds": best,
+                "peak_mb": peak / (1024 * 1024),
+                "file_kb": os.path.getsize(path) / 1024
+            }
+    finally:
+        os.remove(binary_path)
+
+    return results
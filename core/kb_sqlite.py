@@ -0,0 +1,643 @@
+"""
+SQLite Knowledge Base - Lưu trữ đồ thị kiến thức trong SQLite, chỉ tải phần dữ liệu cần dùng
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import networkx as nx
+
+import config
+from core.knowledge_base import KnowledgeBase, index_options, _reader, _writer, _exclusive
+from core.kb_index import INDEX_FORMAT, KeywordIndex, field_tokens, index_terms
+from core.kb_cache import QueryCache
+from core.kb_access import AccessLog
+from core.kb_versions import KBVersion
+from utils.csr_graph import CSRGraph, UNKNOWN_RELATION
+from utils.rwlock import RWLock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    type TEXT,
+    attrs TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS edges (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    relation_type TEXT,
+    attrs TEXT NOT NULL,
+    PRIMARY KEY (source, target)
+);
+CREATE TABLE IF NOT EXISTS term_postings (
+    token TEXT NOT NULL,
+    field TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (token, field, node_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS field_lengths (
+    node_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (node_id, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS index_stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(type);
+CREATE INDEX IF NOT EXISTS idx_nodes_updated_at ON nodes(updated_at);
+CREATE INDEX IF NOT EXISTS idx_edges_relation_type ON edges(relation_type);
+CREATE INDEX IF NOT EXISTS idx_edges_source_relation ON edges(source, relation_type);
+CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target);
+CREATE INDEX IF NOT EXISTS idx_term_postings_node ON term_postings(node_id);
+DROP TABLE IF EXISTS node_tokens;
+"""
+
+# Số dòng đọc mỗi lần khi duyệt toàn bộ bảng
+PAGE_SIZE = 500
+
+class SQLiteKeywordIndex(KeywordIndex):
+    """
+    Chỉ mục BM25 lưu trong SQLite: posting theo trường (term_postings), độ dài trường
+    (field_lengths) và các tổng dùng cho IDF/độ dài trung bình (index_stats)
+    """
+
+    def __init__(self, kb, **kwargs):
+        """
+        Khởi tạo chỉ mục
+
+        Args:
+            kb (SQLiteKnowledgeBase): Knowledge base sở hữu kết nối SQLite
+            **kwargs: Tham số BM25 truyền cho KeywordIndex
+        """
+        super().__init__(**kwargs)
+        self.kb = kb
+
+    def __len__(self):
+        return len(self.kb.graph.nodes)
+
+    def __contains__(self, node_id):
+        return node_id in self.kb.graph.nodes
+
+    def build(self, nodes):
+        self.clear()
+        for node_id, attrs in nodes:
+            self.add(node_id, attrs)
+
+    # Các phương thức ghi chỉ được gọi khi giữ khóa ghi nên dùng thẳng kết nối ghi
+    def clear(self):
+        self.kb.conn.execute("DELETE FROM term_postings")
+        self.kb.conn.execute("DELETE FROM field_lengths")
+        self.kb.conn.execute("DELETE FROM index_stats")
+        self.kb.conn.execute("INSERT INTO index_stats (key, value) VALUES ('format', ?)", (INDEX_FORMAT,))
+
+    def is_stale(self) -> bool:
+        """Chỉ mục chưa được dựng hoặc được ghi theo định dạng cũ (cơ sở dữ liệu tạo bởi phiên bản trước)"""
+        row = self.kb._fetchone("SELECT value FROM index_stats WHERE key = 'format'")
+        return row is None or row[0] != INDEX_FORMAT
+
+    def add(self, node_id: str, attrs: Dict):
+        fields = field_tokens(node_id, attrs)
+        postings = [(token, field, node_id, tf) for field, tokens in fields.items()
+                    for token, tf in index_terms(tokens).items()]
+        lengths = [(node_id, field, sum(tokens.values())) for field, tokens in fields.items()]
+        self.remove(node_id)
+        self.kb.conn.executemany("INSERT INTO term_postings (token, field, node_id, tf) VALUES (?, ?, ?, ?)", postings)
+        self.kb.conn.executemany("INSERT INTO field_lengths (node_id, field, length) VALUES (?, ?, ?)", lengths)
+        self._bump_stats([("nodes", 1)] + [(f"len:{field}", length) for _, field, length in lengths])
+
+    def remove(self, node_id: str):
+        lengths = self.kb._fetchall("SELECT field, length FROM field_lengths WHERE node_id = ?", (node_id,))
+        if not lengths:
+            return
+        self.kb.conn.execute("DELETE FROM term_postings WHERE node_id = ?", (node_id,))
+        self.kb.conn.execute("DELETE FROM field_lengths WHERE node_id = ?", (node_id,))
+        self._bump_stats([("nodes", -1)] + [(f"len:{field}", -length) for field, length in lengths])
+
+    def _bump_stats(self, deltas):
+        self.kb.conn.executemany(
+            "INSERT INTO index_stats (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value", deltas)
+
+    def _collection_stats(self):
+        stats = dict(self.kb._fetchall("SELECT key, value FROM index_stats"))
+        total_lengths = {key[4:]: value for key, value in stats.items() if key.startswith("len:")}
+        return stats.get("nodes", 0), total_lengths
+
+    def _term_postings(self, term):
+        postings = self.kb._fetchall(
+            "SELECT p.node_id, p.field, p.tf, l.length FROM term_postings p "
+            "JOIN field_lengths l ON l.node_id = p.node_id AND l.field = p.field "
+            "WHERE p.token = ?", (term,))
+        df = self.kb._fetchone("SELECT COUNT(DISTINCT node_id) FROM term_postings WHERE token = ?", (term,))[0]
+        return df, postings
+
+class _SQLiteNodeView:
+    """Giao diện giống graph.nodes của NetworkX, đọc trực tiếp từ SQLite"""
+
+    def __init__(self, kb):
+        self.kb = kb
+
+    def __contains__(self, node_id):
+        return self.kb._fetchone("SELECT 1 FROM nodes WHERE id = ?", (node_id,)) is not None
+
+    def __len__(self):
+        return self.kb._fetchone("SELECT COUNT(*) FROM nodes")[0]
+
+    def __getitem__(self, node_id):
+        row = self.kb._fetchone("SELECT attrs FROM nodes WHERE id = ?", (node_id,))
+        if row is None:
+            raise KeyError(node_id)
+        return json.loads(row[0])
+
+    def __iter__(self):
+        return (row[0] for row in self.kb._iter_rows("SELECT rowid, id FROM nodes"))
+
+    def __call__(self, data=False):
+        if not data:
+            return iter(self)
+        return ((node_id, json.loads(attrs))
+                for node_id, attrs in self.kb._iter_rows("SELECT rowid, id, attrs FROM nodes"))
+
+class _SQLiteEdgeView:
+    """Giao diện giống graph.edges của NetworkX, đọc trực tiếp từ SQLite"""
+
+    def __init__(self, kb):
+        self.kb = kb
+
+    def __len__(self):
+        return self.kb._fetchone("SELECT COUNT(*) FROM edges")[0]
+
+    def __iter__(self):
+        return ((u, v) for u, v, _ in self(data=True))
+
+    def __call__(self, data=False):
+        rows = self.kb._iter_rows("SELECT rowid, source, target, attrs FROM edges")
+        if not data:
+            return ((u, v) for u, v, _ in rows)
+        return ((u, v, json.loads(attrs)) for u, v, attrs in rows)
+
+class _SQLiteGraphView:
+    """Giao diện tối thiểu giống networkx.DiGraph để Learner và Engine dùng như cũ"""
+
+    def __init__(self, kb):
+        self.nodes = _SQLiteNodeView(kb)
+        self.edges = _SQLiteEdgeView(kb)
+        self.kb = kb
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def has_edge(self, source, target):
+        return self.kb._fetchone("SELECT 1 FROM edges WHERE source = ? AND target = ?", (source, target)) is not None
+
+    def out_edges(self, node_id, data=False):
+        return self._edges_where("source", node_id, data)
+
+    def in_edges(self, node_id, data=False):
+        return self._edges_where("target", node_id, data)
+
+    def _edges_where(self, column, node_id, data):
+        """Mọi edge có cột column bằng node_id, không giới hạn số lượng (dùng chỉ mục source/target)"""
+        rows = self.kb._fetchall(f"SELECT source, target, attrs FROM edges WHERE {column} = ?", (node_id,))
+        if not data:
+            return [(source, target) for source, target, _ in rows]
+        return [(source, target, json.loads(attrs)) for source, target, attrs in rows]
+
+class SQLiteKnowledgeBase(KnowledgeBase):
+    """
+    Knowledge Base lưu node, edge và chỉ mục trong SQLite.
+    Khởi động không cần tải toàn bộ đồ thị; mỗi truy vấn chỉ đọc các dòng liên quan.
+
+    Luồng ghi giữ khóa ghi và dùng kết nối ghi; mỗi giao dịch ghi ngoài cùng (một thao tác
+    hoặc cả một lô) là một transaction SQLite, commit khi kết thúc và rollback nếu có lỗi.
+    Mỗi luồng đọc có kết nối riêng nên chỉ thấy dữ liệu đã commit và không chờ luồng ghi
+    (WAL cho phép đọc trong khi đang ghi).
+    """
+
+    # Không dựng phiên bản đồ thị trong bộ nhớ: SQLite (WAL) cô lập các lần đọc,
+    # phiên bản chỉ giữ thế hệ và khung nhìn CSR tương ứng với trạng thái đã commit
+    _mvcc = False
+
+    def __init__(self):
+        """Khởi tạo knowledge base trên SQLite"""
+        self.logger = logging.getLogger("KnowledgeBase")
+
+        # Tạo thư mục lưu trữ nếu chưa tồn tại
+        os.makedirs(config.KNOWLEDGE_GRAPH_DIR, exist_ok=True)
+        self.graph_path = config.KB_CONFIG['graph_file']
+        self.db_path = config.KB_CONFIG['sqlite_file']
+
+        # SQLite tự đảm bảo độ bền dữ liệu nên không dùng journal và backup delta
+        self.journal = None
+        self.backups = None
+
+        # Kết nối ghi chỉ được dùng bởi luồng đang giữ khóa ghi;
+        # kết nối đọc được mở riêng cho từng luồng khi cần (xem _conn)
+        self._lock = RWLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._readers = threading.local()
+
+        self._graph_view = _SQLiteGraphView(self)
+        self._init_versions()
+        self.index = SQLiteKeywordIndex(self, **index_options())
+        self.query_cache = QueryCache(config.KB_CONFIG.get('query_cache_size', 256))
+        self.access_log = AccessLog(config.KB_CONFIG['access_log_file'])
+        self._reset_batch()
+
+        # Chuyển dữ liệu từ file JSON cũ sang SQLite ở lần chạy đầu tiên
+        if len(self.graph.nodes) == 0:
+            if self.index.is_stale():
+                # Cơ sở dữ liệu mới: ghi định dạng chỉ mục trước khi thêm node
+                with self._write_transaction():
+                    self.index.clear()
+            if os.path.exists(self.graph_path):
+                self._import_json_snapshot(self.graph_path)
+        elif self.index.is_stale():
+            # Cơ sở dữ liệu từ phiên bản trước chưa có chỉ mục theo trường hoặc chưa có dạng bỏ dấu
+            with self._write_transaction():
+                self.index.build(self.graph.nodes(data=True))
+            self.logger.info("Đã xây dựng lại chỉ mục tìm kiếm trong SQLite")
+
+        self.logger.info(f"Knowledge Base (SQLite) đã khởi tạo với {len(self.graph.nodes)} nodes và {len(self.graph.edges)} edges")
+
+    @property
+    def graph(self):
+        """Giao diện đồ thị đọc trực tiếp từ SQLite"""
+        return self._graph_view
+
+    def _conn(self):
+        """
+        Kết nối cho luồng hiện tại: kết nối ghi nếu luồng đang giữ khóa ghi (thấy cả thay đổi
+        chưa commit của giao dịch), nếu không là kết nối đọc riêng của luồng
+
+        Returns:
+            sqlite3.Connection: Kết nối
+        """
+        if self._lock.is_writer():
+            return self.conn
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._readers.conn = conn
+        return conn
+
+    def _fetchone(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def _iter_rows(self, sql, params=()) -> Iterator[tuple]:
+        """
+        Duyệt một bảng theo từng trang rowid để không giữ toàn bộ kết quả trong bộ nhớ.
+        Các trang cùng thuộc một trạng thái khi được duyệt trong reading().
+
+        Args:
+            sql: Câu SELECT có cột đầu tiên là rowid, không có WHERE/ORDER BY
+
+        Yields:
+            tuple: Các cột còn lại của mỗi dòng
+        """
+        last_rowid = 0
+        while True:
+            rows = self._fetchall(f"{sql} WHERE rowid > ? ORDER BY rowid LIMIT {PAGE_SIZE}", (*params, last_rowid))
+            if not rows:
+                return
+            for row in rows:
+                yield row[1:]
+            last_rowid = rows[-1][0]
+
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Giữ khóa ghi trong một transaction của kết nối ghi. Thế hệ và khung nhìn CSR được
+        cập nhật trên phiên bản làm việc và công bố cùng lúc với commit, nên luồng đọc không
+        bao giờ thấy thế hệ mới với dữ liệu cũ (hay ngược lại). Nếu có lỗi, transaction bị
+        rollback và phiên bản làm việc bị hủy. Giao dịch lồng nhau thuộc giao dịch ngoài cùng.
+        """
+        with self._lock.write_lock():
+            if self._working is not None:
+                yield
+                return
+
+            with self._csr_lock:
+                current = self._current
+                self._working = KBVersion(current.graph, current.index, current.graph_index, current.csr,
+                                          current.generation, list(current.csr_changes))
+            self._working_thread = threading.get_ident()
+            try:
+                yield
+            except BaseException:
+                self._working = None
+                self._working_thread = None
+                self.conn.rollback()
+                raise
+
+            # Luồng đọc mở snapshot dưới cùng khóa (xem _snapshot) nên phiên bản luôn khớp dữ liệu đã commit
+            with self._csr_lock:
+                self.conn.commit()
+                self._publish_working()
+
+    def reading(self):
+        """
+        Giữ một trạng thái nhất quán khi cần duyệt trực tiếp self.graph từ bên ngoài:
+        mở một transaction đọc trên kết nối của luồng (WAL giữ nguyên snapshot của nó)
+        cùng phiên bản tương ứng. Luồng ghi không bị chặn; các thay đổi được commit sau đó
+        chỉ thấy được sau khi thoát khỏi context.
+
+        Returns:
+            Context manager giữ snapshot
+        """
+        return self._snapshot()
+
+    @contextmanager
+    def _snapshot(self):
+        """Transaction đọc của reading(); lồng nhau hoặc trong luồng ghi thì không mở thêm"""
+        if self._lock.is_writer() or getattr(self._pins, "version", None) is not None:
+            yield
+            return
+
+        conn = self._conn()
+        with self._csr_lock:
+            conn.execute("BEGIN")
+            # Snapshot của WAL bắt đầu ở lần đọc đầu tiên, không phải ở BEGIN
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            self._pins.version = self._current
+        try:
+            yield
+        finally:
+            self._pins.version = None
+            conn.rollback()
+
+    def _import_json_snapshot(self, path):
+        """Nhập snapshot JSON dạng node-link vào SQLite"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                graph_data = json.load(f)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi đọc snapshot JSON để chuyển sang SQLite: {e}")
+            return
+
+        edges_key = "links" if "links" in graph_data else "edges"
+        with self._write_transaction():
+            for node in graph_data.get("nodes", []):
+                attrs = dict(node)
+                node_id = attrs.pop("id")
+                self._write_node(node_id, attrs)
+            for link in graph_data.get(edges_key, []):
+                attrs = dict(link)
+                source, target = attrs.pop("source"), attrs.pop("target")
+                self._write_edge(source, target, attrs)
+
+        self.logger.info(f"Đã chuyển {len(graph_data.get('nodes', []))} nodes từ {path} sang SQLite")
+
+    def _write_node(self, node_id, attrs):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO nodes (id, type, attrs, updated_at) VALUES (?, ?, ?, ?)",
+            (node_id, attrs.get("type"), json.dumps(attrs, ensure_ascii=False, default=str), attrs.get("updated_at"))
+        )
+        self.index.add(node_id, attrs)
+
+    def _write_edge(self, source, target, attrs):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO edges (source, target, relation_type, attrs) VALUES (?, ?, ?, ?)",
+            (source, target, attrs.get("relation_type"), json.dumps(attrs, ensure_ascii=False, default=str))
+        )
+
+    @_exclusive
+    def save(self):
+        """
+        Ghi nhật ký truy cập; dữ liệu đã được commit khi mỗi giao dịch ghi kết thúc
+        (trong lô, commit cùng lúc với cả lô)
+        """
+        if self._batch_depth:
+            self._batch_save = True
+            return
+
+        self.access_log.flush()
+        try:
+            if self._working is None:
+                self.conn.commit()
+            self.logger.info("Đã lưu các thay đổi của đồ thị kiến thức vào SQLite")
+        except Exception as e:
+            self.logger.error(f"Lỗi khi lưu đồ thị kiến thức: {e}")
+
+    @_exclusive
+    def checkpoint(self):
+        """Commit và gộp WAL vào file cơ sở dữ liệu"""
+        self.conn.commit()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def storage_files(self):
+        return [path for path in (self.db_path, self.db_path + "-wal") if os.path.exists(path)]
+
+    @_writer
+    def rebuild_indexes(self):
+        """Dựng lại chỉ mục trong SQLite và thu hồi các trang trống sau khi xóa (VACUUM)"""
+        self.index.build(self.graph.nodes(data=True))
+        # VACUUM không chạy được trong transaction
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        self._mark_changed(structure=True)
+        self.logger.info(f"Đã dựng lại chỉ mục cho {len(self.graph.nodes)} nodes")
+
+    @_writer
+    def add_node(self, node_id, attributes=None, preserve_timestamps=False):
+        if attributes is None:
+            attributes = {}
+
+        now = self.now()
+        current = self.get_node(node_id)
+        is_new = current is None
+
+        # Thêm thông tin thời gian nếu là node mới (giữ thời gian có sẵn nếu được yêu cầu)
+        if is_new and not (preserve_timestamps and "created_at" in attributes):
+            attributes["created_at"] = now
+        if not (preserve_timestamps and "updated_at" in attributes):
+            attributes["updated_at"] = now
+
+        merged = {} if is_new else current[1]
+        merged.update(attributes)
+        self._write_node(node_id, merged)
+        self._mark_changed(structure=is_new, change=("add_node", node_id))
+
+        if is_new:
+            self.logger.debug(f"Đã thêm node mới: {node_id}")
+        else:
+            self.logger.debug(f"Đã cập nhật node: {node_id}")
+
+        return node_id
+
+    @_writer
+    def add_edge(self, source, target, relation_type, attributes=None):
+        if attributes is None:
+            attributes = {}
+
+        # Đảm bảo cả source và target đều tồn tại
+        if source not in self.graph.nodes:
+            self.logger.warning(f"Node nguồn không tồn tại: {source}")
+            return False
+
+        if target not in self.graph.nodes:
+            self.logger.warning(f"Node đích không tồn tại: {target}")
+            return False
+
+        self._put_edge(source, target, relation_type, attributes)
+        return True
+
+    def _put_edge(self, source, target, relation_type, attributes, preserve_timestamps=False):
+        attributes["relation_type"] = relation_type
+        if not (preserve_timestamps and "created_at" in attributes):
+            attributes["created_at"] = self.now()
+
+        row = self._fetchone("SELECT attrs FROM edges WHERE source = ? AND target = ?", (source, target))
+        merged = json.loads(row[0]) if row else {}
+        old_relation = merged.get("relation_type")
+        merged.update(attributes)
+        self._write_edge(source, target, merged)
+        self._mark_changed(structure=not row or old_relation != relation_type,
+                           change=("add_edge", source, target, relation_type or UNKNOWN_RELATION))
+
+        if not self._batch_depth:
+            self.logger.debug(f"Đã {'cập nhật' if row else 'thêm'} edge: {source} -> {target} ({relation_type})")
+
+    def get_node(self, node_id):
+        row = self._fetchone("SELECT attrs FROM nodes WHERE id = ?", (node_id,))
+        if row is None:
+            return None
+        return node_id, json.loads(row[0])
+
+    @_reader
+    def get_related_nodes(self, node_id, relation_type=None, max_depth=1, direction="out", max_nodes=None):
+        if node_id not in self.graph.nodes:
+            self.logger.warning(f"Node không tồn tại: {node_id}")
+            return []
+
+        if max_nodes is None:
+            max_nodes = config.KB_CONFIG.get('traversal_max_nodes')
+
+        # Mỗi hướng duyệt: (cột của node đang mở rộng, cột của node kề)
+        sides = {"out": [("source", "target")], "in": [("target", "source")],
+                 "both": [("source", "target"), ("target", "source")]}[direction]
+
+        related = []
+        visited = {node_id}
+        frontier = [node_id]
+        for _ in range(max_depth):
+            # Mỗi tầng chỉ cần một truy vấn cho mỗi nhóm PAGE_SIZE node của frontier
+            next_frontier = []
+            for start in range(0, len(frontier), PAGE_SIZE):
+                chunk = frontier[start:start + PAGE_SIZE]
+                for near, far in sides:
+                    sql = (f"SELECT e.{far}, n.attrs, e.attrs FROM edges e JOIN nodes n ON n.id = e.{far} "
+                           f"WHERE e.{near} IN ({','.join('?' * len(chunk))})")
+                    params = list(chunk)
+                    if relation_type is not None:
+                        sql += " AND e.relation_type = ?"
+                        params.append(relation_type)
+                    rows = self._fetchall(sql, params)
+
+                    for dst, node_attrs, edge_attrs in rows:
+                        if dst in visited:
+                            continue
+                        if max_nodes is not None and len(related) >= max_nodes:
+                            return related
+                        visited.add(dst)
+                        next_frontier.append(dst)
+                        related.append((dst, json.loads(node_attrs), json.loads(edge_attrs)))
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        return related
+
+    def count_node_types(self):
+        # Đếm trên chỉ mục idx_nodes_type, không đọc cột attrs
+        return dict(self._fetchall("SELECT COALESCE(type, 'unknown'), COUNT(*) FROM nodes GROUP BY 1"))
+
+    def nodes_by_type(self, node_type):
+        return [row[0] for row in self._fetchall("SELECT id FROM nodes WHERE type = ?", (node_type,))]
+
+    @_reader
+    def csr_view(self):
+        """Khung nhìn CSR dựng trực tiếp từ bảng nodes và edges (chỉ đọc cấu trúc), vá theo các thay đổi sau đó"""
+        return self._patched_csr(self._build_csr)
+
+    def _build_csr(self):
+        """Dựng khung nhìn CSR từ đầu bằng các bảng nodes và edges (trong snapshot của phiên bản đang giữ)"""
+        node_ids = [row[0] for row in self._fetchall("SELECT id FROM nodes ORDER BY rowid")]
+        edges = self._fetchall("SELECT source, target, relation_type FROM edges")
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(node_ids)
+        graph.add_edges_from((u, v, {"relation_type": rel or UNKNOWN_RELATION}) for u, v, rel in edges)
+        return CSRGraph.from_networkx(graph)
+
+    @_reader
+    def get_subgraph(self, node_ids, max_depth=1, direction="both", relation_type=None, max_nodes=None):
+        # Đồ thị con được dựng từ các dòng SQLite nên là bản sao nhỏ, không phải khung nhìn
+        if max_nodes is None:
+            max_nodes = config.KB_CONFIG.get('traversal_max_nodes')
+
+        view = self.csr_view()
+        roots = [view.index[node_id] for node_id in node_ids if node_id in view.index]
+        relation = view.relation_code(relation_type)
+        if not roots:
+            return nx.DiGraph()
+
+        selected = {view.node_ids[i] for i in roots}
+        if relation != -1:
+            for _, targets in view.bfs_edges(roots, max_depth, relation, direction, max_nodes):
+                selected.update(view.node_ids[i] for i in targets.tolist())
+
+        # Chỉ đọc thuộc tính của các node và edge thuộc đồ thị con
+        subgraph = nx.DiGraph()
+        for node_id in selected:
+            subgraph.add_node(node_id, **self.graph.nodes[node_id])
+        for node_id in selected:
+            for target, attrs in self._fetchall("SELECT target, attrs FROM edges WHERE source = ?", (node_id,)):
+                if target in selected:
+                    subgraph.add_edge(node_id, target, **json.loads(attrs))
+        return subgraph
+
+    @_writer
+    def remove_node(self, node_id):
+        if node_id not in self.graph.nodes:
+            self.logger.warning(f"Không thể xóa node không tồn tại: {node_id}")
+            return False
+
+        self.conn.execute("DELETE FROM edges WHERE source = ? OR target = ?", (node_id, node_id))
+        self.conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+        self.index.remove(node_id)
+        self._mark_changed(structure=True, change=("remove_node", node_id))
+
+        self.logger.info(f"Đã xóa node: {node_id}")
+        return True
+
+    @_writer
+    def remove_edge(self, source, target):
+        cursor = self.conn.execute("DELETE FROM edges WHERE source = ? AND target = ?", (source, target))
+        self._mark_changed(structure=cursor.rowcount > 0, change=("remove_edge", source, target))
+
+        if cursor.rowcount:
+            self.logger.info(f"Đã xóa edge: {source} -> {target}")
+            return True
+
+        self.logger.warning(f"Không thể xóa edge không tồn tại: {source} -> {target}")
+        return False
@@ -0,0 +1,194 @@
+"""
+KB Transfer - Xuất/nhập đồ thị kiến thức dạng JSONL (mỗi dòng một node hoặc edge) để chuyển giữa các instance
+"""
+
+import sys
+import gzip
+import json
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import config
+
+logger = logging.getLogger("KBTransfer")
+
+FORMAT_NAME = "simpleagi-kg"
+FORMAT_VERSION = 1
+
+@contextmanager
+def _open_stream(path: str, mode: str, compress: Optional[bool] = None):
+    """
+    Mở file JSONL dạng văn bản; '-' là stdin/stdout
+
+    Args:
+        path: Đường dẫn file
+        mode: 'r' hoặc 'w'
+        compress: Nén gzip (mặc định: theo phần mở rộng .gz)
+    """
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+
+    if compress is None:
+        compress = path.endswith(".gz")
+    opener = gzip.open if compress else open
+    with opener(path, mode + "t", encoding="utf-8") as f:
+        yield f
+
+def _dump(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+class NodeFilter:
+    """
+    Bộ lọc node khi xuất: theo loại, nguồn (thuộc tính 'source') và thời điểm cập nhật
+    """
+
+    def __init__(self, node_types: Optional[Iterable[str]] = None, source: Optional[str] = None,
+                 since: Optional[str] = None):
+        """
+        Khởi tạo bộ lọc
+
+        Args:
+            node_types: Chỉ giữ các loại node này
+            source: Chỉ giữ node có thuộc tính source bằng giá trị này
+            since: Chỉ giữ node có updated_at từ thời điểm này (ISO 8601)
+        """
+        self.node_types = set(node_types) if node_types else None
+        self.source = source
+        self.since = since
+
+    def matches_structure(self, attrs: Dict) -> bool:
+        """Node thuộc phạm vi xuất theo loại và nguồn (không xét thời điểm)"""
+        if self.node_types is not None and attrs.get("type") not in self.node_types:
+            return False
+        if self.source is not None and attrs.get("source") != self.source:
+            return False
+        return True
+
+    def matches(self, attrs: Dict) -> bool:
+        """Node được xuất"""
+        if not self.matches_structure(attrs):
+            return False
+        return self.since is None or str(attrs.get("updated_at", "")) >= self.since
+
+def export_graph(kb, path: str, node_filter: Optional[NodeFilter] = None, compress: Optional[bool] = None) -> Dict[str, int]:
+    """
+    Xuất node và edge ra file JSONL theo luồng, không dựng bản sao của đồ thị.
+
+    Dòng đầu là header, sau đó là mọi node rồi mọi edge:
+        {"kind": "node", "id": ..., "attrs": {...}}
+        {"kind": "edge", "source": ..., "target": ..., "attrs": {...}}
+
+    Edge được xuất khi cả hai đầu thuộc phạm vi lọc theo loại/nguồn; với bộ lọc thời điểm,
+    edge được xét theo created_at của chính nó (lần thêm hoặc cập nhật gần nhất) để
+    file xuất tăng dần vẫn chứa các edge mới giữa các node cũ.
+
+    Args:
+        kb: Knowledge base nguồn
+        path: File đích ('-' để ghi ra stdout, đuôi .gz để nén)
+        node_filter: Bộ lọc node (mặc định xuất tất cả)
+        compress: Nén gzip (mặc định: theo phần mở rộng)
+
+    Returns:
+        dict: Số node và edge đã xuất
+    """
+    node_filter = node_filter or NodeFilter()
+    counts = {"nodes": 0, "edges": 0}
+
+    # Giữ một phiên bản để file xuất là một trạng thái nhất quán của đồ thị
+    with kb.reading(), _open_stream(path, "w", compress) as f:
+        f.write(_dump({"kind": "header", "format": FORMAT_NAME, "version": FORMAT_VERSION,
+                       "exported_at": datetime.now().isoformat()}))
+
+        for node_id, attrs in kb.graph.nodes(data=True):
+            if node_filter.matches(attrs):
+                f.write(_dump({"kind": "node", "id": node_id, "attrs": attrs}))
+                counts["nodes"] += 1
+
+        # Không có bộ lọc loại/nguồn thì không cần đọc thuộc tính hai đầu của mỗi edge
+        check_endpoints = node_filter.node_types is not None or node_filter.source is not None
+        for source, target, attrs in kb.graph.edges(data=True):
+            if node_filter.since is not None and str(attrs.get("created_at", "")) < node_filter.since:
+                continue
+            if check_endpoints and not (node_filter.matches_structure(kb.graph.nodes[source])
+                                        and node_filter.matches_structure(kb.graph.nodes[target])):
+                continue
+            f.write(_dump({"kind": "edge", "source": source, "target": target, "attrs": attrs}))
+            counts["edges"] += 1
+
+    logger.info(f"Đã xuất {counts['nodes']} nodes và {counts['edges']} edges ra {path}")
+    return counts
+
+def import_graph(kb, path: str, chunk_size: Optional[int] = None, compress: Optional[bool] = None) -> Dict[str, int]:
+    """
+    Nhập file JSONL do export_graph tạo ra theo luồng, mỗi khối bản ghi là một lô thay đổi.
+    Node đã tồn tại được cập nhật thuộc tính; edge có đầu mút không tồn tại bị bỏ qua.
+    Thời gian tạo/sửa trong file được giữ nguyên. Đồ thị được lưu một lần khi nhập xong.
+
+    Args:
+        kb: Knowledge base đích
+        path: File nguồn ('-' để đọc từ stdin, đuôi .gz nếu đã nén)
+        chunk_size: Số bản ghi mỗi lô (mặc định KB_CONFIG['import_chunk_size'])
+        compress: File nén gzip (mặc định: theo phần mở rộng)
+
+    Returns:
+        dict: Số node, edge đã nhập và số dòng bị bỏ qua
+    """
+    chunk_size = max(1, chunk_size or config.KB_CONFIG.get('import_chunk_size', 1000))
+    counts = {"nodes": 0, "edges": 0, "skipped": 0}
+    nodes, edges = [], []
+
+    def flush_nodes():
+        if nodes:
+            with kb.batch(save=False):
+                kb.add_nodes_from(nodes, preserve_timestamps=True)
+            counts["nodes"] += len(nodes)
+            nodes.clear()
+
+    def flush_edges():
+        # Node đang chờ phải được thêm trước để edge tìm thấy hai đầu
+        flush_nodes()
+        if edges:
+            with kb.batch(save=False):
+                added = kb.add_edges_from(edges, preserve_timestamps=True)
+            counts["edges"] += added
+            counts["skipped"] += len(edges) - added
+            edges.clear()
+
+    with _open_stream(path, "r", compress) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                kind = record.get("kind")
+            except (json.JSONDecodeError, AttributeError):
+                logger.warning(f"{path}:{line_no}: dòng không hợp lệ, bỏ qua")
+                counts["skipped"] += 1
+                continue
+
+            if kind == "node" and record.get("id") is not None:
+                nodes.append((record["id"], dict(record.get("attrs") or {})))
+                if len(nodes) >= chunk_size:
+                    flush_nodes()
+            elif kind == "edge" and record.get("source") is not None and record.get("target") is not None:
+                attrs = dict(record.get("attrs") or {})
+                relation_type = attrs.pop("relation_type", None) or "related_to"
+                edges.append((record["source"], record["target"], relation_type, attrs))
+                if len(edges) >= chunk_size:
+                    flush_edges()
+            elif kind == "header":
+                if record.get("format") != FORMAT_NAME or record.get("version", 0) > FORMAT_VERSION:
+                    logger.warning(f"{path}: định dạng {record.get('format')} v{record.get('version')} "
+                                   f"có thể không tương thích")
+            else:
+                counts["skipped"] += 1
+
+    flush_edges()
+    kb.save()
+
+    logger.info(f"Đã nhập {counts['nodes']} nodes và {counts['edges']} edges từ {path}")
+    return counts
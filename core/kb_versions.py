@@ -0,0 +1,368 @@
+"""
+KB Versions - Phiên bản bất biến của đồ thị kiến thức cho đọc/ghi đa phiên bản (MVCC)
+
+Luồng đọc giữ (pin) phiên bản hiện tại và đọc mà không cần khóa. Luồng ghi tách
+(fork) một phiên bản làm việc chia sẻ dữ liệu với phiên bản hiện tại, chỉ sao chép
+phần nó sửa (copy-on-write), rồi công bố phiên bản mới bằng một phép gán.
+"""
+
+import math
+from collections.abc import ItemsView, MutableMapping, ValuesView
+
+import networkx as nx
+
+# Dict nhỏ hơn mức này được sao chép khi ghi; dict lớn hơn được dùng chung qua CowMap
+SHARE_MIN_SIZE = 64
+
+# Đánh dấu khóa của dict nền đã bị xóa trong phần thay đổi của CowMap
+_DELETED = object()
+_MISSING = object()
+
+class CowMap(MutableMapping):
+    """
+    Dict copy-on-write chia sẻ cấu trúc giữa các phiên bản: một dict nền không bao giờ
+    bị sửa (dùng chung giữa phiên bản gốc và các bản tách) cộng phần thay đổi riêng
+    của bản này. Tách chỉ sao chép phần thay đổi; khi phần thay đổi vượt khoảng căn bậc
+    hai của kích thước, nó được gộp vào một dict nền mới. Nhờ vậy cả chi phí tách lẫn
+    chi phí ghi (trung bình) là O(căn N) thay vì O(N) như sao chép cả dict.
+
+    Thứ tự duyệt giống dict: khóa được cập nhật giữ vị trí, khóa mới (kể cả khóa bị
+    xóa rồi thêm lại) nằm cuối.
+    """
+
+    __slots__ = ("_base", "_delta", "_moved", "_len", "_limit")
+
+    def __init__(self, data=None):
+        self._reset(dict(data) if data else {})
+
+    @classmethod
+    def share(cls, data) -> "CowMap":
+        """
+        Bản tách của một dict hoặc CowMap mà không sao chép dữ liệu
+
+        Args:
+            data: dict (không được sửa trực tiếp sau đó) hoặc CowMap
+
+        Returns:
+            CowMap: Bản tách, ghi vào nó không làm thay đổi data
+        """
+        if isinstance(data, CowMap):
+            return data.fork()
+        shared = cls.__new__(cls)
+        shared._reset(data)
+        return shared
+
+    def fork(self) -> "CowMap":
+        """Bản tách: dùng chung dict nền, sao chép phần thay đổi"""
+        forked = self.__class__.__new__(self.__class__)
+        forked._base = self._base
+        forked._delta = dict(self._delta)
+        forked._moved = set(self._moved)
+        forked._len = self._len
+        forked._limit = self._limit
+        return forked
+
+    def _reset(self, base):
+        self._base = base
+        self._delta = {}
+        # Khóa của dict nền bị xóa rồi thêm lại (chuyển xuống cuối thứ tự duyệt)
+        self._moved = set()
+        self._len = len(base)
+        self._limit = max(SHARE_MIN_SIZE, math.isqrt(len(base)))
+
+    def _compact(self):
+        """Gộp phần thay đổi vào một dict nền mới (dict nền cũ vẫn thuộc các phiên bản khác)"""
+        base = dict(self._base)
+        moved = self._moved
+        for key, value in self._delta.items():
+            if value is _DELETED:
+                base.pop(key, None)
+            else:
+                if key in moved:
+                    base.pop(key, None)
+                base[key] = value
+        self._reset(base)
+
+    def __getitem__(self, key):
+        delta = self._delta
+        if delta:
+            value = delta.get(key, _MISSING)
+            if value is not _MISSING:
+                if value is _DELETED:
+                    raise KeyError(key)
+                return value
+        return self._base[key]
+
+    def get(self, key, default=None):
+        delta = self._delta
+        if delta:
+            value = delta.get(key, _MISSING)
+            if value is not _MISSING:
+                return default if value is _DELETED else value
+        return self._base.get(key, default)
+
+    def __contains__(self, key):
+        delta = self._delta
+        if delta:
+            value = delta.get(key, _MISSING)
+            if value is not _MISSING:
+                return value is not _DELETED
+        return key in self._base
+
+    def __setitem__(self, key, value):
+        delta = self._delta
+        current = delta.get(key, _MISSING)
+        if current is _MISSING:
+            if key not in self._base:
+                self._len += 1
+            delta[key] = value
+        elif current is _DELETED:
+            # Thêm lại khóa đã xóa: chuyển xuống cuối như dict
+            del delta[key]
+            delta[key] = value
+            self._moved.add(key)
+            self._len += 1
+        else:
+            delta[key] = value
+        if len(delta) > self._limit:
+            self._compact()
+
+    def __delitem__(self, key):
+        delta = self._delta
+        current = delta.get(key, _MISSING)
+        if current is _DELETED or (current is _MISSING and key not in self._base):
+            raise KeyError(key)
+        if key in self._base:
+            delta[key] = _DELETED
+        else:
+            del delta[key]
+        self._len -= 1
+        if len(delta) > self._limit:
+            self._compact()
+
+    def pop(self, key, default=_MISSING):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        del self[key]
+        return value
+
+    def clear(self):
+        self._reset({})
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        if not self._delta:
+            return iter(self._base)
+        return (key for key, _ in self._iter_items())
+
+    def _iter_items(self):
+        base, delta, moved = self._base, self._delta, self._moved
+        for key, value in base.items():
+            current = delta.get(key, _MISSING)
+            if current is _MISSING:
+                yield key, value
+            elif current is not _DELETED and key not in moved:
+                yield key, current
+        for key, value in delta.items():
+            if value is not _DELETED and (key in moved or key not in base):
+                yield key, value
+
+    def items(self):
+        return _CowItemsView(self)
+
+    def values(self):
+        return _CowValuesView(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self.items())!r})"
+
+class _CowItemsView(ItemsView):
+    def __iter__(self):
+        mapping = self._mapping
+        if not mapping._delta:
+            return iter(mapping._base.items())
+        return mapping._iter_items()
+
+class _CowValuesView(ValuesView):
+    def __iter__(self):
+        mapping = self._mapping
+        if not mapping._delta:
+            return iter(mapping._base.values())
+        return (value for _, value in mapping._iter_items())
+
+def cow_copy(mapping):
+    """
+    Bản sao để ghi của một dict đang dùng chung: dict nhỏ được sao chép,
+    dict lớn (hoặc CowMap) được tách bằng CowMap để không phải sao chép cả dict
+
+    Args:
+        mapping: dict hoặc CowMap
+
+    Returns:
+        dict/CowMap: Bản sao độc lập khi ghi
+    """
+    if isinstance(mapping, CowMap) or len(mapping) > SHARE_MIN_SIZE:
+        return CowMap.share(mapping)
+    return dict(mapping)
+
+class CowDiGraph(nx.DiGraph):
+    """
+    DiGraph tách từ một đồ thị khác: các dict cấp ngoài (node -> ...) là CowMap dùng chung
+    dữ liệu với đồ thị gốc, các dict bên trong (thuộc tính node, danh sách kề, thuộc tính
+    edge) dùng chung với đồ thị gốc cho đến lần ghi đầu tiên.
+
+    Chỉ được sửa qua các phương thức của đồ thị; sửa trực tiếp dict thuộc tính
+    (graph.nodes[n][key] = ...) sẽ làm thay đổi cả phiên bản gốc.
+    """
+
+    @classmethod
+    def fork(cls, graph: nx.DiGraph) -> "CowDiGraph":
+        """
+        Tách một đồ thị, chi phí tỉ lệ với số thay đổi chưa gộp của đồ thị gốc (xem CowMap),
+        không tỉ lệ với số node hay edge
+
+        Args:
+            graph: Đồ thị gốc (không bị thay đổi bởi các lần ghi trên bản tách)
+
+        Returns:
+            CowDiGraph: Bản tách
+        """
+        forked = cls()
+        forked.graph = dict(graph.graph)
+        forked._node = CowMap.share(graph._node)
+        forked._succ = CowMap.share(graph._succ)
+        forked._pred = CowMap.share(graph._pred)
+        return forked
+
+    def __init__(self, incoming_graph_data=None, **attr):
+        # Các node và edge đã được sao chép riêng cho đồ thị này
+        self._owned_nodes = set()
+        self._owned_edges = set()
+        super().__init__(incoming_graph_data, **attr)
+
+    # Dấu "đã sao chép" của node/edge bị xóa không cần gỡ: nếu được thêm lại,
+    # NetworkX tạo dict mới vốn đã thuộc riêng đồ thị này
+
+    def _own_node(self, node):
+        """Sao chép thuộc tính và danh sách kề của node trước khi sửa"""
+        if node in self._owned_nodes or node not in self._node:
+            return
+        self._node[node] = dict(self._node[node])
+        self._succ[node] = cow_copy(self._succ[node])
+        self._pred[node] = cow_copy(self._pred[node])
+        self._owned_nodes.add(node)
+
+    def _own_edge(self, u, v):
+        """Sao chép thuộc tính của edge (dùng chung giữa _succ[u] và _pred[v]) trước khi sửa"""
+        self._own_node(u)
+        self._own_node(v)
+        if (u, v) in self._owned_edges or v not in self._succ.get(u, {}):
+            return
+        datadict = dict(self._succ[u][v])
+        self._succ[u][v] = datadict
+        self._pred[v][u] = datadict
+        self._owned_edges.add((u, v))
+
+    def add_node(self, node_for_adding, **attr):
+        self._own_node(node_for_adding)
+        super().add_node(node_for_adding, **attr)
+        self._owned_nodes.add(node_for_adding)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        for item in nodes_for_adding:
+            if isinstance(item, tuple) and len(item) == 2:
+                node, data = item
+                self.add_node(node, **{**attr, **data})
+            else:
+                self.add_node(item, **attr)
+
+    def remove_node(self, n):
+        if n in self._node:
+            for neighbor in list(self._succ[n]) + list(self._pred[n]):
+                self._own_node(neighbor)
+        self._own_node(n)
+        super().remove_node(n)
+
+    def remove_nodes_from(self, nodes):
+        for n in nodes:
+            if n in self._node:
+                self.remove_node(n)
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        self._own_edge(u_of_edge, v_of_edge)
+        super().add_edge(u_of_edge, v_of_edge, **attr)
+        self._owned_nodes.update((u_of_edge, v_of_edge))
+        self._owned_edges.add((u_of_edge, v_of_edge))
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        for edge in ebunch_to_add:
+            u, v, *rest = edge
+            self.add_edge(u, v, **{**attr, **(rest[0] if rest else {})})
+
+    def remove_edge(self, u, v):
+        self._own_node(u)
+        self._own_node(v)
+        super().remove_edge(u, v)
+
+    def remove_edges_from(self, ebunch):
+        for u, v, *_ in ebunch:
+            if self.has_edge(u, v):
+                self.remove_edge(u, v)
+
+    def clear_edges(self):
+        self._succ = {node: {} for node in self._node}
+        self._pred = {node: {} for node in self._node}
+        self._owned_nodes = set()
+        self._owned_edges = set()
+        nx._clear_cache(self)
+
+    def clear(self):
+        super().clear()
+        self._owned_nodes = set()
+        self._owned_edges = set()
+
+class KBVersion:
+    """
+    Một phiên bản của đồ thị cùng các chỉ mục của nó.
+
+    Phiên bản đã công bố không bị sửa nữa (ngoại trừ khung nhìn CSR được dựng
+    hoặc vá lười khi cần); luồng đọc giữ tham chiếu tới nó trong suốt truy vấn.
+    """
+
+    __slots__ = ("graph", "index", "graph_index", "csr", "csr_changes", "generation")
+
+    def __init__(self, graph=None, index=None, graph_index=None, csr=None, generation=0, csr_changes=None):
+        """
+        Khởi tạo phiên bản
+
+        Args:
+            graph: Đồ thị kiến thức
+            index: Chỉ mục từ khóa (KeywordIndex)
+            graph_index: Chỉ mục phụ (GraphIndex)
+            csr: Khung nhìn CSR (None nếu chưa dựng)
+            generation: Thế hệ của đồ thị, dùng làm khóa bộ nhớ đệm truy vấn
+            csr_changes: Các thay đổi cấu trúc chưa được vá vào khung nhìn CSR
+                (xem CSRGraph.with_changes)
+        """
+        self.graph = graph
+        self.index = index
+        self.graph_index = graph_index
+        self.csr = csr
+        self.csr_changes = csr_changes if csr_changes is not None else []
+        self.generation = generation
+
+    def fork(self) -> "KBVersion":
+        """
+        Tách phiên bản làm việc cho luồng ghi: đồ thị và chỉ mục là bản copy-on-write,
+        khung nhìn CSR được dùng lại cùng bản sao các thay đổi chưa vá
+
+        Returns:
+            KBVersion: Phiên bản làm việc
+        """
+        return KBVersion(CowDiGraph.fork(self.graph), self.index.fork(), self.graph_index.fork(),
+                         self.csr, self.generation, list(self.csr_changes))
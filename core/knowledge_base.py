@@ -3,85 +3,705 @@ Knowledge Base - Lưu trữ và quản lý kiến thức dưới dạng đồ th
 """
 
 import os
-import json
 import logging
+import functools
+import itertools
+import threading
+import numpy as np
 import networkx as nx
+from contextlib import contextmanager
 from datetime import datetime
 
 import config
+from core.kb_index import KeywordIndex, GraphIndex, query_terms
+from core.kb_cache import QueryCache
+from core.kb_access import AccessLog
+from core.kb_journal import KBJournal
+from core.kb_backup import BackupManager, diff_graphs
+from core.kb_snapshot import is_binary_snapshot, read_snapshot, write_snapshot
+from core.kb_versions import KBVersion
 from utils.nlp_utils import extract_keywords
+from utils.csr_graph import CSRGraph
+from utils.graph_utils import get_subgraph, find_paths
+from utils.rwlock import RWLock
+
+def index_options():
+    """
+    Tham số xếp hạng BM25 của chỉ mục lấy từ KB_CONFIG
+    
+    Returns:
+        dict: Tham số khởi tạo KeywordIndex
+    """
+    return {
+        'field_weights': config.KB_CONFIG.get('field_weights'),
+        'k1': config.KB_CONFIG.get('bm25_k1', 1.2),
+        'b': config.KB_CONFIG.get('bm25_b', 0.75)
+    }
+
+def spreading_options():
+    """
+    Tham số lan truyền kích hoạt lấy từ KB_CONFIG
+    
+    Returns:
+        dict: KB_CONFIG['spreading']
+    """
+    return config.KB_CONFIG.get('spreading', {})
+
+def rank_by_spreading(view, seeds, top_k, min_relevance, hops=None):
+    """
+    Lan truyền kích hoạt từ các cặp (node_id, relevance) và lấy top-k
+    
+    Độ liên quan được quy về cùng thang với hạt giống: node có kích hoạt lớn
+    nhất nhận độ liên quan của hạt giống tốt nhất, các node khác tỷ lệ theo kích hoạt.
+    
+    Args:
+        view (CSRGraph): Khung nhìn CSR của đồ thị
+        seeds (list): Các cặp (node_id, relevance) hạt giống
+        top_k (int): Số kết quả tối đa
+        min_relevance (float): Độ liên quan tối thiểu
+        hops (int, optional): Số bước lan truyền (mặc định KB_CONFIG['spreading']['hops'])
+    
+    Returns:
+        list: Danh sách (node_id, relevance) giảm dần theo độ liên quan
+    """
+    seeds = [(node, relevance) for node, relevance in seeds if node in view.index and relevance > 0]
+    if not seeds or top_k <= 0:
+        return []
+    
+    settings = spreading_options()
+    if hops is None:
+        hops = settings.get('hops', 2)
+    weights = view.relation_weight_vector(settings.get('relation_weights', {}),
+                                          settings.get('default_relation_weight', 0.0))
+    
+    indices = np.array([view.index[node] for node, _ in seeds], dtype=np.int64)
+    values = np.array([relevance for _, relevance in seeds], dtype=np.float64)
+    activation = view.spread(indices, values, hops, weights,
+                             decay=settings.get('decay', 0.5),
+                             direction=settings.get('direction', 'both'))
+    
+    # Chọn top-k bằng argpartition rồi chỉ sắp xếp k phần tử
+    candidates = np.flatnonzero(activation > 0)
+    if len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-activation[candidates], top_k - 1)[:top_k]]
+    candidates = candidates[np.argsort(-activation[candidates], kind="stable")]
+    
+    scale = values.max() / activation[candidates[0]]
+    ranked = []
+    for i in candidates.tolist():
+        relevance = float(activation[i] * scale)
+        if relevance < min_relevance:
+            break
+        ranked.append((view.node_ids[i], relevance))
+    return ranked
+
+def _reader(method):
+    """Chạy phương thức trên một phiên bản nhất quán của knowledge base (xem KnowledgeBase.reading)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.reading():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _writer(method):
+    """Chạy phương thức trong một giao dịch ghi của knowledge base (xem KnowledgeBase._write_transaction)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_transaction():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _exclusive(method):
+    """Chạy phương thức khi giữ khóa ghi nhưng không tạo phiên bản mới (lưu, checkpoint)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _versioned(name, doc):
+    """Thuộc tính đọc/ghi vào phiên bản mà luồng hiện tại thấy (xem KnowledgeBase._version)"""
+    def getter(self):
+        return getattr(self._version(), name)
+    def setter(self, value):
+        setattr(self._version(), name, value)
+    return property(getter, setter, doc=doc)
 
 class KnowledgeBase:
     """
     Cơ sở dữ liệu kiến thức dạng đồ thị
+    
+    An toàn khi dùng từ nhiều luồng (web UI) theo kiểu đa phiên bản (MVCC): đồ thị
+    cùng các chỉ mục tạo thành một phiên bản bất biến (KBVersion). Truy vấn giữ
+    phiên bản hiện tại và chạy không cần khóa nên không bị chặn khi đang học.
+    Các thay đổi được tuần tự hóa bằng khóa ghi và áp dụng lên một phiên bản làm
+    việc copy-on-write; phiên bản này được công bố bằng một phép gán khi thay đổi
+    (hoặc cả lô thay đổi) kết thúc, nên luồng đọc không bao giờ thấy lô làm dở.
     """
     
+    # Backend lưu đồ thị ngoài bộ nhớ (SQLite, shard) không dùng phiên bản: truy vấn giữ khóa đọc
+    _mvcc = True
+    
+    graph = _versioned("graph", "Đồ thị kiến thức của phiên bản mà luồng hiện tại thấy")
+    index = _versioned("index", "Chỉ mục từ khóa của phiên bản mà luồng hiện tại thấy")
+    graph_index = _versioned("graph_index", "Chỉ mục phụ của phiên bản mà luồng hiện tại thấy")
+    _csr = _versioned("csr", "Khung nhìn CSR của phiên bản mà luồng hiện tại thấy, dựng khi cần")
+    
     def __init__(self):
         """Khởi tạo knowledge base"""
         self.logger = logging.getLogger("KnowledgeBase")
         
+        # Khóa ghi tuần tự hóa các thay đổi (luồng đọc chỉ giữ khóa khi không dùng MVCC)
+        self._lock = RWLock()
+        
+        # Phiên bản hiện tại và phiên bản làm việc của luồng ghi
+        self._init_versions()
+        
         # Tạo thư mục lưu trữ nếu chưa tồn tại
         os.makedirs(config.KNOWLEDGE_GRAPH_DIR, exist_ok=True)
+        self.graph_path = config.KB_CONFIG['graph_file']
+        self.binary_graph_path = config.KB_CONFIG['binary_graph_file']
+        
+        # File snapshot được ghi theo định dạng cấu hình ('json' hoặc 'binary')
+        if config.KB_CONFIG.get('snapshot_format', 'json') == 'binary':
+            self.snapshot_path = self.binary_graph_path
+        else:
+            self.snapshot_path = self.graph_path
+        
+        # Journal ghi trước (chỉ dùng khi bật chế độ journal)
+        self.journal = None
+        if config.KB_CONFIG.get('journal_mode', False):
+            self.journal = KBJournal(config.KB_CONFIG['journal_file'],
+                                     config.KB_CONFIG.get('journal_fsync_batch', 50))
+        
+        # Backup dạng delta nén với chính sách lưu giữ
+        self.backups = None
+        if config.KB_CONFIG.get('backup_enabled', True):
+            self.backups = BackupManager(config.KB_CONFIG['backup_dir'],
+                                         keep_last=config.KB_CONFIG.get('backup_keep_last', 5),
+                                         keep_hourly=config.KB_CONFIG.get('backup_keep_hourly', 24),
+                                         keep_daily=config.KB_CONFIG.get('backup_keep_daily', 7))
+        
+        # Các node/edge thay đổi kể từ lần ghi snapshot gần nhất, dùng để tạo backup delta
+        self._reset_unsaved()
         
         # Khởi tạo đồ thị kiến thức
         self.graph = self._load_or_create_graph()
         
+        # Xây dựng chỉ mục ngược cho truy vấn
+        self.index = KeywordIndex(**index_options())
+        self.index.build(self.graph.nodes(data=True))
+        
+        # Chỉ mục phụ theo loại node và loại quan hệ
+        self.graph_index = GraphIndex()
+        self.graph_index.build(self.graph)
+        
+        # Kết quả truy vấn được đệm theo thế hệ của phiên bản
+        self.query_cache = QueryCache(config.KB_CONFIG.get('query_cache_size', 256))
+        
+        # Lần cuối mỗi node được truy vấn, dùng khi nén KB
+        self.access_log = AccessLog(config.KB_CONFIG['access_log_file'])
+        
+        # Trạng thái của lô thay đổi đang mở (xem batch())
+        self._reset_batch()
+        
         self.logger.info(f"Knowledge Base đã khởi tạo với {len(self.graph.nodes)} nodes và {len(self.graph.edges)} edges")
     
+    def _init_versions(self):
+        """Khởi tạo phiên bản rỗng; đồ thị và chỉ mục được gán qua các thuộc tính graph, index, graph_index"""
+        # Thế hệ tăng đơn điệu qua mọi phiên bản (kể cả phiên bản bị hủy) nên
+        # kết quả đệm của hai phiên bản khác nhau không bao giờ trùng khóa
+        self._generations = itertools.count(1)
+        self._current = KBVersion()
+        self._working = None
+        self._working_thread = None
+        # Phiên bản mà từng luồng đọc đang giữ
+        self._pins = threading.local()
+        # Bảo vệ cặp (csr, csr_changes) của phiên bản: luồng đọc có thể vá khung nhìn
+        # của phiên bản đã công bố trong khi luồng ghi tách phiên bản mới từ nó
+        self._csr_lock = threading.Lock()
+    
+    def _version(self):
+        """
+        Phiên bản mà luồng hiện tại thấy: phiên bản làm việc nếu là luồng ghi đang
+        trong giao dịch, phiên bản đang giữ nếu là luồng đọc, nếu không là phiên bản hiện tại
+        
+        Returns:
+            KBVersion: Phiên bản
+        """
+        working = self._working
+        if working is not None and self._working_thread == threading.get_ident():
+            return working
+        return getattr(self._pins, "version", None) or self._current
+    
     def _load_or_create_graph(self):
         """
-        Tải đồ thị kiến thức hiện có hoặc tạo mới nếu chưa có
+        Tải đồ thị kiến thức hiện có hoặc tạo mới nếu chưa có.
+        Snapshot nhị phân được ưu tiên nếu có, nếu không đọc được thì dùng JSON.
+        Ở chế độ journal, các thay đổi trong journal được áp dụng lại lên snapshot.
         
         Returns:
             networkx.DiGraph: Đồ thị kiến thức
         """
-        graph_path = os.path.join(config.KNOWLEDGE_GRAPH_DIR, "knowledge_graph.json")
+        graph = None
         
-        if os.path.exists(graph_path):
+        for path in (self.binary_graph_path, self.graph_path):
+            if not os.path.exists(path):
+                continue
             try:
                 # Tải đồ thị từ file
-                with open(graph_path, 'r', encoding='utf-8') as f:
-                    graph_data = json.load(f)
-                graph = nx.node_link_graph(graph_data)
-                self.logger.info(f"Đã tải đồ thị kiến thức với {len(graph.nodes)} nodes và {len(graph.edges)} edges")
-                return graph
+                graph = self._read_graph_file(path)
+                self.logger.info(f"Đã tải đồ thị kiến thức từ {path} với {len(graph.nodes)} nodes và {len(graph.edges)} edges")
+                break
             except Exception as e:
-                self.logger.error(f"Lỗi khi tải đồ thị kiến thức: {e}")
+                self.logger.error(f"Lỗi khi tải đồ thị kiến thức từ {path}: {e}")
+        
+        # Đồ thị của snapshot trên đĩa, giữ trong bộ nhớ để tạo backup delta khi lưu
+        self._persisted_graph = graph if self.backups else None
         
         # Tạo đồ thị mới nếu không tải được
-        self.logger.info("Tạo đồ thị kiến thức mới")
-        return nx.DiGraph()
+        if graph is None:
+            self.logger.info("Tạo đồ thị kiến thức mới")
+            graph = nx.DiGraph()
+        
+        if self.journal:
+            records = list(self.journal.replay())
+            if records:
+                # Snapshot trên đĩa chưa có các thay đổi trong journal nên đồ thị của nó được giữ nguyên
+                if self._persisted_graph is not None:
+                    graph = graph.copy()
+                for record in records:
+                    self._apply_record(graph, record)
+                    self._track_unsaved(record)
+                self.logger.info(f"Đã áp dụng lại {len(records)} thay đổi từ journal")
+        
+        return graph
     
+    @staticmethod
+    def _read_graph_file(path):
+        """
+        Đọc đồ thị từ file snapshot
+        
+        Args:
+            path (str): Đường dẫn file snapshot
+            
+        Returns:
+            networkx.DiGraph: Đồ thị đã đọc
+        """
+        return read_snapshot(path)
+    
+    def _current_snapshot_file(self):
+        """File snapshot đang được dùng khi khởi động (None nếu chưa có)"""
+        for path in (self.binary_graph_path, self.graph_path):
+            if os.path.exists(path):
+                return path
+        return None
+    
+    @staticmethod
+    def _apply_record(graph, record):
+        """
+        Áp dụng một bản ghi journal lên đồ thị (không ghi lại vào journal)
+        
+        Args:
+            graph (networkx.DiGraph): Đồ thị cần áp dụng
+            record (dict): Bản ghi thay đổi
+        """
+        op = record.get("op")
+        if op == "add_node":
+            graph.add_node(record["id"], **record.get("attrs", {}))
+        elif op == "add_edge":
+            if record["u"] in graph and record["v"] in graph:
+                graph.add_edge(record["u"], record["v"], **record.get("attrs", {}))
+        elif op == "remove_node":
+            if record["id"] in graph:
+                graph.remove_node(record["id"])
+        elif op == "remove_edge":
+            if graph.has_edge(record["u"], record["v"]):
+                graph.remove_edge(record["u"], record["v"])
+    
+    @_exclusive
     def save(self):
-        """Lưu đồ thị kiến thức xuống file"""
-        graph_path = os.path.join(config.KNOWLEDGE_GRAPH_DIR, "knowledge_graph.json")
-        backup_path = os.path.join(config.KNOWLEDGE_GRAPH_DIR, 
-                                  f"knowledge_graph_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        """
+        Lưu đồ thị kiến thức xuống file
+        
+        Ở chế độ journal chỉ ghi các thay đổi còn trong bộ đệm; snapshot đầy đủ
+        chỉ được ghi khi số thay đổi vượt quá checkpoint_interval.
+        Trong một lô thay đổi, việc lưu được dời đến khi lô kết thúc.
+        """
+        if self._batch_depth:
+            self._batch_save = True
+            return
+        
+        self.access_log.flush()
         
-        # Tạo backup nếu file đã tồn tại
-        if os.path.exists(graph_path):
+        if self.journal:
             try:
-                os.rename(graph_path, backup_path)
-                self.logger.debug(f"Đã tạo backup tại {backup_path}")
+                self.journal.flush()
             except Exception as e:
-                self.logger.error(f"Không thể tạo backup: {e}")
+                self.logger.error(f"Lỗi khi ghi journal: {e}")
+                return
+            
+            if self.journal.records >= config.KB_CONFIG.get('checkpoint_interval', 500):
+                self.checkpoint()
+            return
+        
+        self._write_snapshot()
+    
+    @_exclusive
+    def checkpoint(self):
+        """Ghi snapshot đầy đủ và làm rỗng journal"""
+        if self._write_snapshot() and self.journal:
+            self.journal.truncate()
+            self.logger.info("Đã ghi checkpoint và làm rỗng journal")
+    
+    def _write_snapshot(self):
+        """
+        Ghi toàn bộ đồ thị xuống file snapshot, lưu trạng thái cũ thành backup delta
         
-        # Lưu đồ thị xuống file
+        Returns:
+            bool: True nếu ghi thành công
+        """
+        tmp_path = self.snapshot_path + ".tmp"
+        graph = self.graph
+        
+        # Ghi ra file tạm trước để không làm hỏng snapshot hiện tại
         try:
-            graph_data = nx.node_link_data(self.graph)
-            with open(graph_path, 'w', encoding='utf-8') as f:
-                json.dump(graph_data, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"Đã lưu đồ thị kiến thức với {len(self.graph.nodes)} nodes và {len(self.graph.edges)} edges")
+            write_snapshot(graph, tmp_path, binary=is_binary_snapshot(self.snapshot_path))
         except Exception as e:
             self.logger.error(f"Lỗi khi lưu đồ thị kiến thức: {e}")
+            return False
+        
+        # Tạo backup nếu đã có snapshot trước đó: delta ngược chỉ so sánh các node/edge
+        # đã thay đổi với đồ thị của snapshot cũ đang giữ trong bộ nhớ
+        if self.backups and self._persisted_graph is not None:
+            try:
+                nodes = None if self._unsaved_all else self._unsaved_nodes
+                delta = diff_graphs(graph, self._persisted_graph, nodes, self._unsaved_edges)
+                stamp = self.backups.create_delta(delta)
+                if stamp:
+                    self.logger.debug(f"Đã tạo backup {stamp}")
+            except Exception as e:
+                self.logger.error(f"Không thể tạo backup: {e}")
+        
+        os.replace(tmp_path, self.snapshot_path)
+        
+        # Phiên bản đã công bố không bị sửa nên có thể giữ đồ thị vừa ghi làm trạng thái của snapshot.
+        # Nếu đang trong giao dịch ghi, các thay đổi tiếp theo đi vào một bản tách mới.
+        if self._working is not None and self._working_thread == threading.get_ident():
+            self._working = self._working.fork()
+        self._persisted_graph = graph if self.backups else None
+        self._reset_unsaved()
+        
+        # Snapshot nhị phân cũ được ưu tiên khi tải nên phải xóa nếu đã chuyển về JSON
+        if self.snapshot_path != self.binary_graph_path and os.path.exists(self.binary_graph_path):
+            os.remove(self.binary_graph_path)
+        
+        self.logger.info(f"Đã lưu đồ thị kiến thức với {len(self.graph.nodes)} nodes và {len(self.graph.edges)} edges")
+        return True
+    
+    def storage_files(self):
+        """
+        Các file lưu trữ đồ thị trên đĩa (dùng để tính dung lượng)
+        
+        Returns:
+            list: Đường dẫn các file đang tồn tại
+        """
+        paths = [self.snapshot_path]
+        if self.journal:
+            paths.append(self.journal.path)
+        return [path for path in paths if os.path.exists(path)]
+    
+    def list_backups(self):
+        """
+        Liệt kê các thời điểm có thể khôi phục
+        
+        Returns:
+            list: Các stamp backup từ cũ đến mới
+        """
+        return self.backups.list_backups() if self.backups else []
+    
+    @_writer
+    def restore_backup(self, stamp):
+        """
+        Khôi phục đồ thị về một thời điểm backup.
+        Snapshot hiện tại được lưu thành backup mới nên có thể hoàn tác;
+        các thay đổi chưa lưu (ngoài chế độ journal) sẽ bị bỏ qua.
+        
+        Args:
+            stamp (str): Thời điểm backup (YYYYMMDD_HHMMSS)
+            
+        Returns:
+            bool: True nếu khôi phục thành công, False nếu không
+        """
+        if not self.backups:
+            self.logger.warning("Backup chưa được bật")
+            return False
+        
+        # Ở chế độ journal, ghi checkpoint để snapshot trên đĩa chứa mọi thay đổi
+        if self.journal and self.journal.records:
+            self.checkpoint()
+        
+        try:
+            current = self._persisted_graph
+            if current is None:
+                current = self._read_graph_file(self._current_snapshot_file())
+            restored = self.backups.restore(stamp, current)
+        except Exception as e:
+            self.logger.error(f"Không thể khôi phục backup {stamp}: {e}")
+            return False
+        
+        self.graph = restored
+        self._unsaved_all = True
+        self.index.build(self.graph.nodes(data=True))
+        self.graph_index.build(self.graph)
+        self._mark_changed(structure=True)
+        
+        if self.journal:
+            self.checkpoint()
+        else:
+            self._write_snapshot()
+        
+        self.logger.info(f"Đã khôi phục đồ thị về thời điểm {stamp}")
+        return True
+    
+    def now(self):
+        """
+        Thời điểm dùng để đánh dấu thay đổi.
+        Mọi thay đổi trong cùng một lô dùng chung một thời điểm.
+        
+        Returns:
+            str: Thời điểm dạng ISO 8601
+        """
+        return self._batch_stamp or datetime.now().isoformat()
+    
+    def reading(self):
+        """
+        Giữ một phiên bản nhất quán khi cần duyệt trực tiếp self.graph từ bên ngoài.
+        Với MVCC không có khóa nào được giữ: luồng ghi vẫn chạy và công bố phiên bản
+        mới, luồng này chỉ thấy phiên bản mới sau khi thoát khỏi context.
+        
+        Returns:
+            Context manager giữ phiên bản (hoặc khóa đọc nếu không dùng MVCC)
+        """
+        if not self._mvcc:
+            return self._lock.read_lock()
+        return self._pinned()
+    
+    @contextmanager
+    def _pinned(self):
+        """Giữ phiên bản hiện tại cho luồng này; lồng nhau thì dùng phiên bản của context ngoài"""
+        pins = self._pins
+        if getattr(pins, "version", None) is not None:
+            yield
+            return
+        pins.version = self._current
+        try:
+            yield
+        finally:
+            pins.version = None
+    
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Giữ khóa ghi để tuần tự hóa các thay đổi. Với MVCC, thay đổi được áp dụng lên
+        phiên bản làm việc tách từ phiên bản hiện tại và được công bố khi kết thúc;
+        nếu có lỗi, phiên bản làm việc bị hủy. Giao dịch lồng nhau dùng chung
+        phiên bản làm việc của giao dịch ngoài cùng.
+        """
+        with self._lock.write_lock():
+            if not self._mvcc or self._working is not None:
+                yield
+                return
+            
+            with self._csr_lock:
+                self._working = self._current.fork()
+            self._working_thread = threading.get_ident()
+            try:
+                yield
+            except BaseException:
+                self._working = None
+                self._working_thread = None
+                raise
+            self._publish_working()
+    
+    def _publish_working(self):
+        """Công bố phiên bản làm việc thành phiên bản hiện tại (một phép gán nguyên tử)"""
+        version = self._working
+        self._current = version
+        self._working = None
+        self._working_thread = None
+        # Luồng ghi đang giữ một phiên bản cũ phải thấy thay đổi của chính nó
+        if getattr(self._pins, "version", None) is not None:
+            self._pins.version = version
+    
+    @contextmanager
+    def batch(self, save=True):
+        """
+        Gom nhiều thay đổi thành một lô:
+        - Mọi bản ghi dùng chung một thời điểm
+        - Chỉ mục chỉ được cập nhật một lần cho mỗi node khi lô kết thúc
+        - Journal nhận các bản ghi khi lô kết thúc, đồ thị được lưu một lần
+        - Nếu có lỗi, mọi thay đổi trong lô được hoàn tác
+        
+        Lô lồng nhau được gộp vào lô ngoài cùng. Khóa ghi được giữ trong suốt lô;
+        luồng đọc vẫn truy vấn phiên bản trước lô và thấy cả lô cùng lúc khi lô kết thúc.
+        
+        Args:
+            save (bool, optional): Lưu đồ thị khi lô kết thúc nếu có thay đổi
+            
+        Yields:
+            KnowledgeBase: Chính knowledge base này
+        """
+        with self._write_transaction():
+            yield from self._run_batch(save)
+    
+    def _run_batch(self, save):
+        """Thân của batch(), chạy trong giao dịch ghi"""
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            return
+        
+        self._batch_depth = 1
+        self._batch_stamp = datetime.now().isoformat()
+        try:
+            yield self
+        except BaseException:
+            self._rollback_batch()
+            self._reset_batch()
+            raise
+        
+        should_save = self._commit_batch(save)
+        self._reset_batch()
+        if should_save:
+            self.save()
+    
+    def _reset_batch(self):
+        """Đưa trạng thái lô về rỗng"""
+        self._batch_depth = 0
+        self._batch_stamp = None
+        self._batch_save = False
+        # Số thay đổi đã áp dụng trong lô
+        self._batch_changes = 0
+        # Các bản ghi journal chờ ghi
+        self._batch_records = []
+        # Các node cần cập nhật chỉ mục
+        self._batch_reindex = set()
+    
+    def _commit_batch(self, save):
+        """
+        Hoàn tất lô: cập nhật chỉ mục và ghi journal
+        
+        Returns:
+            bool: True nếu cần lưu đồ thị
+        """
+        self._flush_reindex()
+        
+        if self.journal:
+            for op, fields in self._batch_records:
+                self.journal.append(op, **fields)
+        
+        changes = self._batch_changes
+        if changes:
+            self.logger.debug(f"Đã áp dụng lô {changes} thay đổi lúc {self._batch_stamp}")
+        return self._batch_save or (save and changes > 0)
+    
+    def _rollback_batch(self):
+        """Hủy lô: phiên bản làm việc bị bỏ khi giao dịch ghi kết thúc với lỗi, phiên bản hiện tại không đổi"""
+        self.logger.warning(f"Đã hoàn tác lô {self._batch_changes} thay đổi do lỗi")
     
-    def add_node(self, node_id, attributes=None):
+    def _mark_changed(self, structure=False, change=None):
+        """
+        Đánh dấu đồ thị đã thay đổi: tăng thế hệ để bộ nhớ đệm truy vấn không trả về kết quả cũ
+        
+        Args:
+            structure (bool, optional): Cấu trúc (node/edge) thay đổi, khung nhìn CSR cần vá hoặc dựng lại
+            change (tuple, optional): Thay đổi cấu trúc theo dạng của CSRGraph.with_changes;
+                nếu không có, khung nhìn CSR bị bỏ và dựng lại khi cần
+        """
+        version = self._version()
+        version.generation = next(self._generations)
+        if structure:
+            with self._csr_lock:
+                csr = version.csr
+                if change is None or csr is None or len(version.csr_changes) >= self._csr_patch_limit(csr):
+                    version.csr = None
+                    version.csr_changes = []
+                else:
+                    version.csr_changes.append(change)
+        if self._batch_depth:
+            self._batch_changes += 1
+    
+    @property
+    def generation(self):
+        """Thế hệ của phiên bản mà luồng hiện tại thấy"""
+        return self._version().generation
+    
+    def cache_stats(self):
+        """
+        Thống kê bộ nhớ đệm truy vấn
+        
+        Returns:
+            dict: hits, misses, evictions, size, max_entries
+        """
+        return self.query_cache.stats()
+    
+    def _reindex(self, node_id):
+        """Cập nhật chỉ mục của một node (dời đến cuối lô nếu đang trong lô)"""
+        if self._batch_depth:
+            self._batch_reindex.add(node_id)
+        elif node_id in self.graph:
+            self.index.add(node_id, self.graph.nodes[node_id])
+        else:
+            self.index.remove(node_id)
+    
+    def _flush_reindex(self):
+        """Cập nhật chỉ mục cho các node đã thay đổi trong lô"""
+        for node_id in self._batch_reindex:
+            if node_id in self.graph:
+                self.index.add(node_id, self.graph.nodes[node_id])
+            else:
+                self.index.remove(node_id)
+        self._batch_reindex = set()
+    
+    def _reset_unsaved(self):
+        """Đánh dấu mọi thay đổi đã được ghi vào snapshot"""
+        self._unsaved_nodes = set()
+        self._unsaved_edges = set()
+        # Đồ thị bị thay thế toàn bộ (khôi phục backup): backup tiếp theo so sánh cả đồ thị
+        self._unsaved_all = False
+    
+    def _track_unsaved(self, record):
+        """Ghi nhận node/edge của một bản ghi thay đổi là chưa được lưu vào snapshot"""
+        if "id" in record:
+            self._unsaved_nodes.add(record["id"])
+        else:
+            self._unsaved_edges.add((record["u"], record["v"]))
+    
+    def _record(self, op, **fields):
+        """Ghi nhận một thay đổi chưa lưu và ghi nó vào journal (dời đến cuối lô nếu đang trong lô)"""
+        if self.backups:
+            self._track_unsaved(fields)
+        if not self.journal:
+            return
+        if self._batch_depth:
+            self._batch_records.append((op, fields))
+        else:
+            self.journal.append(op, **fields)
+    
+    @_writer
+    def add_node(self, node_id, attributes=None, preserve_timestamps=False):
         """
         Thêm node vào đồ thị
         
         Args:
             node_id (str): ID của node
             attributes (dict, optional): Thuộc tính của node
+            preserve_timestamps (bool, optional): Giữ created_at/updated_at có sẵn trong
+                attributes (khi nhập dữ liệu đã xuất) thay vì gán thời điểm hiện tại
             
         Returns:
             str: ID của node đã thêm
@@ -89,29 +709,38 @@ class KnowledgeBase:
         if attributes is None:
             attributes = {}
             
+        now = self.now()
+        
         # Thêm thông tin thời gian nếu là node mới
         is_new = node_id not in self.graph.nodes
-        if is_new:
+        if is_new and not (preserve_timestamps and "created_at" in attributes):
             attributes.update({
-                "created_at": datetime.now().isoformat(),
+                "created_at": now,
             })
         
         # Luôn cập nhật thời gian sửa đổi
-        attributes.update({
-            "updated_at": datetime.now().isoformat()
-        })
+        if not (preserve_timestamps and "updated_at" in attributes):
+            attributes.update({
+                "updated_at": now
+            })
         
         # Thêm hoặc cập nhật node
         self.graph.add_node(node_id, **attributes)
+        self._reindex(node_id)
+        self.graph_index.set_node_type(node_id, self.graph.nodes[node_id].get("type"))
+        self._mark_changed(structure=is_new, change=("add_node", node_id))
+        self._record("add_node", id=node_id, attrs=attributes)
         
-        # Log tùy theo node mới hay cập nhật
-        if is_new:
-            self.logger.debug(f"Đã thêm node mới: {node_id}")
-        else:
-            self.logger.debug(f"Đã cập nhật node: {node_id}")
+        # Log tùy theo node mới hay cập nhật (bỏ qua trong lô)
+        if not self._batch_depth:
+            if is_new:
+                self.logger.debug(f"Đã thêm node mới: {node_id}")
+            else:
+                self.logger.debug(f"Đã cập nhật node: {node_id}")
             
         return node_id
     
+    @_writer
     def add_edge(self, source, target, relation_type, attributes=None):
         """
         Thêm edge (mối quan hệ) vào đồ thị
@@ -134,32 +763,96 @@ class KnowledgeBase:
             self.logger.warning(f"Node đích không tồn tại: {target}")
             return False
             
+        self._put_edge(source, target, relation_type, attributes)
+        return True
+    
+    def _put_edge(self, source, target, relation_type, attributes, preserve_timestamps=False):
+        """Thêm hoặc cập nhật edge khi đã biết cả hai đầu tồn tại (xem add_node về preserve_timestamps)"""
         # Thêm thông tin thời gian và loại quan hệ
-        attributes.update({
-            "relation_type": relation_type,
-            "created_at": datetime.now().isoformat()
-        })
+        attributes["relation_type"] = relation_type
+        if not (preserve_timestamps and "created_at" in attributes):
+            attributes["created_at"] = self.now()
         
-        # Kiểm tra xem edge đã tồn tại chưa
-        if self.graph.has_edge(source, target):
-            # Cập nhật thuộc tính của edge
-            for key, value in attributes.items():
-                self.graph[source][target][key] = value
-            self.logger.debug(f"Đã cập nhật edge: {source} -> {target} ({relation_type})")
-        else:
-            # Thêm edge mới
-            self.graph.add_edge(source, target, **attributes)
-            self.logger.debug(f"Đã thêm edge mới: {source} -> {target} ({relation_type})")
+        # Kiểm tra xem edge đã tồn tại chưa (cập nhật giữ nguyên loại quan hệ không đổi cấu trúc)
+        old = self.graph.get_edge_data(source, target)
+        exists = old is not None
+        old_relation = old.get("relation_type") if exists else None
         
-        return True
+        # Thêm edge mới hoặc cập nhật thuộc tính của edge (qua add_edge để phiên bản trước không bị sửa)
+        self.graph.add_edge(source, target, **attributes)
+        if not self._batch_depth:
+            if exists:
+                self.logger.debug(f"Đã cập nhật edge: {source} -> {target} ({relation_type})")
+            else:
+                self.logger.debug(f"Đã thêm edge mới: {source} -> {target} ({relation_type})")
+        
+        self.graph_index.add_edge(source, target, relation_type)
+        self._mark_changed(structure=not exists or old_relation != relation_type,
+                           change=("add_edge", source, target, relation_type))
+        self._record("add_edge", u=source, v=target, attrs=attributes)
     
-    def query(self, query_text):
+    @_writer
+    def add_nodes_from(self, nodes, preserve_timestamps=False):
+        """
+        Thêm hoặc cập nhật nhiều node trong một lô
+        
+        Args:
+            nodes (iterable): Các cặp (node_id, attributes)
+            preserve_timestamps (bool, optional): Giữ thời gian có sẵn trong attributes (xem add_node)
+            
+        Returns:
+            list: ID của các node đã thêm hoặc cập nhật
+        """
+        with self.batch():
+            return [self.add_node(node_id, attributes, preserve_timestamps=preserve_timestamps)
+                    for node_id, attributes in nodes]
+    
+    @_writer
+    def add_edges_from(self, edges, preserve_timestamps=False):
+        """
+        Thêm hoặc cập nhật nhiều edge trong một lô.
+        Các edge có node nguồn hoặc đích không tồn tại bị bỏ qua.
+        
+        Args:
+            edges (iterable): Các bộ (source, target, relation_type, attributes)
+            preserve_timestamps (bool, optional): Giữ created_at có sẵn trong attributes (xem add_node)
+            
+        Returns:
+            int: Số edge đã thêm hoặc cập nhật
+        """
+        edges = list(edges)
+        
+        # Kiểm tra các node đầu mút một lần cho cả lô
+        endpoints = {source for source, _, _, _ in edges} | {target for _, target, _, _ in edges}
+        missing = {node_id for node_id in endpoints if node_id not in self.graph.nodes}
+        if missing:
+            self.logger.warning(f"Bỏ qua edge có node không tồn tại: {sorted(missing)}")
+        
+        added = 0
+        with self.batch():
+            for source, target, relation_type, attributes in edges:
+                if source in missing or target in missing:
+                    continue
+                self._put_edge(source, target, relation_type, attributes if attributes is not None else {},
+                               preserve_timestamps=preserve_timestamps)
+                added += 1
+        return added
+    
+    @_reader
+    def query(self, query_text, limit=None, offset=0, min_relevance=None, mode=None):
         """
         Truy vấn đồ thị kiến thức với câu hỏi của người dùng
         Trả về các node và edge liên quan đến câu hỏi
         
         Args:
             query_text (str): Câu hỏi cần truy vấn
+            limit (int, optional): Số kết quả tối đa (mặc định KB_CONFIG['max_results'])
+            offset (int, optional): Số kết quả đầu tiên bỏ qua (phân trang)
+            min_relevance (float, optional): Độ liên quan tối thiểu
+                (mặc định KB_CONFIG['similarity_threshold'])
+            mode (str, optional): 'keyword' (chỉ khớp từ khóa) hoặc 'spreading'
+                (lan truyền từ các node khớp từ khóa qua các quan hệ);
+                mặc định KB_CONFIG['retrieval_mode']
             
         Returns:
             list: Danh sách các node liên quan và độ liên quan
@@ -175,35 +868,65 @@ class KnowledgeBase:
             self.logger.warning("Không tìm thấy từ khóa trong câu hỏi")
             return []
         
-        relevant_nodes = []
-        
-        # Duyệt qua tất cả node trong đồ thị
-        for node, attrs in self.graph.nodes(data=True):
-            # Chuyển node_id thành chuỗi để tìm kiếm
-            node_str = str(node).lower()
-            
-            # Kiểm tra nếu có từ khóa trong node_id
-            if any(keyword in node_str for keyword in keywords):
-                relevant_nodes.append((node, attrs, 1.0))  # Độ liên quan 100%
-                continue
-                
-            # Kiểm tra trong các thuộc tính
-            node_text = " ".join(str(v) for v in attrs.values() if isinstance(v, (str, int, float)))
-            node_text = node_text.lower()
-            
-            # Tính độ liên quan dựa trên số từ khóa xuất hiện
-            matches = sum(1 for keyword in keywords if keyword in node_text)
-            if matches > 0:
-                relevance = matches / len(keywords)
-                if relevance > 0.3:  # Ngưỡng tối thiểu 30% liên quan
-                    relevant_nodes.append((node, attrs, relevance))
+        if limit is None:
+            limit = config.KB_CONFIG.get('max_results', 10)
+        if min_relevance is None:
+            min_relevance = config.KB_CONFIG.get('similarity_threshold', 0.0)
+        if mode is None:
+            mode = config.KB_CONFIG.get('retrieval_mode', 'keyword')
+        offset = max(0, offset)
         
-        # Sắp xếp theo độ liên quan
-        relevant_nodes.sort(key=lambda x: x[2], reverse=True)
+        # Câu hỏi có cùng tập từ khóa đã chuẩn hóa dùng chung kết quả đệm
+        cache_key = (frozenset(query_terms(keywords)), limit, offset, min_relevance, mode)
+        generation = self.generation
+        relevant_nodes = self.query_cache.get(cache_key, generation)
+        if relevant_nodes is None:
+            if mode == 'spreading':
+                seeds = self.index.search(keywords, top_k=spreading_options().get('seed_count', 50))
+                ranked = self._spread(seeds, offset + limit, min_relevance)
+            else:
+                # Xếp hạng BM25 trên chỉ mục ngược; heap chỉ giữ offset + limit kết quả tốt nhất
+                ranked = self.index.search(keywords, top_k=offset + limit, min_relevance=min_relevance)
+            relevant_nodes = [
+                (node, dict(self.graph.nodes[node]), relevance)
+                for node, relevance in ranked[offset:]
+            ]
+            self.query_cache.put(cache_key, generation, relevant_nodes)
+        else:
+            self.logger.debug("Dùng kết quả truy vấn đã đệm")
+        self.access_log.touch(node for node, _, _ in relevant_nodes)
         
         self.logger.info(f"Tìm thấy {len(relevant_nodes)} nodes liên quan")
-        return relevant_nodes
+        # Trả về bản sao thuộc tính để người gọi không sửa vào bộ nhớ đệm
+        return [(node, dict(attrs), relevance) for node, attrs, relevance in relevant_nodes]
+    
+    @_reader
+    def spread_activation(self, seeds, limit=None, min_relevance=None, hops=None):
+        """
+        Mở rộng một tập kết quả bằng lan truyền kích hoạt qua các quan hệ
+        (prerequisite_for, example_of, solution_for, ...) trong một lượt tính vector
+        
+        Args:
+            seeds (list): Các node hạt giống dạng (node_id, relevance) hoặc
+                (node_id, attributes, relevance) như kết quả của query()
+            limit (int, optional): Số kết quả tối đa (mặc định KB_CONFIG['max_results'])
+            min_relevance (float, optional): Độ liên quan tối thiểu (mặc định 0)
+            hops (int, optional): Số bước lan truyền (mặc định KB_CONFIG['spreading']['hops'])
+            
+        Returns:
+            list: Danh sách (node_id, attributes, relevance) giảm dần theo độ liên quan
+        """
+        if limit is None:
+            limit = config.KB_CONFIG.get('max_results', 10)
+        pairs = [(seed[0], seed[-1]) for seed in seeds]
+        ranked = self._spread(pairs, limit, min_relevance or 0.0, hops)
+        return [(node, dict(self.graph.nodes[node]), relevance) for node, relevance in ranked]
     
+    def _spread(self, seeds, top_k, min_relevance, hops=None):
+        """Lan truyền kích hoạt trên khung nhìn CSR hiện tại (xem rank_by_spreading)"""
+        return rank_by_spreading(self.csr_view(), seeds, top_k, min_relevance, hops)
+    
+    @_reader
     def get_node(self, node_id):
         """
         Lấy thông tin của một node
@@ -215,10 +938,11 @@ class KnowledgeBase:
             tuple: (node_id, attributes) nếu tồn tại, None nếu không
         """
         if node_id in self.graph.nodes:
-            return node_id, self.graph.nodes[node_id]
+            return node_id, dict(self.graph.nodes[node_id])
         return None
         
-    def get_related_nodes(self, node_id, relation_type=None, max_depth=1):
+    @_reader
+    def get_related_nodes(self, node_id, relation_type=None, max_depth=1, direction="out", max_nodes=None):
         """
         Lấy các node liên quan đến node hiện tại
         
@@ -226,38 +950,176 @@ class KnowledgeBase:
             node_id (str): ID của node gốc
             relation_type (str, optional): Loại quan hệ cần lọc
             max_depth (int, optional): Độ sâu tối đa tìm kiếm
+            direction (str, optional): 'out' (node kế tiếp), 'in' (node đứng trước) hoặc 'both'
+            max_nodes (int, optional): Số node tối đa trả về
+                (mặc định KB_CONFIG['traversal_max_nodes'])
             
         Returns:
-            list: Danh sách các node liên quan
+            list: Danh sách (node_id, thuộc tính node, thuộc tính edge dẫn tới node)
         """
         if node_id not in self.graph.nodes:
             self.logger.warning(f"Node không tồn tại: {node_id}")
             return []
-            
+        
+        if max_nodes is None:
+            max_nodes = config.KB_CONFIG.get('traversal_max_nodes')
+        
+        # Lọc theo quan hệ chiều ra: chỉ duyệt các edge đúng loại qua chỉ mục phụ
+        if relation_type is not None and direction == "out":
+            return self._related_by_relation(node_id, relation_type, max_depth, max_nodes)
+        
+        # Duyệt theo chiều rộng trên khung nhìn CSR, mỗi node chỉ được trả về một lần
+        view = self.csr_view()
+        relation = view.relation_code(relation_type)
+        if relation == -1:
+            return []
+        
         related = []
-        visited = set()
+        levels = view.bfs_edges([view.index[node_id]], max_depth, relation, direction, max_nodes,
+                                return_outgoing=True)
+        for sources, targets, outgoing in levels:
+            for src, dst, forward in zip(sources.tolist(), targets.tolist(), outgoing.tolist()):
+                src_id, dst_id = view.node_ids[src], view.node_ids[dst]
+                if forward:
+                    edge = self.graph.get_edge_data(src_id, dst_id)
+                else:
+                    # Bước theo chiều vào đi ngược edge dst -> src
+                    edge = self.graph.get_edge_data(dst_id, src_id)
+                related.append((dst_id, dict(self.graph.nodes[dst_id]), dict(edge)))
         
-        def explore(current_id, depth=0):
-            if depth >= max_depth or current_id in visited:
-                return
-                
-            visited.add(current_id)
-            
-            # Tìm các node kết nối trực tiếp
-            for src, dst, data in self.graph.out_edges(current_id, data=True):
-                if relation_type is None or data.get("relation_type") == relation_type:
-                    if dst not in visited:
-                        related.append((dst, self.graph.nodes[dst], data))
-                        
-                        # Tiếp tục tìm ở độ sâu tiếp theo
-                        if depth + 1 < max_depth:
-                            explore(dst, depth + 1)
-        
-        # Bắt đầu tìm từ node gốc
-        explore(node_id)
-                
+        if max_nodes is not None and len(related) >= max_nodes:
+            self.logger.debug(f"Dừng duyệt từ {node_id} do đạt giới hạn {max_nodes} nodes")
         return related
     
+    def _related_by_relation(self, node_id, relation_type, max_depth, max_nodes=None):
+        """Duyệt theo chiều rộng chỉ qua các edge có loại quan hệ cho trước"""
+        related = []
+        visited = {node_id}
+        frontier = [node_id]
+        for _ in range(max_depth):
+            next_frontier = []
+            for src_id in frontier:
+                for dst_id in self.graph_index.neighbors(src_id, relation_type):
+                    if dst_id in visited:
+                        continue
+                    if max_nodes is not None and len(related) >= max_nodes:
+                        return related
+                    visited.add(dst_id)
+                    next_frontier.append(dst_id)
+                    related.append((dst_id, dict(self.graph.nodes[dst_id]), dict(self.graph[src_id][dst_id])))
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return related
+    
+    @_reader
+    def count_node_types(self):
+        """
+        Đếm số node theo từng loại (đọc từ chỉ mục phụ, không duyệt đồ thị)
+        
+        Returns:
+            dict: {loại node: số lượng}
+        """
+        return self.graph_index.type_counts()
+    
+    @_reader
+    def nodes_by_type(self, node_type):
+        """
+        Lấy các node thuộc một loại
+        
+        Args:
+            node_type (str): Loại node
+            
+        Returns:
+            list: ID của các node
+        """
+        return self.graph_index.nodes_of_type(node_type)
+    
+    @_reader
+    def get_subgraph(self, node_ids, max_depth=1, direction="both", relation_type=None, max_nodes=None):
+        """
+        Lấy đồ thị con xung quanh các node cho trước
+        
+        Args:
+            node_ids (list): Danh sách ID của các node gốc
+            max_depth (int, optional): Độ sâu tối đa tìm kiếm
+            direction (str, optional): Hướng duyệt: 'out', 'in' hoặc 'both'
+            relation_type (str, optional): Chỉ duyệt qua loại quan hệ này
+            max_nodes (int, optional): Số node tối đa thêm vào
+                (mặc định KB_CONFIG['traversal_max_nodes'])
+            
+        Returns:
+            networkx.DiGraph: Khung nhìn chỉ đọc của đồ thị con trên đồ thị hiện tại;
+                gọi .copy() nếu cần dùng sau khi đồ thị có thể đã thay đổi
+        """
+        if max_nodes is None:
+            max_nodes = config.KB_CONFIG.get('traversal_max_nodes')
+        return get_subgraph(self.graph, node_ids, max_depth, view=self.csr_view(),
+                            direction=direction, relation_type=relation_type, max_nodes=max_nodes)
+    
+    @_reader
+    def find_paths(self, start_node, end_node, max_length=3):
+        """
+        Tìm các đường đi giữa hai node
+        
+        Args:
+            start_node (str): ID của node bắt đầu
+            end_node (str): ID của node kết thúc
+            max_length (int, optional): Số edge tối đa của mỗi đường đi
+            
+        Returns:
+            list: Các đường đi (list các node ID)
+        """
+        return find_paths(self.graph, start_node, end_node, max_length, view=self.csr_view())
+    
+    @_reader
+    def csr_view(self):
+        """
+        Lấy khung nhìn CSR của đồ thị: vá theo các thay đổi cấu trúc từ lần dựng trước,
+        hoặc dựng lại nếu chưa có
+        
+        Returns:
+            CSRGraph: Khung nhìn chỉ đọc
+        """
+        return self._patched_csr(lambda: CSRGraph.from_networkx(self.graph))
+    
+    def _patched_csr(self, build):
+        """
+        Khung nhìn CSR của phiên bản mà luồng hiện tại thấy, dựng bằng build() nếu chưa có
+        hoặc vá theo các thay đổi đang chờ; kết quả được giữ lại trong phiên bản
+        
+        Args:
+            build (callable): Hàm dựng khung nhìn từ đầu
+            
+        Returns:
+            CSRGraph: Khung nhìn chỉ đọc
+        """
+        version = self._version()
+        with self._csr_lock:
+            view, changes = version.csr, version.csr_changes
+            if view is not None and not changes:
+                return view
+            view = build() if view is None else view.with_changes(changes)
+            version.csr, version.csr_changes = view, []
+            return view
+    
+    @staticmethod
+    def _csr_patch_limit(view):
+        """Số thay đổi cấu trúc tối đa được giữ để vá khung nhìn thay vì dựng lại"""
+        ratio = config.KB_CONFIG.get('csr_patch_ratio', 0.25)
+        if not ratio:
+            return 0
+        return max(256, int(view.edge_count * ratio))
+    
+    @_writer
+    def rebuild_indexes(self):
+        """Dựng lại chỉ mục từ khóa và chỉ mục phụ từ đồ thị (sau khi xóa nhiều node)"""
+        self.index.build(self.graph.nodes(data=True))
+        self.graph_index.build(self.graph)
+        self._mark_changed(structure=True)
+        self.logger.info(f"Đã dựng lại chỉ mục cho {len(self.graph.nodes)} nodes")
+    
+    @_writer
     def remove_node(self, node_id):
         """
         Xóa một node khỏi đồ thị
@@ -270,12 +1132,17 @@ class KnowledgeBase:
         """
         if node_id in self.graph.nodes:
             self.graph.remove_node(node_id)
+            self._reindex(node_id)
+            self.graph_index.remove_node(node_id)
+            self._mark_changed(structure=True, change=("remove_node", node_id))
+            self._record("remove_node", id=node_id)
             self.logger.info(f"Đã xóa node: {node_id}")
             return True
         else:
             self.logger.warning(f"Không thể xóa node không tồn tại: {node_id}")
             return False
     
+    @_writer
     def remove_edge(self, source, target):
         """
         Xóa một edge khỏi đồ thị
@@ -289,8 +1156,27 @@ class KnowledgeBase:
         """
         if self.graph.has_edge(source, target):
             self.graph.remove_edge(source, target)
+            self.graph_index.remove_edge(source, target)
+            self._mark_changed(structure=True, change=("remove_edge", source, target))
+            self._record("remove_edge", u=source, v=target)
             self.logger.info(f"Đã xóa edge: {source} -> {target}")
             return True
         else:
             self.logger.warning(f"Không thể xóa edge không tồn tại: {source} -> {target}")
-            return False
\ No newline at end of file
+            return False
+
+def create_knowledge_base():
+    """
+    Tạo Knowledge Base theo backend cấu hình trong KB_CONFIG['backend']
+    
+    Returns:
+        KnowledgeBase: 'memory' (NetworkX, mặc định), 'sqlite' hoặc 'sharded' (chia shard theo chủ đề)
+    """
+    backend = config.KB_CONFIG.get('backend', 'memory')
+    if backend == 'sqlite':
+        from core.kb_sqlite import SQLiteKnowledgeBase
+        return SQLiteKnowledgeBase()
+    if backend == 'sharded':
+        from core.kb_shards import ShardedKnowledgeBase
+        return ShardedKnowledgeBase()
+    return KnowledgeBase()
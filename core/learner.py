@@ -4,7 +4,6 @@ Learner - Module học tập, tích hợp kiến thức mới vào Knowledge Bas
 
 import logging
 import hashlib
-from datetime import datetime
 
 import config
 from utils.graph_utils import create_node_id
@@ -43,16 +42,15 @@ class Learner:
         self.logger.info(f"Bắt đầu quá trình học với {len(information) if isinstance(information, list) else 1} thông tin mới")
         
         try:
-            # Xử lý danh sách thông tin
-            if isinstance(information, list):
-                for info in information:
-                    self._process_info(info, context)
-            else:
-                # Xử lý một thông tin đơn lẻ
-                self._process_info(information, context)
-                
-            # Lưu knowledge base
-            self.kb.save()
+            # Mọi thay đổi được áp dụng trong một lô và lưu một lần khi kết thúc
+            with self.kb.batch():
+                # Xử lý danh sách thông tin
+                if isinstance(information, list):
+                    for info in information:
+                        self._process_info(info, context)
+                else:
+                    # Xử lý một thông tin đơn lẻ
+                    self._process_info(information, context)
             
             return True
             
@@ -150,7 +148,7 @@ class Learner:
                 context_attrs = {
                     "name": context,
                     "type": "context",
-                    "created_at": datetime.now().isoformat()
+                    "created_at": self.kb.now()
                 }
                 self.kb.add_node(context_id, context_attrs)
                 self.logger.debug(f"Đã tạo node ngữ cảnh: {context} ({context_id})")
@@ -273,7 +271,7 @@ class Learner:
         
         # Cập nhật các thuộc tính
         new_attrs = {
-            "updated_at": datetime.now().isoformat()
+            "updated_at": self.kb.now()
         }
         
         # Cập nhật mô tả nếu cần
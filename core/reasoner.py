@@ -50,6 +50,9 @@ class Reasoner:
             }
         
         try:
+            # Bổ sung các node liên quan (ví dụ, kiến thức tiên quyết, lời giải)
+            kb_results = self._expand_results(kb_results)
+            
             # Phân loại loại câu hỏi
             question_type = self._classify_question(query)
             self.logger.debug(f"Loại câu hỏi: {question_type}")
@@ -95,6 +98,29 @@ class Reasoner:
                 "error": str(e)
             }
     
+    def _expand_results(self, kb_results: List[Tuple[str, Dict, float]]) -> List[Tuple[str, Dict, float]]:
+        """
+        Mở rộng kết quả KB bằng lan truyền kích hoạt qua các quan hệ trong đồ thị
+        
+        Args:
+            kb_results: Kết quả từ KB
+            
+        Returns:
+            list: Kết quả ban đầu cùng các node liên quan, giảm dần theo độ liên quan
+        """
+        if not config.KB_CONFIG.get('spreading', {}).get('expand_in_reasoner', False):
+            return kb_results
+        
+        limit = max(len(kb_results), config.KB_CONFIG.get('max_results', 10))
+        merged = {node: (node, attrs, relevance) for node, attrs, relevance in kb_results}
+        for node, attrs, relevance in self.kb.spread_activation(kb_results, limit=limit):
+            if node not in merged or merged[node][2] < relevance:
+                merged[node] = (node, attrs, relevance)
+        
+        expanded = sorted(merged.values(), key=lambda x: x[2], reverse=True)
+        self.logger.debug(f"Mở rộng {len(kb_results)} kết quả thành {len(expanded)} qua các quan hệ")
+        return expanded
+    
     def evaluate_relevance(self, kb_results: List[Tuple[str, Dict, float]], query: str) -> float:
         """
         Đánh giá độ liên quan của kết quả KB với câu hỏi
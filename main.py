@@ -11,6 +11,8 @@ import logging
 from core.engine import AGIEngine
 from ui.cli import AGICLI
 from ui.web import AGIWeb
+from ui.kb_admin import add_kb_parser, run_kb_command
+from ui.nlp_admin import add_nlp_parser, run_nlp_command
 import config
 
 def parse_arguments():
@@ -18,6 +20,12 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description='Simple AGI - Hệ thống AGI đơn giản với khả năng tự học')
     parser.add_argument('--ui', default='cli', choices=['cli', 'web'], help='Loại giao diện (mặc định: cli)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Hiển thị thông tin chi tiết')
+    
+    # Các lệnh quản trị (không khởi động giao diện)
+    subparsers = parser.add_subparsers(dest='command')
+    add_kb_parser(subparsers)
+    add_nlp_parser(subparsers)
+    
     return parser.parse_args()
 
 def setup_logging():
@@ -39,6 +47,11 @@ def main():
     args = parse_arguments()
     logger = setup_logging()
     
+    if args.command == 'kb':
+        sys.exit(run_kb_command(args))
+    if args.command == 'nlp':
+        sys.exit(run_nlp_command(args))
+    
     try:
         # Khởi tạo engine
         logger.info("Khởi tạo AGI Engine")
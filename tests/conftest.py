@@ -0,0 +1,44 @@
+"""
+Cấu hình chung cho test: Knowledge Base dùng thư mục tạm thay vì dữ liệu thật
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+def isolate_kb_config(monkeypatch, root):
+    """
+    Trỏ mọi file của Knowledge Base sang thư mục root, không nạp dữ liệu khởi tạo
+
+    Args:
+        monkeypatch: Fixture monkeypatch của pytest (khôi phục cấu hình khi test kết thúc)
+        root: Thư mục chứa dữ liệu (pathlib.Path)
+
+    Returns:
+        dict: config.KB_CONFIG đã được sửa
+    """
+    kg_dir = root / "knowledge_graph"
+    kg_dir.mkdir(parents=True)
+    monkeypatch.setattr(config, "DATA_DIR", str(root))
+    monkeypatch.setattr(config, "KNOWLEDGE_GRAPH_DIR", str(kg_dir))
+    monkeypatch.setattr(config, "CACHE_DIR", str(root / "cache"))
+
+    kb_config = config.KB_CONFIG
+    for key in ('graph_file', 'binary_graph_file', 'sqlite_file', 'journal_file', 'seed_state_file',
+                'access_log_file', 'initial_knowledge'):
+        monkeypatch.setitem(kb_config, key, str(kg_dir / os.path.basename(kb_config[key])))
+    monkeypatch.setitem(kb_config, 'shard_dir', str(kg_dir / "shards"))
+    monkeypatch.setitem(kb_config, 'backup_dir', str(kg_dir / "backups"))
+    monkeypatch.setitem(kb_config, 'mmap_snapshot', dict(kb_config['mmap_snapshot'], dir=str(kg_dir / "mmap")))
+    monkeypatch.setitem(kb_config, 'seed_files', [])
+    return kb_config
+
+@pytest.fixture
+def kb_config(tmp_path, monkeypatch):
+    """Knowledge Base dùng thư mục tạm của test (xem isolate_kb_config)"""
+    return isolate_kb_config(monkeypatch, tmp_path)
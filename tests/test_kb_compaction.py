@@ -0,0 +1,28 @@
+"""
+Kiểm tra nén Knowledge Base (kb compact)
+"""
+
+import pytest
+
+from core.knowledge_base import create_knowledge_base
+from core.kb_compaction import Compactor
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite", "sharded"])
+def test_merge_moves_every_edge_of_a_hub_context(kb_config, monkeypatch, backend):
+    monkeypatch.setitem(kb_config, 'backend', backend)
+    # Giới hạn duyệt nhỏ hơn số edge của node ngữ cảnh trùng
+    monkeypatch.setitem(kb_config, 'traversal_max_nodes', 2)
+    kb = create_knowledge_base()
+    entities = [f"entity_{i}" for i in range(6)]
+    kb.add_nodes_from([(node_id, {"name": node_id, "type": "concept"}) for node_id in entities])
+    kb.add_node("ctx_a", {"name": "Phép cộng là gì", "type": "context",
+                          "created_at": "2020-01-01T00:00:00", "updated_at": "2020-01-01T00:00:00"},
+                preserve_timestamps=True)
+    kb.add_node("ctx_b", {"name": "phép cộng là gì?", "type": "context"})
+    kb.add_edges_from([("ctx_a", node_id, "mentions", {}) for node_id in entities])
+
+    stats = Compactor(kb).run()
+
+    assert stats["merged"] == 1
+    assert "ctx_a" not in kb.graph.nodes
+    assert sorted(target for _, target in kb.graph.out_edges("ctx_b")) == entities
@@ -0,0 +1,55 @@
+"""
+Kiểm tra truy vấn từ khóa: ngưỡng độ liên quan mặc định, khớp không dấu và stopword
+"""
+
+import unicodedata
+from collections import Counter
+
+import pytest
+
+import config
+from core.kb_index import index_terms, query_terms
+from core.knowledge_base import create_knowledge_base
+from utils import nlp_utils
+from utils.nlp_cache import KeywordCache
+from utils.nlp_utils import extract_keywords, fold_diacritics
+
+def test_default_threshold_keeps_secondary_nodes(kb_config):
+    kb = create_knowledge_base()
+    kb.add_node("phep_cong", {"name": "Phép cộng", "type": "concept",
+                              "description": "Phép cộng là phép toán gộp hai số thành tổng của chúng"})
+    kb.add_node("vi_du_1_cong_1", {"name": "1 + 1 = 2", "type": "example",
+                                   "description": "Ví dụ về phép cộng hai số tự nhiên"})
+    kb.add_edge("vi_du_1_cong_1", "phep_cong", "example_of")
+
+    for question in ("Phép cộng là gì?", "phep cong"):
+        found = [node_id for node_id, _, _ in kb.query(question)]
+        assert found[0] == "phep_cong"
+        assert "vi_du_1_cong_1" in found
+
+@pytest.mark.parametrize("backend", ["vi", "regex"])
+def test_unaccented_stopwords_do_not_match(kb_config, monkeypatch, backend):
+    monkeypatch.setitem(config.NLP_CONFIG, 'backend', backend)
+    monkeypatch.setattr(nlp_utils, "keyword_cache", KeywordCache())
+    kb = create_knowledge_base()
+    kb.add_node("phep_cong", {"name": "Phép cộng", "type": "concept",
+                              "description": "Phép cộng là phép toán gộp hai số thành tổng của chúng"})
+    kb.add_node("dong_ho", {"name": "Đồng hồ", "type": "concept",
+                            "description": "Đồng hồ là dụng cụ để xem giờ, nó có kim giờ và kim phút"})
+
+    # "la", "co", "va" là dạng bỏ dấu của stopword, không được khớp với "là", "có", "và" trong mô tả
+    assert extract_keywords("phep cong la gi") == ["phep", "cong", "gi"]
+    assert query_terms(["phep cong la gi", "co va"]) == ["phep", "cong", "gi"]
+    for question in ("phép cộng là gì", "phep cong la gi"):
+        assert [node_id for node_id, _, _ in kb.query(question)] == ["phep_cong"]
+
+def test_fold_diacritics():
+    assert fold_diacritics("Phép cộng") == "Phep cong"
+    assert fold_diacritics("đếm ĐỒNG HỒ") == "dem DONG HO"
+    # Dấu tổ hợp (NFD) cho cùng kết quả với chữ dựng sẵn
+    assert fold_diacritics(unicodedata.normalize("NFD", "số bị trừ")) == "so bi tru"
+    assert fold_diacritics("phep cong 1 + 1") == "phep cong 1 + 1"
+
+def test_index_terms_add_folded_tokens():
+    terms = index_terms(Counter({"phép": 2, "phep": 1, "cộng": 1, "tổng": 1, "số": 3}))
+    assert terms == Counter({"phép": 2, "phep": 3, "cộng": 1, "cong": 1, "tổng": 1, "tong": 1, "số": 3, "so": 3})
@@ -0,0 +1,35 @@
+"""
+Kiểm tra backend sharded chỉ đọc các shard và bảng tra cứu cần cho một truy vấn
+"""
+
+import json
+import os
+
+from core.knowledge_base import create_knowledge_base
+
+def build(kb_config, backend):
+    kb_config['backend'] = backend
+    kb = create_knowledge_base()
+    with kb.batch():
+        kb.add_node("phep_cong", {"name": "Phép cộng", "type": "concept"})
+        kb.add_node("vi_du_cong", {"name": "Ví dụ phép cộng", "type": "example"})
+        kb.add_node("dong_ho", {"name": "Đồng hồ", "type": "concept"})
+        kb.add_node("xem_gio", {"name": "Xem giờ trên đồng hồ", "type": "example"})
+        kb.add_edge("vi_du_cong", "phep_cong", "example_of")
+        kb.add_edge("xem_gio", "dong_ho", "example_of")
+    return kb
+
+def test_spreading_loads_only_neighbourhood(kb_config):
+    expected = build(kb_config, "memory").spread_activation([("phep_cong", 1.0)])
+
+    build(kb_config, "sharded").save()
+    with open(os.path.join(kb_config['shard_dir'], "index.json"), encoding="utf-8") as f:
+        assert "phep_cong" not in json.dumps(json.load(f), ensure_ascii=False)
+
+    kb = create_knowledge_base()
+    assert kb.graph.loaded_shards() == []
+    found = kb.spread_activation([("phep_cong", 1.0)])
+    assert [(node, relevance) for node, _, relevance in found] == \
+           [(node, relevance) for node, _, relevance in expected]
+    assert kb.graph.loaded_shards() == [kb.graph.shard_of("phep_cong")]
+    assert kb.graph.shard_of("dong_ho") != kb.graph.shard_of("phep_cong")
@@ -0,0 +1,59 @@
+"""
+Kiểm tra đồng thời: luồng đọc không bao giờ thấy một lần học làm dở (kb stress)
+"""
+
+import threading
+
+import pytest
+
+from core.knowledge_base import create_knowledge_base
+from ui.kb_admin import stress_test
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite", "sharded"])
+def test_stress_has_no_violations(kb_config, monkeypatch, backend):
+    monkeypatch.setitem(kb_config, 'backend', backend)
+
+    stats = stress_test(create_knowledge_base(), readers=3, writers=2, seconds=0.5)
+
+    assert stats["errors"] == []
+    assert stats["violations"] == 0
+    assert stats["learned"] > 0
+    assert stats["queries"] > 0
+
+def test_sqlite_readers_do_not_wait_for_open_batch(kb_config, monkeypatch):
+    monkeypatch.setitem(kb_config, 'backend', 'sqlite')
+    kb = create_knowledge_base()
+    kb.add_node("phep_cong", {"name": "Phép cộng", "type": "concept"})
+    opened, done = threading.Event(), threading.Event()
+
+    def learn():
+        with kb.batch():
+            kb.add_node("phep_tru", {"name": "Phép trừ", "type": "concept"})
+            opened.set()
+            done.wait(5)
+
+    writer = threading.Thread(target=learn)
+    writer.start()
+    opened.wait(5)
+    # Luồng đọc không chờ lô đang mở và không thấy thay đổi chưa commit của lô
+    assert [node_id for node_id, _, _ in kb.query("phép cộng")] == ["phep_cong"]
+    assert "phep_tru" not in kb.graph.nodes
+    done.set()
+    writer.join()
+    assert "phep_tru" in kb.graph.nodes
+
+def test_sqlite_reading_keeps_one_snapshot_while_writers_run(kb_config, monkeypatch):
+    monkeypatch.setitem(kb_config, 'backend', 'sqlite')
+    kb = create_knowledge_base()
+    kb.add_nodes_from([(f"n{i}", {"name": f"node {i}"}) for i in range(1200)])
+
+    with kb.reading():
+        nodes = iter(kb.graph.nodes)
+        exported = [next(nodes)]
+        writer = threading.Thread(target=lambda: kb.add_nodes_from([(f"w{i}", {}) for i in range(600)]))
+        writer.start()
+        writer.join(5)
+        assert not writer.is_alive()
+        exported.extend(nodes)
+    assert len(exported) == 1200
+    assert len(kb.graph.nodes) == 1800
@@ -0,0 +1,37 @@
+"""
+Kiểm tra xuất/nhập đồ thị dạng JSONL (kb export / kb import)
+"""
+
+import pytest
+
+from conftest import isolate_kb_config
+from core.knowledge_base import create_knowledge_base
+from core.kb_transfer import export_graph, import_graph
+
+CREATED = "2020-01-02T03:04:05"
+UPDATED = "2021-06-07T08:09:10"
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite", "sharded"])
+def test_roundtrip_preserves_timestamps(kb_config, monkeypatch, tmp_path, backend):
+    monkeypatch.setitem(kb_config, 'backend', backend)
+    source = create_knowledge_base()
+    source.add_nodes_from([
+        ("phep_cong", {"name": "Phép cộng", "created_at": CREATED, "updated_at": UPDATED}),
+        ("phep_tru", {"name": "Phép trừ", "created_at": CREATED, "updated_at": UPDATED}),
+    ], preserve_timestamps=True)
+    source.add_edges_from([("phep_tru", "phep_cong", "related_to", {"created_at": CREATED})],
+                          preserve_timestamps=True)
+    path = str(tmp_path / "export.jsonl")
+    export_graph(source, path)
+
+    # KB đích mới, cùng backend, trong thư mục khác
+    isolate_kb_config(monkeypatch, tmp_path / "target")
+    target = create_knowledge_base()
+    counts = import_graph(target, path)
+
+    assert counts == {"nodes": 2, "edges": 1, "skipped": 0}
+    for node_id in ("phep_cong", "phep_tru"):
+        attrs = target.get_node(node_id)[1]
+        assert (attrs["created_at"], attrs["updated_at"]) == (CREATED, UPDATED)
+    edges = {(u, v): attrs for u, v, attrs in target.graph.edges(data=True)}
+    assert edges[("phep_tru", "phep_cong")]["created_at"] == CREATED
@@ -0,0 +1,42 @@
+"""
+Kiểm tra duyệt quan hệ theo hướng: edge trả về phải đúng chiều của bước duyệt
+"""
+
+import pytest
+
+from core.knowledge_base import create_knowledge_base
+from core.kb_mmap import MmapSnapshot, publish_snapshot
+
+def build_reverse_pair():
+    kb = create_knowledge_base()
+    kb.add_nodes_from([("a", {"name": "a", "type": "concept"}), ("b", {"name": "b", "type": "concept"})])
+    # Hai edge ngược chiều giữa cùng một cặp node với hai loại quan hệ khác nhau
+    kb.add_edges_from([("a", "b", "prerequisite_for", {}), ("b", "a", "example_of", {})])
+    return kb
+
+def relations(related):
+    return sorted((node_id, edge["relation_type"]) for node_id, _, edge in related)
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite", "sharded"])
+def test_direction_reports_edge_of_each_hop(kb_config, monkeypatch, backend):
+    monkeypatch.setitem(kb_config, 'backend', backend)
+    kb = build_reverse_pair()
+
+    assert relations(kb.get_related_nodes("a", direction="in")) == [("b", "example_of")]
+    assert relations(kb.get_related_nodes("a", relation_type="example_of", direction="in")) == [("b", "example_of")]
+    assert relations(kb.get_related_nodes("a", relation_type="prerequisite_for", direction="in")) == []
+    assert relations(kb.get_related_nodes("a", relation_type="prerequisite_for", direction="both")) == \
+           [("b", "prerequisite_for")]
+    assert relations(kb.get_related_nodes("a", relation_type="example_of", direction="both")) == [("b", "example_of")]
+    assert relations(kb.get_related_nodes("b", relation_type="prerequisite_for", direction="in")) == \
+           [("a", "prerequisite_for")]
+
+def test_mmap_snapshot_reports_edge_of_each_hop(kb_config):
+    publish_snapshot(build_reverse_pair())
+    snapshot = MmapSnapshot()
+
+    assert relations(snapshot.get_related_nodes("a", relation_type="example_of", direction="in")) == \
+           [("b", "example_of")]
+    assert relations(snapshot.get_related_nodes("a", relation_type="prerequisite_for", direction="both")) == \
+           [("b", "prerequisite_for")]
+    assert relations(snapshot.get_related_nodes("b", direction="in")) == [("a", "prerequisite_for")]
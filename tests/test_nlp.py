@@ -0,0 +1,88 @@
+"""
+Kiểm tra bộ tách từ tiếng Việt và bộ nhớ đệm từ khóa
+"""
+
+import unicodedata
+
+import config
+from utils import nlp_utils
+from utils.nlp_cache import KeywordCache
+from utils.vi_tokenizer import VietnameseTokenizer
+
+def make_tokenizer():
+    return VietnameseTokenizer(["là", "và", "của"], ["số bị trừ", "số trừ", "hàng chục", "hàng đơn vị", "lớn hơn"])
+
+def test_nfc_and_nfd_tokenize_alike():
+    tokenizer = make_tokenizer()
+    text = "Số bị trừ của phép TRỪ lớn hơn số trừ"
+    decomposed = unicodedata.normalize("NFD", text)
+    assert decomposed != text
+
+    assert tokenizer.tokenize(decomposed) == tokenizer.tokenize(text) == \
+           ["số bị trừ", "của", "phép", "trừ", "lớn hơn", "số trừ"]
+    assert tokenizer.keywords(decomposed) == tokenizer.keywords(text)
+    # Cụm và stopword khai báo ở dạng NFD cũng được chuẩn hóa
+    nfd_tokenizer = VietnameseTokenizer([unicodedata.normalize("NFD", "của")],
+                                        [unicodedata.normalize("NFD", "Số bị trừ")])
+    assert nfd_tokenizer.keywords(text) == ["trừ", "số bị trừ", "phép", "lớn", "hơn", "số"]
+
+def test_longest_phrase_wins():
+    tokenizer = make_tokenizer()
+    # "số bị trừ" không được tách thành "số" + "bị" + "trừ", "số trừ" vẫn khớp riêng
+    assert tokenizer.tokenize("số bị trừ trừ số trừ") == ["số bị trừ", "trừ", "số trừ"]
+    assert tokenizer.tokenize("số bị") == ["số", "bị"]
+
+def test_phrase_stops_at_syllable_boundary():
+    tokenizer = make_tokenizer()
+    assert tokenizer.tokenize("hàng chụcx") == ["hàng", "chụcx"]
+    assert tokenizer.tokenize("hàng chục_1, hàng đơn vịa") == ["hàng chục", "1", "hàng", "đơn", "vịa"]
+    assert tokenizer.tokenize("xhàng chục") == ["xhàng", "chục"]
+
+def test_keywords_drop_stopwords_and_keep_first_occurrence_order_on_ties():
+    tokenizer = make_tokenizer()
+    text = "đếm và so sánh, so sánh và đếm là lớn hơn của hàng chục x"
+    # Cùng tần suất thì giữ thứ tự xuất hiện đầu tiên; cụm chứa stopword ("lớn hơn") vẫn được giữ
+    assert tokenizer.keywords(text) == ["đếm", "so", "sánh", "lớn hơn", "hàng chục"]
+    assert tokenizer.keywords(text, max_keywords=2) == ["đếm", "so"]
+    assert tokenizer.keywords("") == []
+
+def test_keyword_cache_evicts_least_recently_used():
+    cache = KeywordCache(max_entries=2)
+    first, second, third = (cache.key(text, 10) for text in ("một", "hai", "ba"))
+    cache.put(first, ["một"])
+    cache.put(second, ["hai"])
+    assert cache.get(first) == ["một"]
+
+    # "hai" được dùng lâu nhất nên bị loại, không phải "một"
+    cache.put(third, ["ba"])
+    assert cache.get(second) is None
+    assert cache.get(first) == ["một"]
+    assert cache.get(third) == ["ba"]
+    assert cache.stats() == {"hits": 3, "misses": 1, "evictions": 1, "size": 2, "max_entries": 2, "hit_rate": 0.75}
+
+    # Người gọi sửa kết quả không làm hỏng mục đã lưu
+    cache.get(first).append("x")
+    assert cache.get(first) == ["một"]
+
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["hits"] == 0
+
+def test_keyword_cache_key_depends_on_text_and_limit():
+    cache = KeywordCache()
+    assert cache.key("phép cộng", 10) == cache.key("phép cộng", 10)
+    assert cache.key("phép cộng", 10) != cache.key("phép cộng", 5)
+    assert cache.key("phép cộng", 10) != cache.key("phép trừ", 10)
+
+    disabled = KeywordCache(max_entries=0)
+    disabled.put(disabled.key("phép cộng", 10), ["phép cộng"])
+    assert len(disabled) == 0
+
+def test_extract_keywords_uses_cache(monkeypatch):
+    monkeypatch.setitem(config.NLP_CONFIG, 'backend', 'vi')
+    cache = KeywordCache()
+    monkeypatch.setattr(nlp_utils, "keyword_cache", cache)
+
+    assert nlp_utils.extract_keywords("Phép cộng là gì?") == ["phép cộng", "gì"]
+    keywords = nlp_utils.extract_keywords("phép cộng là gì?")
+    assert keywords == ["phép cộng", "gì"]
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,297 @@
+"""
+KB Admin - Các lệnh quản trị Knowledge Base từ dòng lệnh
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import config
+from core.knowledge_base import create_knowledge_base
+from core.kb_snapshot import convert_snapshot, benchmark_snapshot_formats
+from core.kb_bootstrap import SeedLoader
+from core.kb_transfer import NodeFilter, export_graph, import_graph
+from core.kb_mmap import publish_snapshot
+from core.kb_compaction import Compactor
+from core.learner import Learner
+
+logger = logging.getLogger("KBAdmin")
+
+def add_kb_parser(subparsers):
+    """
+    Đăng ký nhóm lệnh 'kb' vào argparse
+
+    Args:
+        subparsers: Đối tượng trả về từ ArgumentParser.add_subparsers()
+    """
+    kb_parser = subparsers.add_parser('kb', help='Các lệnh quản trị Knowledge Base')
+    kb_commands = kb_parser.add_subparsers(dest='kb_command', required=True)
+
+    kb_commands.add_parser('backups', help='Liệt kê các thời điểm backup có thể khôi phục')
+
+    restore_parser = kb_commands.add_parser('restore', help='Khôi phục đồ thị về một thời điểm backup')
+    restore_parser.add_argument('stamp', help='Thời điểm backup (YYYYMMDD_HHMMSS)')
+
+    convert_parser = kb_commands.add_parser('convert', help='Chuyển snapshot giữa JSON (.json) và nhị phân (.kgb)')
+    convert_parser.add_argument('src', help='File snapshot nguồn')
+    convert_parser.add_argument('dst', help='File snapshot đích')
+
+    bench_parser = kb_commands.add_parser('bench-snapshot', help='So sánh tốc độ tải và bộ nhớ của snapshot JSON và nhị phân')
+    bench_parser.add_argument('--file', default=config.KB_CONFIG['graph_file'], help='Snapshot JSON dùng để đo')
+    bench_parser.add_argument('--repeat', type=int, default=3, help='Số lần đo mỗi định dạng')
+
+    seed_parser = kb_commands.add_parser('seed', help='Nạp kiến thức khởi tạo từ các file seed')
+    seed_parser.add_argument('files', nargs='*', help="File seed JSON/JSONL (mặc định KB_CONFIG['seed_files'])")
+    seed_parser.add_argument('--force', action='store_true', help='Nạp lại kể cả khi file không đổi')
+
+    export_parser = kb_commands.add_parser('export', help='Xuất node và edge ra file JSONL (đuôi .gz để nén)')
+    export_parser.add_argument('file', help="File đích ('-' để ghi ra stdout)")
+    export_parser.add_argument('--type', action='append', dest='node_types', help='Chỉ xuất loại node này (lặp lại được)')
+    export_parser.add_argument('--source', help='Chỉ xuất node có thuộc tính source này')
+    export_parser.add_argument('--since', help='Chỉ xuất node/edge thay đổi từ thời điểm này (ISO 8601)')
+    export_parser.add_argument('--gzip', action='store_true', default=None, help='Nén gzip kể cả khi không có đuôi .gz')
+
+    import_parser = kb_commands.add_parser('import', help='Nhập node và edge từ file JSONL do kb export tạo ra')
+    import_parser.add_argument('file', help="File nguồn ('-' để đọc từ stdin)")
+    import_parser.add_argument('--gzip', action='store_true', default=None, help='File nén gzip kể cả khi không có đuôi .gz')
+
+    publish_parser = kb_commands.add_parser('publish', help='Công bố snapshot chỉ đọc (mmap) cho các process worker')
+    publish_parser.add_argument('--dir', help="Thư mục snapshot (mặc định KB_CONFIG['mmap_snapshot']['dir'])")
+
+    kb_commands.add_parser('shards', help='Thống kê các shard (backend sharded)')
+
+    compact_parser = kb_commands.add_parser('compact', help='Gộp/xóa node ngữ cảnh cũ và node độ tin cậy thấp không được dùng')
+    compact_parser.add_argument('--dry-run', action='store_true', help='Chỉ báo cáo những gì sẽ được thu hồi')
+    compact_parser.add_argument('--context-ttl', type=float, help="Số ngày giữ node ngữ cảnh (mặc định KB_CONFIG['compaction'])")
+    compact_parser.add_argument('--node-ttl', type=float, help="Số ngày giữ node độ tin cậy thấp (mặc định KB_CONFIG['compaction'])")
+    compact_parser.add_argument('--min-confidence', type=float, help="Mức độ tin cậy tối thiểu (mặc định KB_CONFIG['compaction'])")
+
+    stress_parser = kb_commands.add_parser('stress', help='Chạy truy vấn song song với quá trình học trên bản sao của KB')
+    stress_parser.add_argument('--readers', type=int, default=8, help='Số luồng truy vấn')
+    stress_parser.add_argument('--writers', type=int, default=2, help='Số luồng học')
+    stress_parser.add_argument('--seconds', type=float, default=5.0, help='Thời gian chạy (giây)')
+
+@contextmanager
+def isolated_kb_config():
+    """
+    Tạm thời trỏ các file của Knowledge Base sang thư mục tạm chứa bản sao đồ thị hiện tại,
+    để các lệnh đo đạc không thay đổi dữ liệu thật
+    """
+    original = dict(config.KB_CONFIG)
+    tmp_dir = tempfile.mkdtemp(prefix="kb_admin_")
+    try:
+        for key in ('graph_file', 'binary_graph_file', 'sqlite_file', 'journal_file', 'seed_state_file',
+                    'access_log_file'):
+            path = original.get(key)
+            if not path:
+                continue
+            config.KB_CONFIG[key] = os.path.join(tmp_dir, os.path.basename(path))
+            if os.path.exists(path):
+                shutil.copy2(path, config.KB_CONFIG[key])
+        shard_dir = original.get('shard_dir')
+        if shard_dir:
+            config.KB_CONFIG['shard_dir'] = os.path.join(tmp_dir, "shards")
+            if os.path.isdir(shard_dir):
+                shutil.copytree(shard_dir, config.KB_CONFIG['shard_dir'])
+        config.KB_CONFIG['backup_dir'] = os.path.join(tmp_dir, "backups")
+        yield tmp_dir
+    finally:
+        config.KB_CONFIG.clear()
+        config.KB_CONFIG.update(original)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def stress_test(kb, readers=8, writers=2, seconds=5.0):
+    """
+    Chạy các truy vấn song song với quá trình học và kiểm tra luồng đọc
+    không bao giờ thấy một lần học làm dở.
+
+    Mỗi lần học thêm một cặp thực thể cùng quan hệ giữa chúng; luồng đọc kiểm tra
+    mọi thực thể nguồn tìm thấy đều đã có quan hệ tới thực thể đích.
+
+    Args:
+        kb: Knowledge base cần kiểm tra
+        readers: Số luồng truy vấn
+        writers: Số luồng học
+        seconds: Thời gian chạy
+
+    Returns:
+        dict: Số truy vấn, số lần học, số vi phạm, các lỗi gặp phải và
+            độ trễ mỗi lượt đọc (read_ms: p50, p99, max)
+    """
+    learner = Learner(kb)
+    stop = threading.Event()
+    stats = {"queries": 0, "learned": 0, "violations": 0, "errors": []}
+    latencies = []
+    stats_lock = threading.Lock()
+
+    def write_loop(writer_id):
+        n = 0
+        while not stop.is_set():
+            source, target = f"stresssrc w{writer_id}n{n}", f"stressdst w{writer_id}n{n}"
+            info = {
+                "entities": [{"name": source, "type": "concept"}, {"name": target, "type": "concept"}],
+                "relations": [{"source": source, "target": target, "relation_type": "stress_pair",
+                               "source_type": "concept", "target_type": "concept"}],
+                "confidence": 0.9,
+                "source": "stress"
+            }
+            if learner.learn(info):
+                with stats_lock:
+                    stats["learned"] += 1
+            n += 1
+
+    def read_loop():
+        while not stop.is_set():
+            violations = 0
+            started = time.perf_counter()
+            # Giữ một phiên bản cho cả lượt để truy vấn và kiểm tra cùng thấy một trạng thái
+            with kb.reading():
+                for node_id, attrs, _ in kb.query("stresssrc"):
+                    if not attrs.get("name", "").startswith("stresssrc"):
+                        continue
+                    related = kb.get_related_nodes(node_id, relation_type="stress_pair")
+                    if len(related) != 1:
+                        violations += 1
+            elapsed = (time.perf_counter() - started) * 1000
+            with stats_lock:
+                latencies.append(elapsed)
+                stats["queries"] += 1
+                stats["violations"] += violations
+
+    def guarded(target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            with stats_lock:
+                stats["errors"].append(repr(e))
+            stop.set()
+
+    threads = [threading.Thread(target=guarded, args=(write_loop, i)) for i in range(writers)]
+    threads += [threading.Thread(target=guarded, args=(read_loop,)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    stats["read_ms"] = {
+        "p50": latencies[len(latencies) // 2] if latencies else 0.0,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0,
+        "max": latencies[-1] if latencies else 0.0
+    }
+    return stats
+
+def run_kb_command(args):
+    """
+    Thực thi lệnh 'kb'
+
+    Args:
+        args: Kết quả phân tích tham số dòng lệnh
+
+    Returns:
+        int: Mã thoát (0 nếu thành công)
+    """
+    # Các lệnh chỉ làm việc với file, không cần khởi tạo Knowledge Base
+    if args.kb_command == 'convert':
+        graph = convert_snapshot(args.src, args.dst)
+        print(f"Đã chuyển {args.src} -> {args.dst} ({len(graph.nodes)} nodes, {len(graph.edges)} edges)")
+        return 0
+
+    if args.kb_command == 'bench-snapshot':
+        results = benchmark_snapshot_formats(args.file, repeat=args.repeat)
+        print(f"{'Định dạng':<10} {'Tải (ms)':>10} {'Bộ nhớ đỉnh (MB)':>18} {'Kích thước (KB)':>16}")
+        for name, result in results.items():
+            print(f"{name:<10} {result['load_seconds'] * 1000:>10.2f} {result['peak_mb']:>18.2f} {result['file_kb']:>16.1f}")
+        return 0
+
+    if args.kb_command == 'stress':
+        with isolated_kb_config():
+            # Tắt log chi tiết để không làm chậm các luồng
+            logging.getLogger().setLevel(logging.WARNING)
+            stats = stress_test(create_knowledge_base(), args.readers, args.writers, args.seconds)
+        print(f"Truy vấn: {stats['queries']}, lần học: {stats['learned']}, "
+              f"vi phạm: {stats['violations']}, lỗi: {len(stats['errors'])}")
+        print(f"Độ trễ đọc (ms): p50 {stats['read_ms']['p50']:.2f}, p99 {stats['read_ms']['p99']:.2f}, "
+              f"max {stats['read_ms']['max']:.2f}")
+        for error in stats['errors']:
+            print(f"  {error}")
+        return 0 if not stats['violations'] and not stats['errors'] else 1
+
+    kb = create_knowledge_base()
+
+    if args.kb_command == 'backups':
+        stamps = kb.list_backups()
+        if not stamps:
+            print("Chưa có backup nào")
+        for stamp in stamps:
+            print(stamp)
+        return 0
+
+    if args.kb_command == 'restore':
+        if kb.restore_backup(args.stamp):
+            print(f"Đã khôi phục đồ thị về thời điểm {args.stamp}")
+            return 0
+        print(f"Không thể khôi phục backup {args.stamp}")
+        return 1
+
+    if args.kb_command == 'seed':
+        results = SeedLoader(kb).load(args.files or None, force=args.force)
+        if not results:
+            print("Không có file seed nào")
+        for path, result in results.items():
+            print(f"{path}: {result['status']} ({result['entities']} thực thể, {result['relations']} quan hệ)")
+        return 0 if all(result['status'] != 'error' for result in results.values()) else 1
+
+    if args.kb_command == 'export':
+        if args.since:
+            try:
+                datetime.fromisoformat(args.since)
+            except ValueError:
+                print(f"Thời điểm không hợp lệ (cần ISO 8601): {args.since}")
+                return 1
+        node_filter = NodeFilter(args.node_types, args.source, args.since)
+        counts = export_graph(kb, args.file, node_filter, compress=args.gzip)
+        if args.file != '-':
+            print(f"Đã xuất {counts['nodes']} nodes và {counts['edges']} edges ra {args.file}")
+        return 0
+
+    if args.kb_command == 'import':
+        counts = import_graph(kb, args.file, compress=args.gzip)
+        print(f"Đã nhập {counts['nodes']} nodes và {counts['edges']} edges, bỏ qua {counts['skipped']} dòng")
+        return 0
+
+    if args.kb_command == 'publish':
+        version = publish_snapshot(kb, args.dir)
+        print(f"Đã công bố snapshot {version}")
+        return 0
+
+    if args.kb_command == 'shards':
+        if not hasattr(kb, 'shard_stats'):
+            print("Backend hiện tại không chia shard (đặt KB_CONFIG['backend'] = 'sharded')")
+            return 1
+        print(f"{'Shard':<14} {'Nodes':>8} {'Edges':>8} {'Đã tải':>8}")
+        for name, stats in kb.shard_stats().items():
+            print(f"{name:<14} {stats['nodes']:>8} {stats['edges']:>8} {'có' if stats['loaded'] else '':>8}")
+        return 0
+
+    if args.kb_command == 'compact':
+        settings = {key: value for key, value in (('context_ttl_days', args.context_ttl),
+                                                  ('node_ttl_days', args.node_ttl),
+                                                  ('confidence_floor', args.min_confidence)) if value is not None}
+        report = Compactor(kb, settings).run(dry_run=args.dry_run)
+        prefix = "Sẽ thu hồi" if report['dry_run'] else "Đã thu hồi"
+        bytes_label = "bytes (ước lượng)" if report['dry_run'] else "bytes"
+        print(f"{prefix} {report['nodes']} nodes, {report['edges']} edges, {report['bytes']} {bytes_label}")
+        print(f"Gộp {report['merged']} node ngữ cảnh")
+        for reason, count in sorted(report['evicted'].items()):
+            print(f"  {reason}: {count}")
+        return 0
+
+    return 1
@@ -0,0 +1,117 @@
+"""
+NLP Admin - Các lệnh quản lý backend xử lý ngôn ngữ tự nhiên từ dòng lệnh
+"""
+
+import os
+import json
+import logging
+from typing import List
+
+import config
+from utils.nlp_pipeline import BACKENDS, download_nltk_data, import_optional, measure_backends
+from utils.nlp_utils import benchmark_keyword_backends
+
+logger = logging.getLogger("NLPAdmin")
+
+def add_nlp_parser(subparsers):
+    """
+    Đăng ký nhóm lệnh 'nlp' vào argparse
+
+    Args:
+        subparsers: Đối tượng trả về từ ArgumentParser.add_subparsers()
+    """
+    nlp_parser = subparsers.add_parser('nlp', help='Các lệnh quản lý backend NLP (spaCy, NLTK, regex)')
+    nlp_commands = nlp_parser.add_subparsers(dest='nlp_command', required=True)
+
+    report_parser = nlp_commands.add_parser('report', help='Đo chi phí import và nạp mô hình của từng backend')
+    report_parser.add_argument('--model', action='append', dest='models',
+                               help="Mô hình spaCy cần thử (mặc định NLP_CONFIG['spacy_models'], lặp lại được)")
+
+    bench_parser = nlp_commands.add_parser('bench', help='So sánh tốc độ trích xuất từ khóa của các backend trên trang web đã thu thập')
+    bench_parser.add_argument('files', nargs='*',
+                              help='File văn bản hoặc file đệm web JSON (mặc định data/cache/web_content/web_cache.json)')
+    bench_parser.add_argument('--repeat', type=int, default=10, help='Số lần đo mỗi backend')
+    bench_parser.add_argument('--max-keywords', type=int, default=20, help='Số từ khóa tối đa mỗi trang')
+
+    download_parser = nlp_commands.add_parser('download', help='Tải dữ liệu NLTK (và mô hình spaCy nếu chỉ định)')
+    download_parser.add_argument('--spacy-model', action='append', dest='spacy_models',
+                                 help='Mô hình spaCy cần tải (lặp lại được)')
+
+def _format_ms(value) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+def _load_pages(paths: List[str]) -> List[str]:
+    """Đọc nội dung trang: file đệm web JSON ({'entries': {url: {title, content}}}) hoặc file văn bản"""
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            if not path.endswith('.json'):
+                pages.append(f.read())
+                continue
+            entries = json.load(f).get('entries', {})
+        pages.extend(f"{entry.get('title', '')} {entry.get('content', '')}" for entry in entries.values())
+    return pages
+
+def run_nlp_command(args):
+    """
+    Thực thi lệnh 'nlp'
+
+    Args:
+        args: Kết quả phân tích tham số dòng lệnh
+
+    Returns:
+        int: Mã thoát (0 nếu thành công)
+    """
+    if args.nlp_command == 'report':
+        results = measure_backends(args.models)
+        choice = config.NLP_CONFIG.get('backend', 'auto')
+        print(f"Backend cấu hình: {choice}")
+        print(f"{'Backend':<12} {'Dùng được':>10} {'Import (ms)':>12} {'Nạp (ms)':>10}  Chi tiết")
+        for name, result in results.items():
+            label = name if name in BACKENDS else f"({name})"
+            print(f"{label:<12} {'có' if result['available'] else 'không':>10} {_format_ms(result['import_ms']):>12} "
+                  f"{_format_ms(result['load_ms']):>10}  {result['detail']}")
+        return 0
+
+    if args.nlp_command == 'bench':
+        paths = args.files or [os.path.join(config.CACHE_DIR, "web_content", "web_cache.json")]
+        pages = _load_pages(paths)
+        if not pages:
+            print("Không có trang nào để đo")
+            return 1
+        size_kb = sum(len(page.encode('utf-8')) for page in pages) / 1024
+        print(f"{len(pages)} trang, {size_kb:.1f} KB, {args.max_keywords} từ khóa mỗi trang")
+        print(f"{'Backend':<8} {'Trang/s':>10} {'KB/s':>10}  Từ khóa trang đầu")
+        for name, result in benchmark_keyword_backends(pages, args.max_keywords, args.repeat).items():
+            if result['seconds'] is None:
+                print(f"{name:<8} {'-':>10} {'-':>10}  {'chưa cài' if not result['available'] else ''}")
+                continue
+            print(f"{name:<8} {result['docs_per_second']:>10.0f} {result['kb_per_second']:>10.0f}  "
+                  f"{', '.join(result['sample'][:8])}")
+        return 0
+
+    if args.nlp_command == 'download':
+        status = 0
+        try:
+            for name, ok in download_nltk_data().items():
+                print(f"NLTK {name}: {'đã tải' if ok else 'lỗi'}")
+        except RuntimeError as e:
+            print(f"Bỏ qua NLTK: {e}")
+            status = 1
+
+        if args.spacy_models:
+            spacy = import_optional('spacy')
+            if spacy is None:
+                print("Bỏ qua mô hình spaCy: chưa cài spacy")
+                return 1
+            from spacy.cli import download as spacy_download
+            for name in args.spacy_models:
+                try:
+                    spacy_download(name)
+                    print(f"spaCy {name}: đã tải")
+                except SystemExit:
+                    print(f"spaCy {name}: lỗi")
+                    status = 1
+        return status
+
+    return 1
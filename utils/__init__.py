@@ -2,12 +2,12 @@
 Utils package - Các tiện ích hỗ trợ cho hệ thống AGI
 """
 
-from utils.nlp_utils import extract_keywords, clean_text, text_similarity
+from utils.nlp_utils import extract_keywords, extract_keywords_many, clean_text, text_similarity
 from utils.graph_utils import create_node_id, get_subgraph
 from utils.validators import validate_entity, validate_relation, is_valid_url
 
 __all__ = [
-    'extract_keywords', 'clean_text', 'text_similarity',
+    'extract_keywords', 'extract_keywords_many', 'clean_text', 'text_similarity',
     'create_node_id', 'get_subgraph',
     'validate_entity', 'validate_relation', 'is_valid_url'
 ]
\ No newline at end of file
@@ -0,0 +1,484 @@
+"""
+CSR Graph - Khung nhìn chỉ đọc của đồ thị với node ID dạng số nguyên và ma trận kề CSR
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import networkx as nx
+
+logger = logging.getLogger("CSRGraph")
+
+# Giá trị thuộc tính relation_type khi edge không có loại quan hệ
+UNKNOWN_RELATION = ""
+
+# Tên các mảng CSR của khung nhìn (xem arrays() và from_arrays())
+CSR_ARRAYS = ("out_indptr", "out_indices", "out_relations", "in_indptr", "in_indices", "in_relations")
+
+# Đánh dấu edge bị xóa trong with_changes()
+_REMOVED = object()
+
+class CSRGraph:
+    """
+    Khung nhìn đọc nhanh của đồ thị có hướng:
+    - Node ID (chuỗi) được ánh xạ sang số nguyên liên tiếp 0..n-1
+    - Danh sách kề lưu dạng CSR (indptr, indices) cho cả chiều ra và chiều vào
+    - Loại quan hệ của edge lưu dạng mã số nguyên nhỏ (int16)
+
+    Thuộc tính của node và edge vẫn nằm trong đồ thị NetworkX gốc; khung nhìn
+    chỉ chứa cấu trúc nên phải được dựng lại (hoặc vá bằng with_changes()) khi cấu trúc đồ thị thay đổi.
+    """
+
+    def __init__(self, node_ids: List[str], sources: np.ndarray, targets: np.ndarray,
+                 relations: np.ndarray, relation_names: List[str]):
+        """
+        Khởi tạo khung nhìn từ danh sách edge đã được đánh số
+
+        Args:
+            node_ids: Danh sách node ID, vị trí là số nguyên của node
+            sources: Số nguyên của node nguồn mỗi edge
+            targets: Số nguyên của node đích mỗi edge
+            relations: Mã loại quan hệ của mỗi edge
+            relation_names: Tên loại quan hệ theo mã
+        """
+        self.node_ids = node_ids
+        self.index: Dict[str, int] = {node_id: i for i, node_id in enumerate(node_ids)}
+        self.relation_names = relation_names
+        self.relation_codes: Dict[str, int] = {name: code for code, name in enumerate(relation_names)}
+
+        n = len(node_ids)
+        self.out_indptr, self.out_indices, self.out_relations = self._build_csr(n, sources, targets, relations)
+        self.in_indptr, self.in_indices, self.in_relations = self._build_csr(n, targets, sources, relations)
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph) -> "CSRGraph":
+        """
+        Dựng khung nhìn CSR từ đồ thị NetworkX
+
+        Args:
+            graph: Đồ thị nguồn
+
+        Returns:
+            CSRGraph: Khung nhìn chỉ đọc
+        """
+        node_ids = list(graph.nodes)
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        relation_codes: Dict[str, int] = {}
+
+        m = graph.number_of_edges()
+        sources = np.empty(m, dtype=np.int32)
+        targets = np.empty(m, dtype=np.int32)
+        relations = np.empty(m, dtype=np.int16)
+        for k, (u, v, relation) in enumerate(graph.edges(data="relation_type", default=UNKNOWN_RELATION)):
+            sources[k] = index[u]
+            targets[k] = index[v]
+            relations[k] = relation_codes.setdefault(relation, len(relation_codes))
+
+        relation_names = [None] * len(relation_codes)
+        for name, code in relation_codes.items():
+            relation_names[code] = name
+
+        view = cls(node_ids, sources, targets, relations, relation_names)
+        logger.debug(f"Đã dựng khung nhìn CSR với {len(node_ids)} nodes, {m} edges, "
+                     f"{len(relation_names)} loại quan hệ")
+        return view
+
+    @classmethod
+    def from_arrays(cls, node_ids, index, relation_names: List[str], arrays: Dict[str, np.ndarray]) -> "CSRGraph":
+        """
+        Dựng khung nhìn từ các mảng CSR có sẵn mà không sao chép (ví dụ mảng ánh xạ từ file bằng mmap)
+
+        Args:
+            node_ids: Dãy node ID theo số nguyên (hỗ trợ len() và truy cập theo vị trí)
+            index: Ánh xạ node ID -> số nguyên (hỗ trợ in, [] và get())
+            relation_names: Tên loại quan hệ theo mã
+            arrays: Các mảng theo tên trong CSR_ARRAYS, như arrays() trả về
+
+        Returns:
+            CSRGraph: Khung nhìn chỉ đọc
+        """
+        view = cls.__new__(cls)
+        view.node_ids = node_ids
+        view.index = index
+        view.relation_names = list(relation_names)
+        view.relation_codes = {name: code for code, name in enumerate(view.relation_names)}
+        for name in CSR_ARRAYS:
+            setattr(view, name, arrays[name])
+        return view
+
+    def with_changes(self, changes: List[Tuple]) -> "CSRGraph":
+        """
+        Khung nhìn mới sau khi áp dụng lần lượt các thay đổi cấu trúc, không duyệt lại đồ thị:
+        các mảng CSR được vá bằng phép toán vector nên chi phí là O(số edge) trong numpy
+        thay vì một vòng lặp Python qua mọi edge như from_networkx(). Khung nhìn này không đổi.
+
+        Thứ tự node giống NetworkX: node mới (kể cả node bị xóa rồi thêm lại) nằm cuối.
+
+        Args:
+            changes: Các thay đổi ('add_node', id), ('remove_node', id),
+                ('add_edge', u, v, relation_type) hoặc ('remove_edge', u, v);
+                relation_type là giá trị thuộc tính của edge (UNKNOWN_RELATION nếu không có)
+
+        Returns:
+            CSRGraph: Khung nhìn đã vá
+        """
+        index = self.index
+        added_nodes: Dict[str, None] = {}
+        removed_nodes = set()
+        # (u, v) -> loại quan hệ sau cùng, hoặc _REMOVED nếu edge bị xóa
+        edges: Dict[Tuple[str, str], object] = {}
+
+        def add_node(node):
+            if node not in added_nodes and (node not in index or node in removed_nodes):
+                added_nodes[node] = None
+
+        for change in changes:
+            op = change[0]
+            if op == "add_node":
+                add_node(change[1])
+            elif op == "remove_node":
+                node = change[1]
+                if node in added_nodes:
+                    del added_nodes[node]
+                elif node in index:
+                    removed_nodes.add(node)
+                for key in [key for key in edges if node in key]:
+                    edges[key] = _REMOVED
+            elif op == "add_edge":
+                _, u, v, relation = change
+                # NetworkX tự thêm node chưa có khi thêm edge
+                add_node(u)
+                add_node(v)
+                edges[(u, v)] = relation
+            elif op == "remove_edge":
+                edges[(change[1], change[2])] = _REMOVED
+            else:
+                raise ValueError(f"Thay đổi không hợp lệ: {op}")
+
+        # Số nguyên mới của các node cũ (-1 nếu bị xóa), giữ nguyên thứ tự
+        n_old = len(self.node_ids)
+        remap = None
+        if removed_nodes:
+            kept = np.ones(n_old, dtype=bool)
+            kept[[index[node] for node in removed_nodes]] = False
+            remap = np.cumsum(kept) - 1
+            remap[~kept] = -1
+            node_ids = [self.node_ids[i] for i in np.flatnonzero(kept).tolist()]
+            node_ids.extend(added_nodes)
+            new_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        else:
+            node_ids = list(self.node_ids)
+            node_ids.extend(added_nodes)
+            new_index = dict(index)
+            new_index.update((node_id, n_old + i) for i, node_id in enumerate(added_nodes))
+
+        relation_names = list(self.relation_names)
+        relation_codes = dict(self.relation_codes)
+        added_src, added_dst, added_rel = [], [], []
+        for (u, v), relation in edges.items():
+            if relation is _REMOVED:
+                continue
+            code = relation_codes.get(relation)
+            if code is None:
+                code = relation_codes[relation] = len(relation_names)
+                relation_names.append(relation)
+            added_src.append(new_index[u])
+            added_dst.append(new_index[v])
+            added_rel.append(code)
+        added_src = np.array(added_src, dtype=np.int64)
+        added_dst = np.array(added_dst, dtype=np.int64)
+        added_rel = np.array(added_rel, dtype=np.int64)
+
+        # Edge cũ bị sửa hoặc xóa (edge của node bị xóa được loại bằng remap)
+        touched = [(index[u], index[v]) for u, v in edges
+                   if u in index and v in index and u not in removed_nodes and v not in removed_nodes]
+
+        n, relation_count = len(node_ids), max(len(relation_names), 1)
+        arrays = {}
+        row_ids = {}
+        for direction, new_rows, new_cols in (("out", added_src, added_dst), ("in", added_dst, added_src)):
+            indptr, indices, relations = self._arrays(direction)
+            rows = self._row_ids(direction)
+            keep = np.ones(len(indices), dtype=bool)
+            for u, v in touched:
+                row, col = (u, v) if direction == "out" else (v, u)
+                start = int(indptr[row])
+                keep[start + np.flatnonzero(indices[start:indptr[row + 1]] == col)] = False
+            if remap is not None:
+                keep &= (remap[rows] >= 0) & (remap[indices] >= 0)
+            rows, cols, rels = rows[keep], indices[keep].astype(np.int64), relations[keep].astype(np.int64)
+            if remap is not None:
+                rows, cols = remap[rows], remap[cols]
+
+            # Edge còn lại vẫn được sắp theo (hàng, quan hệ, cột); chèn edge mới vào đúng vị trí
+            # bằng khóa số nguyên thay vì sắp xếp lại toàn bộ
+            keys = (rows * relation_count + rels) * n + cols
+            new_keys = (new_rows * relation_count + added_rel) * n + new_cols
+            order = np.argsort(new_keys, kind="stable")
+            positions = np.searchsorted(keys, new_keys[order])
+            rows = np.insert(rows, positions, new_rows[order])
+            cols = np.insert(cols, positions, new_cols[order])
+            rels = np.insert(rels, positions, added_rel[order])
+
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+            arrays[f"{direction}_indptr"] = indptr
+            arrays[f"{direction}_indices"] = cols.astype(np.int32)
+            arrays[f"{direction}_relations"] = rels.astype(np.int16)
+            row_ids[direction] = rows
+
+        view = CSRGraph.from_arrays(node_ids, new_index, relation_names, arrays)
+        for direction, rows in row_ids.items():
+            setattr(view, f"_{direction}_rows", rows)
+        return view
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Các mảng CSR của khung nhìn theo tên trong CSR_ARRAYS"""
+        return {name: getattr(self, name) for name in CSR_ARRAYS}
+
+    @staticmethod
+    def _build_csr(n: int, rows: np.ndarray, cols: np.ndarray, relations: np.ndarray):
+        """Sắp xếp edge theo (hàng, quan hệ, cột) và dựng indptr"""
+        order = np.lexsort((cols, relations, rows))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return indptr, cols[order].astype(np.int32), relations[order].astype(np.int16)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node_id):
+        return node_id in self.index
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.out_indices)
+
+    def relation_code(self, relation_type: Optional[str]) -> Optional[int]:
+        """
+        Lấy mã số của loại quan hệ
+
+        Returns:
+            int/None: Mã quan hệ, -1 nếu loại quan hệ không có trong đồ thị, None nếu không lọc
+        """
+        if relation_type is None:
+            return None
+        return self.relation_codes.get(relation_type, -1)
+
+    def _arrays(self, direction: str):
+        if direction == "out":
+            return self.out_indptr, self.out_indices, self.out_relations
+        if direction == "in":
+            return self.in_indptr, self.in_indices, self.in_relations
+        raise ValueError(f"Hướng không hợp lệ: {direction}")
+
+    def expand(self, frontier: np.ndarray, relation: Optional[int] = None,
+               direction: str = "out", return_outgoing: bool = False) -> Tuple[np.ndarray, ...]:
+        """
+        Mở rộng một tập node sang các node kề bằng phép toán vector
+
+        Args:
+            frontier: Mảng số nguyên của các node cần mở rộng
+            relation: Mã quan hệ cần lọc (None: mọi quan hệ)
+            direction: 'out' (node kế tiếp), 'in' (node đứng trước) hoặc 'both'
+            return_outgoing: Trả thêm mảng bool cho biết mỗi bước đi theo edge
+                chiều ra (nguồn -> đích) hay chiều vào (edge thật là đích -> nguồn)
+
+        Returns:
+            tuple: (nguồn, đích) của các edge được duyệt, theo thứ tự frontier,
+                cùng mảng chiều ra nếu return_outgoing
+        """
+        if direction == "both":
+            out_hops = self.expand(frontier, relation, "out", return_outgoing)
+            in_hops = self.expand(frontier, relation, "in", return_outgoing)
+            return tuple(np.concatenate([a, b]) for a, b in zip(out_hops, in_hops))
+
+        indptr, indices, relations = self._arrays(direction)
+        frontier = np.asarray(frontier, dtype=np.int64)
+        starts = indptr[frontier]
+        lengths = indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return (empty, empty, np.empty(0, dtype=bool)) if return_outgoing else (empty, empty)
+
+        # Vị trí của mọi edge trong các hàng của frontier, không cần vòng lặp Python
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        sources = np.repeat(frontier, lengths)
+        targets = indices[offsets].astype(np.int64)
+
+        if relation is not None:
+            mask = relations[offsets] == relation
+            sources, targets = sources[mask], targets[mask]
+
+        if return_outgoing:
+            return sources, targets, np.full(len(targets), direction == "out")
+        return sources, targets
+
+    def neighbors(self, node: int, relation: Optional[int] = None, direction: str = "out") -> np.ndarray:
+        """
+        Các node kề của một node
+
+        Args:
+            node: Số nguyên của node
+            relation: Mã quan hệ cần lọc
+            direction: 'out', 'in' hoặc 'both'
+
+        Returns:
+            numpy.ndarray: Số nguyên của các node kề
+        """
+        return self.expand(np.array([node]), relation, direction)[1]
+
+    def bfs_edges(self, roots: List[int], max_depth: int, relation: Optional[int] = None,
+                  direction: str = "out", max_nodes: Optional[int] = None,
+                  return_outgoing: bool = False) -> List[Tuple[np.ndarray, ...]]:
+        """
+        Duyệt theo chiều rộng từng tầng (không đệ quy), mỗi node chỉ được phát hiện một lần
+
+        Args:
+            roots: Các node xuất phát
+            max_depth: Độ sâu tối đa
+            relation: Mã quan hệ cần lọc
+            direction: Hướng duyệt
+            max_nodes: Số node mới tối đa được phát hiện (None: không giới hạn).
+                Khi vượt ngân sách, tầng cuối bị cắt theo thứ tự phát hiện.
+            return_outgoing: Thêm vào mỗi tầng mảng bool cho biết node con được phát hiện
+                qua edge cha -> con (True) hay con -> cha (False), xem expand()
+
+        Returns:
+            list: Mỗi phần tử là (cha, con) của các node mới phát hiện ở một độ sâu,
+                cùng mảng chiều ra nếu return_outgoing
+        """
+        visited = np.zeros(len(self.node_ids), dtype=bool)
+        frontier = np.unique(np.asarray(roots, dtype=np.int64))
+        visited[frontier] = True
+
+        levels = []
+        budget = max_nodes
+        for _ in range(max_depth):
+            if len(frontier) == 0 or budget == 0:
+                break
+
+            hops = self.expand(frontier, relation, direction, return_outgoing)
+            targets = hops[1]
+            fresh = ~visited[targets]
+            hops = tuple(column[fresh] for column in hops)
+
+            # Giữ lần phát hiện đầu tiên của mỗi node
+            _, first = np.unique(hops[1], return_index=True)
+            first.sort()
+            hops = tuple(column[first] for column in hops)
+
+            if budget is not None:
+                hops = tuple(column[:budget] for column in hops)
+                budget -= len(hops[1])
+
+            targets = hops[1]
+            visited[targets] = True
+            levels.append(hops)
+            frontier = targets
+
+        return levels
+
+    def _row_ids(self, direction: str) -> np.ndarray:
+        """Số nguyên của node nguồn cho từng vị trí trong indices (dựng một lần, dùng lại)"""
+        attr = f"_{direction}_rows"
+        rows = getattr(self, attr, None)
+        if rows is None:
+            indptr = self._arrays(direction)[0]
+            rows = np.repeat(np.arange(len(self.node_ids), dtype=np.int64), np.diff(indptr))
+            setattr(self, attr, rows)
+        return rows
+
+    def relation_weight_vector(self, weights: Dict[str, float], default: float = 0.0) -> np.ndarray:
+        """
+        Chuyển trọng số theo tên quan hệ thành mảng theo mã quan hệ
+
+        Args:
+            weights: {loại quan hệ: trọng số}
+            default: Trọng số của loại quan hệ không có trong weights
+
+        Returns:
+            numpy.ndarray: Trọng số theo mã quan hệ
+        """
+        return np.array([weights.get(name, default) for name in self.relation_names], dtype=np.float64)
+
+    def spread(self, seeds: np.ndarray, values: np.ndarray, hops: int, relation_weights: np.ndarray,
+               decay: float = 0.5, direction: str = "both") -> np.ndarray:
+        """
+        Lan truyền kích hoạt (spreading activation) từ các node hạt giống.
+        Mỗi bước là một phép nhân ma trận thưa - vector trên mảng CSR:
+        kích hoạt đi qua edge được nhân với trọng số quan hệ và hệ số suy giảm.
+
+        Args:
+            seeds: Số nguyên của các node hạt giống
+            values: Kích hoạt ban đầu của từng hạt giống
+            hops: Số bước lan truyền
+            relation_weights: Trọng số theo mã quan hệ (xem relation_weight_vector)
+            decay: Hệ số suy giảm mỗi bước
+            direction: 'out' (theo chiều edge), 'in' (ngược chiều) hoặc 'both'
+
+        Returns:
+            numpy.ndarray: Tổng kích hoạt của mọi node
+        """
+        n = len(self.node_ids)
+        activation = np.zeros(n, dtype=np.float64)
+        np.add.at(activation, np.asarray(seeds, dtype=np.int64), values)
+
+        directions = ("out", "in") if direction == "both" else (direction,)
+        wave = activation.copy()
+        for _ in range(hops):
+            spread = np.zeros(n, dtype=np.float64)
+            for d in directions:
+                _, indices, relations = self._arrays(d)
+                contribution = wave[self._row_ids(d)] * relation_weights[relations]
+                spread += np.bincount(indices, weights=contribution, minlength=n)
+            wave = decay * spread
+            if not wave.any():
+                break
+            activation += wave
+
+        return activation
+
+    def simple_paths(self, start: int, end: int, max_length: int) -> List[List[int]]:
+        """
+        Tìm mọi đường đi đơn từ start đến end có tối đa max_length edge (không đệ quy)
+
+        Args:
+            start: Node bắt đầu
+            end: Node kết thúc
+            max_length: Số edge tối đa
+
+        Returns:
+            list: Các đường đi, mỗi đường đi là list số nguyên node
+        """
+        if max_length < 1:
+            return []
+
+        indptr, indices = self.out_indptr, self.out_indices
+        paths = []
+        path = [start]
+        on_path = {start}
+        stack = [iter(indices[indptr[start]:indptr[start + 1]].tolist())]
+
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+
+            if child in on_path:
+                continue
+
+            if child == end:
+                paths.append(path + [end])
+                continue
+
+            if len(path) < max_length:
+                path.append(child)
+                on_path.add(child)
+                stack.append(iter(indices[indptr[child]:indptr[child + 1]].tolist()))
+
+        return paths
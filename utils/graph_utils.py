@@ -7,6 +7,8 @@ import logging
 import networkx as nx
 from typing import Dict, List, Tuple, Set, Any, Optional
 
+from utils.csr_graph import CSRGraph
+
 logger = logging.getLogger("GraphUtils")
 
 def create_node_id(name: str, type_name: str = "entity") -> str:
@@ -35,18 +37,30 @@ def create_node_id(name: str, type_name: str = "entity") -> str:
     
     return node_id
 
-def get_subgraph(graph: nx.DiGraph, node_ids: List[str], max_depth: int = 1) -> nx.DiGraph:
+def get_subgraph(graph: nx.DiGraph, node_ids: List[str], max_depth: int = 1,
+                 view: Optional[CSRGraph] = None, direction: str = "both",
+                 relation_type: Optional[str] = None, max_nodes: Optional[int] = None) -> nx.DiGraph:
     """
     Lấy đồ thị con bắt đầu từ các node cho trước
     
     Args:
-        graph: Đồ thị gốc
+        graph: Đồ thị gốc, hoặc knowledge base (dùng khung nhìn CSR được giữ và vá của nó;
+            khi đó max_nodes=None lấy giới hạn KB_CONFIG['traversal_max_nodes'])
         node_ids: Danh sách ID của các node gốc
         max_depth: Độ sâu tối đa tìm kiếm
+        view: Khung nhìn CSR của graph (tạo mới nếu không truyền vào)
+        direction: Hướng duyệt: 'out', 'in' hoặc 'both'
+        relation_type: Chỉ duyệt qua các edge có loại quan hệ này (None: mọi quan hệ)
+        max_nodes: Số node tối đa được thêm ngoài các node gốc (None: không giới hạn)
     
     Returns:
-        nx.DiGraph: Đồ thị con
+        nx.DiGraph: Khung nhìn chỉ đọc của đồ thị con (không sao chép dữ liệu);
+            gọi .copy() nếu cần sửa hoặc giữ lâu dài
     """
+    if view is None and hasattr(graph, "csr_view"):
+        return graph.get_subgraph(node_ids, max_depth, direction=direction,
+                                  relation_type=relation_type, max_nodes=max_nodes)
+    
     if not graph or not node_ids:
         return nx.DiGraph()
     
@@ -57,54 +71,47 @@ def get_subgraph(graph: nx.DiGraph, node_ids: List[str], max_depth: int = 1) ->
         logger.warning("Không có node nào hợp lệ trong danh sách")
         return nx.DiGraph()
     
-    # Lấy tất cả các node trong phạm vi độ sâu cho trước
-    nodes_to_include = set(valid_nodes)
-    
-    def explore_neighbors(node_id: str, depth: int = 0):
-        """Tìm tất cả các node láng giềng theo độ sâu"""
-        if depth >= max_depth:
-            return
-        
-        # Lấy tất cả các node kết nối trực tiếp
-        neighbors = set(graph.successors(node_id)).union(set(graph.predecessors(node_id)))
-        
-        # Thêm vào danh sách các node cần bao gồm
-        new_neighbors = neighbors - nodes_to_include
-        nodes_to_include.update(new_neighbors)
-        
-        # Tiếp tục tìm với độ sâu tiếp theo
-        for neighbor in new_neighbors:
-            explore_neighbors(neighbor, depth + 1)
+    if view is None:
+        view = CSRGraph.from_networkx(graph)
     
-    # Bắt đầu tìm từ các node gốc
-    for node_id in valid_nodes:
-        explore_neighbors(node_id)
+    relation = view.relation_code(relation_type)
     
-    # Tạo đồ thị con với các node đã tìm được
-    subgraph = graph.subgraph(nodes_to_include).copy()
+    # Duyệt theo chiều rộng từng tầng, mỗi node chỉ mở rộng một lần
+    roots = [view.index[node_id] for node_id in valid_nodes]
+    nodes_to_include = set(valid_nodes)
+    if relation != -1:
+        for _, targets in view.bfs_edges(roots, max_depth, relation, direction, max_nodes):
+            nodes_to_include.update(view.node_ids[i] for i in targets.tolist())
     
-    return subgraph
+    # Khung nhìn lọc trên đồ thị gốc thay vì sao chép node và edge
+    return graph.subgraph(nodes_to_include)
 
-def find_paths(graph: nx.DiGraph, start_node: str, end_node: str, max_length: int = 3) -> List[List[str]]:
+def find_paths(graph: nx.DiGraph, start_node: str, end_node: str, max_length: int = 3,
+               view: Optional[CSRGraph] = None) -> List[List[str]]:
     """
     Tìm các đường đi từ node bắt đầu đến node kết thúc
     
     Args:
-        graph: Đồ thị
+        graph: Đồ thị, hoặc knowledge base (dùng khung nhìn CSR được giữ và vá của nó)
         start_node: ID của node bắt đầu
         end_node: ID của node kết thúc
         max_length: Độ dài tối đa của đường đi
+        view: Khung nhìn CSR của graph (tạo mới nếu không truyền vào)
     
     Returns:
         list: Danh sách các đường đi (mỗi đường đi là một list các node ID)
     """
+    if view is None and hasattr(graph, "csr_view"):
+        return graph.find_paths(start_node, end_node, max_length)
+    
     if not graph or start_node not in graph.nodes or end_node not in graph.nodes:
         return []
     
-    # Sử dụng all_simple_paths của NetworkX với giới hạn độ dài
     try:
-        paths = list(nx.all_simple_paths(graph, start_node, end_node, cutoff=max_length))
-        return paths
+        if view is None:
+            view = CSRGraph.from_networkx(graph)
+        paths = view.simple_paths(view.index[start_node], view.index[end_node], max_length)
+        return [[view.node_ids[i] for i in path] for path in paths]
     except Exception as e:
         logger.error(f"Lỗi khi tìm đường đi: {e}")
         return []
@@ -0,0 +1,114 @@
+"""
+NLP Cache - Bộ nhớ đệm LRU cho kết quả trích xuất từ khóa
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import config
+
+class KeywordCache:
+    """
+    Bộ nhớ đệm LRU có giới hạn cho extract_keywords, dùng chung trong cả process.
+
+    Khóa là (băm nội dung văn bản, max_keywords) nên văn bản dài (trang web) không bị
+    giữ lại trong bộ nhớ đệm; giá trị là tuple để người gọi không sửa được mục đã lưu.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Khởi tạo bộ nhớ đệm
+
+        Args:
+            max_entries: Số mục tối đa (0 để tắt bộ nhớ đệm)
+        """
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[Hashable, Tuple[str, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(text: str, max_keywords: int) -> Hashable:
+        """
+        Khóa của một văn bản
+
+        Args:
+            text: Văn bản (đã chuẩn hóa)
+            max_keywords: Số lượng từ khóa tối đa
+
+        Returns:
+            tuple: (băm BLAKE2b 128 bit của văn bản, max_keywords)
+        """
+        digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        return digest, max_keywords
+
+    def get(self, key: Hashable) -> Optional[List[str]]:
+        """
+        Lấy từ khóa đã lưu
+
+        Args:
+            key: Khóa do key() tạo
+
+        Returns:
+            list/None: Bản sao danh sách từ khóa, None nếu chưa có
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry)
+
+    def put(self, key: Hashable, keywords: List[str]):
+        """
+        Lưu từ khóa
+
+        Args:
+            key: Khóa do key() tạo
+            keywords: Danh sách từ khóa
+        """
+        if not self.max_entries:
+            return
+
+        with self._lock:
+            self._entries[key] = tuple(keywords)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Xóa mọi mục và đặt lại thống kê"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Thống kê sử dụng bộ nhớ đệm
+
+        Returns:
+            dict: hits, misses, evictions, size, max_entries, hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+keyword_cache = KeywordCache(config.NLP_CONFIG.get('keyword_cache_size', 4096))
@@ -0,0 +1,392 @@
+"""
+NLP Pipeline - Nạp các backend NLP (spaCy, NLTK; 'vi' và 'regex' không cần thư viện) khi cần lần đầu và quản lý mô hình dùng chung
+
+Không có thư viện NLP nào được import khi import module này; NLTK không bao giờ tự tải
+dữ liệu trừ khi bật NLP_CONFIG['nltk_download'] hoặc chạy 'python main.py nlp download'.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import importlib
+import threading
+import subprocess
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import config
+
+logger = logging.getLogger("NLPPipeline")
+
+# Các backend theo thứ tự thử; 'regex' luôn là phương án cuối
+BACKENDS = ('spacy', 'nltk', 'vi', 'regex')
+# Backend được thử khi NLP_CONFIG['backend'] là 'auto' (word_tokenize của NLTK là bộ tách
+# từ tiếng Anh nên chỉ được dùng khi chọn rõ)
+AUTO_BACKENDS = ('spacy', 'vi')
+
+# Dữ liệu NLTK cần cho word_tokenize và stopwords (punkt_tab với NLTK >= 3.8.2)
+NLTK_RESOURCES = ('punkt', 'punkt_tab', 'stopwords')
+
+_import_lock = threading.Lock()
+# Tên module -> module đã import (None nếu không import được)
+_modules: Dict[str, object] = {}
+
+def backend_enabled(name: str) -> bool:
+    """
+    Backend có được phép dùng theo NLP_CONFIG['backend'] hay không
+
+    Args:
+        name: 'spacy', 'nltk', 'vi' hoặc 'regex'
+
+    Returns:
+        bool: True nếu backend là lựa chọn cấu hình (hoặc thuộc AUTO_BACKENDS khi cấu hình
+            là 'auto'); 'regex' luôn được phép
+    """
+    choice = config.NLP_CONFIG.get('backend', 'auto')
+    if name == 'regex':
+        return True
+    return name in AUTO_BACKENDS if choice == 'auto' else name == choice
+
+def import_optional(name: str):
+    """
+    Import một thư viện tùy chọn ở lần cần đầu tiên, ghi nhớ cả khi không import được
+
+    Args:
+        name: Tên module
+
+    Returns:
+        module/None: Module, None nếu chưa cài hoặc lỗi khi import
+    """
+    if name in _modules:
+        return _modules[name]
+
+    with _import_lock:
+        if name not in _modules:
+            start = time.perf_counter()
+            try:
+                _modules[name] = importlib.import_module(name)
+                logger.info(f"Đã import {name} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+            except ImportError:
+                _modules[name] = None
+            except Exception as e:
+                logger.warning(f"Lỗi khi import {name}: {e}")
+                _modules[name] = None
+    return _modules[name]
+
+class NLPPipeline:
+    """
+    Giữ mô hình spaCy đã tải cho cả process.
+
+    Mô hình được tải ở lần dùng đầu tiên (hoặc khi warmup), thử lần lượt các tên trong
+    NLP_CONFIG['spacy_models']. Kết quả - kể cả việc không tải được mô hình nào - được
+    ghi nhớ để các lần gọi sau không tải lại. Đối tượng Language của spaCy có thể dùng
+    đồng thời từ nhiều luồng để xử lý văn bản; chỉ bước tải cần khóa.
+    """
+
+    def __init__(self, model_names: Optional[List[str]] = None):
+        """
+        Khởi tạo pipeline (chưa tải mô hình)
+
+        Args:
+            model_names: Các mô hình cần thử theo thứ tự (mặc định NLP_CONFIG['spacy_models'])
+        """
+        self.model_names = list(model_names or config.NLP_CONFIG.get('spacy_models', []))
+        self.model_name = None
+        self._nlp = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Có mô hình spaCy dùng được hay không (tải mô hình nếu chưa tải)"""
+        return self.get() is not None
+
+    def get(self):
+        """
+        Lấy mô hình spaCy, tải ở lần gọi đầu tiên
+
+        Returns:
+            Language/None: Mô hình đã tải, None nếu chưa cài spaCy hoặc không tải được mô hình nào
+        """
+        if self._loaded:
+            return self._nlp
+
+        with self._lock:
+            if not self._loaded:
+                self._nlp = self._load()
+                self._loaded = True
+        return self._nlp
+
+    def _load(self):
+        spacy = import_optional('spacy')
+        if spacy is None:
+            return None
+
+        for name in self.model_names:
+            try:
+                nlp = spacy.load(name)
+                self.model_name = name
+                logger.info(f"Đã tải mô hình spaCy {name}")
+                return nlp
+            except Exception as e:
+                logger.debug(f"Không tải được mô hình spaCy {name}: {e}")
+
+        logger.warning(f"Không tải được mô hình spaCy nào trong {self.model_names}, dùng phương pháp đơn giản")
+        return None
+
+    def warmup(self) -> bool:
+        """
+        Tải mô hình và chạy thử một văn bản ngắn để lần xử lý đầu tiên không bị chậm
+
+        Returns:
+            bool: True nếu có mô hình spaCy sẵn sàng
+        """
+        nlp = self.get()
+        if nlp is None:
+            return False
+        nlp("khởi động")
+        return True
+
+    def pipe(self, texts: Iterable[str], batch_size: Optional[int] = None,
+             n_process: Optional[int] = None) -> Iterator:
+        """
+        Xử lý hàng loạt văn bản bằng nlp.pipe
+
+        Args:
+            texts: Các văn bản
+            batch_size: Số văn bản mỗi lô (mặc định NLP_CONFIG['pipe_batch_size'])
+            n_process: Số process (mặc định NLP_CONFIG['pipe_n_process'])
+
+        Returns:
+            iterator: Các Doc theo đúng thứ tự văn bản
+
+        Raises:
+            RuntimeError: Nếu không có mô hình spaCy
+        """
+        nlp = self.get()
+        if nlp is None:
+            raise RuntimeError("Không có mô hình spaCy")
+
+        settings = config.NLP_CONFIG
+        return nlp.pipe(texts,
+                        batch_size=batch_size or settings.get('pipe_batch_size', 64),
+                        n_process=n_process or settings.get('pipe_n_process', 1))
+
+class NLTKResources:
+    """
+    Bộ tách từ và danh sách stopwords của NLTK, nạp một lần cho cả process.
+
+    Dữ liệu NLTK còn thiếu chỉ được tải về khi bật NLP_CONFIG['nltk_download'];
+    nếu không, NLTK bị coi là không dùng được và trích xuất chuyển sang regex.
+    """
+
+    def __init__(self):
+        self.word_tokenize = None
+        self.stopwords = frozenset()
+        self._ready = False
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional["NLTKResources"]:
+        """
+        Lấy tài nguyên NLTK, nạp ở lần gọi đầu tiên
+
+        Returns:
+            NLTKResources/None: Chính đối tượng này, None nếu chưa cài NLTK hoặc thiếu dữ liệu
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._ready = self._load()
+                    self._loaded = True
+        return self if self._ready else None
+
+    def _load(self) -> bool:
+        nltk = import_optional('nltk')
+        if nltk is None:
+            return False
+
+        try:
+            return self._bind(nltk)
+        except LookupError:
+            if not config.NLP_CONFIG.get('nltk_download', False):
+                logger.warning("Thiếu dữ liệu NLTK (punkt/stopwords), dùng phương pháp đơn giản. "
+                               "Chạy 'python main.py nlp download' để tải")
+                return False
+
+        download_nltk_data()
+        try:
+            return self._bind(nltk)
+        except LookupError as e:
+            logger.warning(f"Không tải được dữ liệu NLTK: {e}")
+            return False
+
+    def _bind(self, nltk) -> bool:
+        """Nạp stopwords và chạy thử bộ tách từ (LookupError nếu thiếu dữ liệu)"""
+        from nltk.corpus import stopwords
+        from nltk.tokenize import word_tokenize
+
+        self.stopwords = frozenset(stopwords.words('english'))
+        word_tokenize("kiểm tra")
+        self.word_tokenize = word_tokenize
+        return True
+
+_pipeline = None
+_nltk_resources = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline() -> NLPPipeline:
+    """
+    Lấy pipeline spaCy dùng chung của process (không xét NLP_CONFIG['backend'], xem get_spacy)
+
+    Returns:
+        NLPPipeline: Pipeline dùng chung
+    """
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = NLPPipeline()
+    return _pipeline
+
+def get_spacy():
+    """
+    Lấy mô hình spaCy dùng chung nếu spaCy được chọn trong NLP_CONFIG['backend']
+
+    Returns:
+        Language/None: Mô hình, None nếu không được chọn hoặc không dùng được
+    """
+    return get_pipeline().get() if backend_enabled('spacy') else None
+
+def get_nltk() -> Optional[NLTKResources]:
+    """
+    Lấy tài nguyên NLTK dùng chung nếu NLTK được chọn trong NLP_CONFIG['backend']
+
+    Returns:
+        NLTKResources/None: Tài nguyên NLTK, None nếu không được chọn hoặc không dùng được
+    """
+    global _nltk_resources
+    if not backend_enabled('nltk'):
+        return None
+    if _nltk_resources is None:
+        with _pipeline_lock:
+            if _nltk_resources is None:
+                _nltk_resources = NLTKResources()
+    return _nltk_resources.get()
+
+def warmup_backends() -> List[str]:
+    """
+    Nạp trước các backend được chọn trong NLP_CONFIG['backend']
+
+    Returns:
+        list: Tên các backend sẵn sàng
+    """
+    ready = []
+    if backend_enabled('spacy') and get_pipeline().warmup():
+        ready.append('spacy')
+    if get_nltk() is not None:
+        ready.append('nltk')
+    if backend_enabled('vi'):
+        ready.append('vi')
+    ready.append('regex')
+    return ready
+
+def download_nltk_data() -> Dict[str, bool]:
+    """
+    Tải dữ liệu NLTK cần thiết (cần mạng, chỉ gọi khi được yêu cầu)
+
+    Returns:
+        dict: {tên tài nguyên: tải thành công}
+    """
+    nltk = import_optional('nltk')
+    if nltk is None:
+        raise RuntimeError("Chưa cài nltk")
+    return {name: bool(nltk.download(name, quiet=True)) for name in NLTK_RESOURCES}
+
+# Đo trong process con để kết quả không phụ thuộc vào module đã import trong process hiện tại
+_MEASURE_SCRIPTS = {
+    'spacy': """
+import json, time
+start = time.perf_counter()
+import spacy
+report = {"import_ms": (time.perf_counter() - start) * 1000}
+for name in MODELS:
+    start = time.perf_counter()
+    try:
+        spacy.load(name)
+    except Exception:
+        continue
+    report.update(load_ms=(time.perf_counter() - start) * 1000, detail=name)
+    break
+else:
+    report["detail"] = "không có mô hình " + ", ".join(MODELS)
+print(json.dumps(report))
+""",
+    'nltk': """
+import json, time
+start = time.perf_counter()
+import nltk
+report = {"import_ms": (time.perf_counter() - start) * 1000}
+start = time.perf_counter()
+try:
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize
+    stopwords.words("english")
+    word_tokenize("kiểm tra")
+    report.update(load_ms=(time.perf_counter() - start) * 1000, detail="punkt, stopwords")
+except LookupError:
+    report["detail"] = "thiếu dữ liệu (python main.py nlp download)"
+print(json.dumps(report))
+""",
+    'vi': """
+import json, time, importlib.util
+start = time.perf_counter()
+# Nạp trực tiếp file để không tính chi phí của utils/__init__
+spec = importlib.util.spec_from_file_location("vi_tokenizer", "utils/vi_tokenizer.py")
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps({"import_ms": (time.perf_counter() - start) * 1000, "load_ms": 0.0, "detail": "utils.vi_tokenizer"}))
+""",
+    'regex': """
+import json, time
+start = time.perf_counter()
+import re
+print(json.dumps({"import_ms": (time.perf_counter() - start) * 1000, "load_ms": 0.0, "detail": "re"}))
+""",
+    'nlp_utils': """
+import json, time
+start = time.perf_counter()
+import utils.nlp_utils
+print(json.dumps({"import_ms": (time.perf_counter() - start) * 1000, "load_ms": 0.0, "detail": "utils.nlp_utils"}))
+"""
+}
+
+def measure_backends(model_names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Đo chi phí của từng backend trong một process Python mới: thời gian import thư viện
+    và thời gian nạp mô hình/dữ liệu; kèm chi phí import chính utils.nlp_utils
+
+    Args:
+        model_names: Các mô hình spaCy cần thử (mặc định NLP_CONFIG['spacy_models'])
+
+    Returns:
+        dict: {backend: {'available', 'import_ms', 'load_ms', 'detail'}}
+    """
+    models = list(model_names or config.NLP_CONFIG.get('spacy_models', []))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for name, script in _MEASURE_SCRIPTS.items():
+        script = f"MODELS = {models!r}\n" + script
+        try:
+            completed = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True,
+                                       text=True, timeout=300)
+            report = json.loads(completed.stdout.strip().splitlines()[-1]) if completed.returncode == 0 else None
+        except (subprocess.SubprocessError, ValueError, IndexError):
+            report = None
+
+        if report is None:
+            results[name] = {"available": False, "import_ms": None, "load_ms": None, "detail": "chưa cài"}
+        else:
+            results[name] = {"available": report.get("load_ms") is not None, "import_ms": report["import_ms"],
+                             "load_ms": report.get("load_ms"), "detail": report.get("detail", "")}
+    return results
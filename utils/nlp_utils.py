@@ -3,35 +3,16 @@ NLP Utils - Công cụ xử lý ngôn ngữ tự nhiên
 """
 
 import re
+import time
 import logging
+import unicodedata
 from typing import List, Dict, Set, Tuple
 
-# Thư viện tùy chọn, sẽ được import khi cần
-spacy_available = False
-nltk_available = False
-
-try:
-    import nltk
-    from nltk.tokenize import word_tokenize
-    from nltk.corpus import stopwords
-    nltk_available = True
-    # Tải dữ liệu cần thiết
-    try:
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        nltk.download('punkt', quiet=True)
-    try:
-        nltk.data.find('corpora/stopwords')
-    except LookupError:
-        nltk.download('stopwords', quiet=True)
-except ImportError:
-    pass
-
-try:
-    import spacy
-    spacy_available = True
-except ImportError:
-    pass
+# Thư viện tùy chọn (spaCy, NLTK) được utils.nlp_pipeline import khi cần lần đầu,
+# theo backend chọn trong NLP_CONFIG['backend']
+from utils.nlp_pipeline import NLTKResources, backend_enabled, get_pipeline, get_spacy, get_nltk
+from utils.nlp_cache import keyword_cache
+from utils.vi_tokenizer import VietnameseTokenizer
 
 logger = logging.getLogger("NLPUtils")
 
@@ -58,6 +39,104 @@ VIETNAMESE_SYNONYMS = {
     "học": ["nghiên cứu", "tìm hiểu", "đọc", "tìm tòi"]
 }
 
+# Cụm nhiều âm tiết được giữ thành một từ khóa (backend 'vi')
+VIETNAMESE_PHRASES = {
+    "phép cộng", "phép trừ", "phép nhân", "phép chia", "phép tính", "bài toán", "số hạng",
+    "số bị trừ", "số trừ", "kết quả", "so sánh", "lớn hơn", "nhỏ hơn", "bé hơn", "bằng nhau",
+    "số thứ tự", "dãy số", "liền trước", "liền sau", "chữ số", "đơn vị", "hàng đơn vị",
+    "hàng chục", "hàng trăm", "đo lường", "độ dài", "cân nặng", "đồng hồ", "hình vuông",
+    "hình tròn", "tam giác", "hình tam giác", "hình chữ nhật", "hình dạng", "quy luật",
+    "phân số", "tử số", "mẫu số", "số tự nhiên", "số chẵn", "số lẻ"
+}
+
+def _doc_keywords(doc, max_keywords: int) -> List[str]:
+    """Lấy từ khóa từ một Doc spaCy đã xử lý"""
+    # Lấy các từ quan trọng (không phải stopword và là danh từ, động từ hoặc tính từ)
+    keywords = []
+    for token in doc:
+        if (not token.is_stop and token.pos_ in ["NOUN", "VERB", "ADJ"] and 
+            len(token.text) > 1 and token.text not in ALL_STOPWORDS):
+            keywords.append(token.text)
+    
+    # Lấy các cụm danh từ
+    chunks = [chunk.text for chunk in doc.noun_chunks if len(chunk.text) > 3]
+    
+    # Kết hợp các từ khóa và cụm, loại bỏ trùng lặp
+    all_keywords = list(set(keywords + chunks))
+    
+    # Trả về số lượng từ khóa tối đa
+    return all_keywords[:max_keywords]
+
+def _spacy_keywords(text: str, max_keywords: int):
+    """Trích xuất từ khóa bằng spaCy (None nếu không dùng được)"""
+    nlp = get_spacy()
+    if nlp is None:
+        return None
+    try:
+        return _doc_keywords(nlp(text), max_keywords)
+    except Exception as e:
+        logger.warning(f"Lỗi khi sử dụng SpaCy: {e}, chuyển sang phương pháp đơn giản")
+        return None
+
+def _nltk_keywords(text: str, max_keywords: int, nltk=None):
+    """Trích xuất từ khóa bằng NLTK (None nếu không dùng được)"""
+    nltk = nltk or get_nltk()
+    if nltk is None:
+        return None
+    try:
+        # Tokenize
+        words = nltk.word_tokenize(text)
+        
+        # Lọc stopwords (tiếng Anh của NLTK và tiếng Việt)
+        keywords = [word for word in words if word.isalnum() and word not in nltk.stopwords and
+                    word not in ALL_STOPWORDS and len(word) > 1]
+        
+        # Lấy các từ xuất hiện nhiều nhất
+        word_freq = {}
+        for word in keywords:
+            word_freq[word] = word_freq.get(word, 0) + 1
+        
+        # Sắp xếp theo tần suất
+        sorted_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+        
+        return [word for word, freq in sorted_keywords[:max_keywords]]
+        
+    except Exception as e:
+        logger.warning(f"Lỗi khi sử dụng NLTK: {e}, chuyển sang phương pháp đơn giản")
+        return None
+
+def _vi_keywords(text: str, max_keywords: int):
+    """Trích xuất từ khóa bằng bộ tách từ tiếng Việt (None nếu backend không được chọn)"""
+    if not backend_enabled('vi'):
+        return None
+    return _vi_tokenizer.keywords(text, max_keywords)
+
+def _regex_keywords(text: str, max_keywords: int) -> List[str]:
+    """Phương pháp đơn giản nếu không có thư viện NLP"""
+    # Tokenize đơn giản bằng dấu cách và dấu câu
+    words = re.findall(r'\b\w+\b', text)
+    
+    # Lọc stopwords
+    keywords = [word for word in words if word not in ALL_STOPWORDS and len(word) > 1]
+    
+    # Đếm tần suất
+    word_freq = {}
+    for word in keywords:
+        word_freq[word] = word_freq.get(word, 0) + 1
+    
+    # Sắp xếp theo tần suất
+    sorted_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+    
+    return [word for word, freq in sorted_keywords[:max_keywords]]
+
+# Các backend trích xuất từ khóa theo thứ tự thử (xem NLP_CONFIG['backend'])
+_KEYWORD_BACKENDS = (
+    ('spacy', _spacy_keywords),
+    ('nltk', _nltk_keywords),
+    ('vi', _vi_keywords),
+    ('regex', _regex_keywords)
+)
+
 def extract_keywords(text: str, max_keywords: int = 10) -> List[str]:
     """
     Trích xuất từ khóa quan trọng từ văn bản
@@ -75,76 +154,179 @@ def extract_keywords(text: str, max_keywords: int = 10) -> List[str]:
     # Chuyển text về chữ thường
     text = text.lower()
     
-    # Sử dụng SpaCy nếu có sẵn
-    if spacy_available:
-        try:
-            # Tải mô hình
-            try:
-                nlp = spacy.load("vi_core_news_sm")
-            except:
-                nlp = spacy.load("en_core_web_sm")
-            
-            # Xử lý văn bản
-            doc = nlp(text)
-            
-            # Lấy các từ quan trọng (không phải stopword và là danh từ, động từ hoặc tính từ)
-            keywords = []
-            for token in doc:
-                if (not token.is_stop and token.pos_ in ["NOUN", "VERB", "ADJ"] and 
-                    len(token.text) > 1 and token.text not in VIETNAMESE_STOPWORDS):
-                    keywords.append(token.text)
-            
-            # Lấy các cụm danh từ
-            chunks = [chunk.text for chunk in doc.noun_chunks if len(chunk.text) > 3]
-            
-            # Kết hợp các từ khóa và cụm, loại bỏ trùng lặp
-            all_keywords = list(set(keywords + chunks))
-            
-            # Trả về số lượng từ khóa tối đa
-            return all_keywords[:max_keywords]
-            
-        except Exception as e:
-            logger.warning(f"Lỗi khi sử dụng SpaCy: {e}, chuyển sang phương pháp đơn giản")
+    # Mỗi văn bản chỉ được trích xuất một lần cho cả process
+    key = keyword_cache.key(text, max_keywords)
+    keywords = keyword_cache.get(key)
+    if keywords is None:
+        keywords = _compute_keywords(text, max_keywords)
+        keyword_cache.put(key, keywords)
+    return keywords
+
+def _compute_keywords(text: str, max_keywords: int) -> List[str]:
+    """Trích xuất từ khóa từ văn bản đã chuyển về chữ thường (không qua bộ nhớ đệm)"""
+    # Backend đầu tiên được chọn và dùng được; regex luôn cho kết quả
+    for _, extract in _KEYWORD_BACKENDS:
+        keywords = extract(text, max_keywords)
+        if keywords is not None:
+            return keywords
+    return []
+
+def extract_keywords_many(texts: List[str], max_keywords: int = 10, batch_size: int = None,
+                          n_process: int = None) -> List[List[str]]:
+    """
+    Trích xuất từ khóa cho nhiều văn bản, xử lý theo lô bằng nlp.pipe khi có spaCy
     
-    # Sử dụng NLTK nếu có sẵn
-    if nltk_available:
+    Args:
+        texts: Các văn bản cần trích xuất
+        max_keywords: Số lượng từ khóa tối đa cho mỗi văn bản
+        batch_size: Số văn bản mỗi lô (mặc định NLP_CONFIG['pipe_batch_size'])
+        n_process: Số process (mặc định NLP_CONFIG['pipe_n_process'])
+    
+    Returns:
+        list: Danh sách từ khóa của từng văn bản, cùng thứ tự với texts
+    """
+    results = [[] for _ in texts]
+    
+    # Chỉ xử lý các văn bản chưa có trong bộ nhớ đệm (mỗi văn bản trùng lặp một lần)
+    pending: Dict[tuple, List[int]] = {}
+    lowered = {}
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        text = text.lower()
+        key = keyword_cache.key(text, max_keywords)
+        if key in pending:
+            pending[key].append(i)
+            continue
+        keywords = keyword_cache.get(key)
+        if keywords is None:
+            pending[key] = [i]
+            lowered[key] = text
+        else:
+            results[i] = keywords
+    if not pending:
+        return results
+    
+    computed = None
+    if get_spacy() is not None:
         try:
-            # Tokenize
-            words = word_tokenize(text)
-            
-            # Lọc stopwords
-            stop_words = set(stopwords.words('english')).union(VIETNAMESE_STOPWORDS)
-            keywords = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 1]
-            
-            # Lấy các từ xuất hiện nhiều nhất
-            word_freq = {}
-            for word in keywords:
-                word_freq[word] = word_freq.get(word, 0) + 1
-            
-            # Sắp xếp theo tần suất
-            sorted_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-            
-            return [word for word, freq in sorted_keywords[:max_keywords]]
-            
+            docs = get_pipeline().pipe(lowered.values(), batch_size=batch_size, n_process=n_process)
+            computed = [_doc_keywords(doc, max_keywords) for doc in docs]
         except Exception as e:
-            logger.warning(f"Lỗi khi sử dụng NLTK: {e}, chuyển sang phương pháp đơn giản")
-    
-    # Phương pháp đơn giản nếu không có thư viện NLP
-    # Tokenize đơn giản bằng dấu cách và dấu câu
-    words = re.findall(r'\b\w+\b', text)
-    
-    # Lọc stopwords
-    keywords = [word for word in words if word not in VIETNAMESE_STOPWORDS and len(word) > 1]
+            logger.warning(f"Lỗi khi xử lý theo lô với SpaCy: {e}, chuyển sang xử lý từng văn bản")
+    if computed is None:
+        computed = [_compute_keywords(text, max_keywords) for text in lowered.values()]
+    
+    for key, keywords in zip(lowered, computed):
+        keyword_cache.put(key, keywords)
+        for i in pending[key]:
+            results[i] = list(keywords)
+    return results
+
+def keyword_cache_stats() -> Dict[str, float]:
+    """
+    Thống kê bộ nhớ đệm từ khóa dùng chung
     
-    # Đếm tần suất
-    word_freq = {}
-    for word in keywords:
-        word_freq[word] = word_freq.get(word, 0) + 1
+    Returns:
+        dict: hits, misses, evictions, size, max_entries, hit_rate
+    """
+    return keyword_cache.stats()
+
+def benchmark_keyword_backends(texts: List[str], max_keywords: int = 20, repeat: int = 3) -> Dict[str, Dict]:
+    """
+    Đo tốc độ trích xuất từ khóa của từng backend trên cùng tập văn bản (không qua bộ nhớ đệm,
+    không phụ thuộc NLP_CONFIG['backend']); spaCy được đo theo lô bằng nlp.pipe
     
-    # Sắp xếp theo tần suất
-    sorted_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+    Args:
+        texts: Các văn bản (ví dụ nội dung các trang web đã thu thập)
+        max_keywords: Số lượng từ khóa tối đa mỗi văn bản
+        repeat: Số lần đo, lấy lần nhanh nhất
     
-    return [word for word, freq in sorted_keywords[:max_keywords]]
+    Returns:
+        dict: {backend: {'available', 'seconds', 'docs_per_second', 'kb_per_second', 'sample'}}
+    """
+    texts = [text.lower() for text in texts if text]
+    size_kb = sum(len(text.encode('utf-8')) for text in texts) / 1024
+    
+    runners = {}
+    if get_pipeline().get() is not None:
+        runners['spacy'] = lambda: [_doc_keywords(doc, max_keywords) for doc in get_pipeline().pipe(texts)]
+    nltk = NLTKResources().get()
+    if nltk is not None:
+        runners['nltk'] = lambda: [_nltk_keywords(text, max_keywords, nltk) for text in texts]
+    runners['vi'] = lambda: [_vi_tokenizer.keywords(text, max_keywords) for text in texts]
+    runners['regex'] = lambda: [_regex_keywords(text, max_keywords) for text in texts]
+    
+    results = {}
+    for name, _ in _KEYWORD_BACKENDS:
+        run = runners.get(name)
+        if run is None or not texts:
+            results[name] = {"available": run is not None, "seconds": None, "docs_per_second": None,
+                             "kb_per_second": None, "sample": []}
+            continue
+        best = float('inf')
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            keywords = run()
+            best = min(best, time.perf_counter() - start)
+        best = max(best, 1e-9)
+        results[name] = {"available": True, "seconds": best, "docs_per_second": len(texts) / best,
+                         "kb_per_second": size_kb / best, "sample": keywords[0]}
+    return results
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tách văn bản thành các token đã chuẩn hóa (chữ thường, bỏ dấu câu và dấu gạch dưới)
+
+    Args:
+        text: Văn bản cần tách
+
+    Returns:
+        list: Danh sách token theo thứ tự xuất hiện
+    """
+    if not text:
+        return []
+
+    text = str(text)
+    # Dấu thanh tổ hợp (dạng NFD, thường gặp khi sao chép từ web) không thuộc \w nên phải ghép lại trước
+    if not unicodedata.is_normalized("NFC", text):
+        text = unicodedata.normalize("NFC", text)
+    return re.findall(r'[^\W_]+', text.lower())
+
+def _build_fold_table() -> Dict[int, str]:
+    """Bảng str.translate bỏ dấu cho chữ Latin có dấu (gồm toàn bộ chữ tiếng Việt) và các dấu tổ hợp"""
+    table = {ord("đ"): "d", ord("Đ"): "D"}
+    for start, end in ((0x00C0, 0x024F), (0x1E00, 0x1EFF)):
+        for code in range(start, end + 1):
+            base = unicodedata.normalize("NFD", chr(code))[0]
+            if base != chr(code) and base.isascii():
+                table[code] = base
+    table.update((code, None) for code in range(0x0300, 0x0370))
+    return table
+
+_FOLD_TABLE = _build_fold_table()
+
+def fold_diacritics(text: str) -> str:
+    """
+    Bỏ dấu tiếng Việt ("phép cộng" -> "phep cong", "đếm" -> "dem"), không đổi chữ hoa/thường
+
+    Args:
+        text: Văn bản cần bỏ dấu (dạng NFC hoặc NFD đều được)
+
+    Returns:
+        str: Văn bản không dấu
+    """
+    if text.isascii():
+        return text
+    if not unicodedata.is_normalized("NFC", text):
+        text = unicodedata.normalize("NFC", text)
+    return text.translate(_FOLD_TABLE)
+
+# Stopword ở cả dạng có dấu lẫn không dấu: câu hỏi gõ không dấu ("phep cong la gi") bỏ được
+# "la" thay vì khớp với mọi chữ "là" qua dạng bỏ dấu trong chỉ mục
+ALL_STOPWORDS = frozenset(VIETNAMESE_STOPWORDS).union(fold_diacritics(word) for word in VIETNAMESE_STOPWORDS)
+
+_vi_tokenizer = VietnameseTokenizer(ALL_STOPWORDS, VIETNAMESE_PHRASES)
 
 def clean_text(text: str) -> str:
     """
@@ -213,15 +395,10 @@ def find_entities(text: str) -> List[Dict]:
     """
     entities = []
     
-    # Sử dụng SpaCy nếu có sẵn
-    if spacy_available:
+    # Sử dụng SpaCy nếu có mô hình (được tải một lần cho cả process)
+    nlp = get_spacy()
+    if nlp is not None:
         try:
-            # Tải mô hình
-            try:
-                nlp = spacy.load("vi_core_news_sm")
-            except:
-                nlp = spacy.load("en_core_web_sm")
-            
             # Xử lý văn bản
             doc = nlp(text)
             
@@ -246,7 +423,7 @@ def find_entities(text: str) -> List[Dict]:
     
     # Tìm các từ viết hoa (tiếng Anh) và các từ dài (tiếng Việt)
     capitalized_words = re.findall(r'\b[A-Z][a-z]+\b', text)
-    long_words = [word for word in re.findall(r'\b\w{4,}\b', text) if word not in VIETNAMESE_STOPWORDS]
+    long_words = [word for word in re.findall(r'\b\w{4,}\b', text) if word not in ALL_STOPWORDS]
     
     # Tạo các thực thể
     for word in set(capitalized_words + long_words):
@@ -0,0 +1,126 @@
+"""
+RW Lock - Khóa đọc/ghi: nhiều luồng đọc song song, luồng ghi được tuần tự hóa
+"""
+
+import threading
+from contextlib import contextmanager
+
+class RWLock:
+    """
+    Khóa đọc/ghi công bằng giữa hai phía:
+    - Nhiều luồng có thể giữ khóa đọc cùng lúc
+    - Chỉ một luồng giữ khóa ghi, khi đó không có luồng đọc nào
+    - Khi có luồng ghi đang chờ, luồng đọc mới phải chờ (tránh luồng ghi bị đói)
+    - Khi một luồng ghi xong, các luồng đọc đang chờ được vào trước luồng ghi
+      kế tiếp (tránh luồng đọc bị đói khi nhiều luồng ghi nối tiếp nhau)
+
+    Khóa ghi cho phép lồng nhau trong cùng một luồng, và luồng đang giữ khóa ghi
+    có thể đọc. Luồng đang giữ khóa đọc có thể đọc lồng nhau nhưng không thể
+    nâng lên khóa ghi.
+    """
+
+    def __init__(self):
+        """Khởi tạo khóa"""
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._waiting_readers = 0
+        # Số luồng đọc được vào trước luồng ghi kế tiếp
+        self._admitted_readers = 0
+        # Số lần giữ khóa đọc của từng luồng
+        self._local = threading.local()
+
+    def _read_depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    def acquire_read(self):
+        """Lấy khóa đọc"""
+        me = threading.get_ident()
+        if self._writer == me or self._read_depth():
+            # Đã giữ khóa ghi hoặc khóa đọc: không chờ để tránh tự khóa chết
+            if self._writer != me:
+                with self._cond:
+                    self._readers += 1
+            self._local.depth = self._read_depth() + 1
+            return
+
+        with self._cond:
+            self._waiting_readers += 1
+            try:
+                while self._writer is not None or (self._waiting_writers and not self._admitted_readers):
+                    self._cond.wait()
+            finally:
+                self._waiting_readers -= 1
+            if self._admitted_readers:
+                self._admitted_readers -= 1
+            self._readers += 1
+        self._local.depth = 1
+
+    def release_read(self):
+        """Trả khóa đọc"""
+        self._local.depth = self._read_depth() - 1
+        if self._writer == threading.get_ident():
+            return
+
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """
+        Lấy khóa ghi
+
+        Raises:
+            RuntimeError: Nếu luồng đang giữ khóa đọc
+        """
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            return
+
+        if self._read_depth():
+            raise RuntimeError("Không thể nâng khóa đọc lên khóa ghi")
+
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers or self._admitted_readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def is_writer(self) -> bool:
+        """Luồng hiện tại có đang giữ khóa ghi không"""
+        return self._writer == threading.get_ident()
+
+    def release_write(self):
+        """Trả khóa ghi"""
+        with self._cond:
+            self._write_depth -= 1
+            if self._write_depth == 0:
+                self._writer = None
+                self._admitted_readers = self._waiting_readers
+                self._cond.notify_all()
+
+    @contextmanager
+    def read_lock(self):
+        """Giữ khóa đọc trong khối with"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_lock(self):
+        """Giữ khóa ghi trong khối with"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
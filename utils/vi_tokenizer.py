@@ -0,0 +1,109 @@
+"""
+Vietnamese Tokenizer - Tách từ tiếng Việt nhanh, cho kết quả xác định (không cần thư viện NLP)
+"""
+
+import re
+import heapq
+import unicodedata
+from collections import Counter
+from operator import itemgetter
+from typing import Iterable, List
+
+class VietnameseTokenizer:
+    """
+    Tách văn bản tiếng Việt thành âm tiết rồi ghép các cụm nhiều âm tiết đã biết
+    ("hàng chục", "lớn hơn") thành một token, theo nguyên tắc khớp dài nhất.
+
+    Văn bản được chuẩn hóa Unicode NFC trước khi tách để chữ có dấu dựng sẵn và
+    chữ tổ hợp (nguyên âm + dấu thanh rời, thường gặp trong trang web) là một.
+    Cụm từ được khớp trước khi lọc stopword, nên cụm chứa stopword ("lớn hơn")
+    vẫn được giữ.
+    """
+
+    # Âm tiết: chuỗi chữ/số liên tiếp (không gồm dấu gạch dưới)
+    _SYLLABLE_PATTERN = r"[^\W_]+"
+    _SYLLABLE = re.compile(_SYLLABLE_PATTERN)
+
+    def __init__(self, stopwords: Iterable[str] = (), phrases: Iterable[str] = ()):
+        """
+        Khởi tạo bộ tách từ
+
+        Args:
+            stopwords: Các từ bị bỏ qua khi trích xuất từ khóa
+            phrases: Các cụm nhiều âm tiết được giữ thành một token
+        """
+        self.stopwords = frozenset(self.normalize(word) for word in stopwords)
+        phrases = (" ".join(self._SYLLABLE.findall(self.normalize(phrase))) for phrase in phrases)
+        self.phrases = frozenset(phrase for phrase in phrases if " " in phrase)
+
+        # Một mẫu duy nhất: các cụm (dạng trie theo ký tự, phải kết thúc ở ranh giới âm tiết)
+        # rồi đến âm tiết đơn; việc khớp chạy hoàn toàn trong re. findall chỉ thử khớp ở đầu
+        # âm tiết hoặc ở ký tự không phải chữ nên không cần lookbehind
+        phrase_pattern = f"{self._trie_pattern(self.phrases)}(?![^\\W_])|" if self.phrases else ""
+        self._token = re.compile(phrase_pattern + self._SYLLABLE_PATTERN)
+        # Cho trích xuất từ khóa: bỏ luôn âm tiết một ký tự ngay trong re
+        self._keyword_token = re.compile(phrase_pattern + r"[^\W_]{2,}")
+
+    @staticmethod
+    def _trie_pattern(phrases: Iterable[str]) -> str:
+        """
+        Biểu thức chính quy dạng trie cho các cụm: các cụm chung tiền tố dùng chung nhánh,
+        nên mỗi vị trí chỉ thử một nhánh theo ký tự đầu thay vì thử lần lượt mọi cụm;
+        phần tùy chọn là tham lam nên cụm dài nhất được ưu tiên
+        """
+        trie: dict = {}
+        for phrase in phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        def build(node: dict) -> str:
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+            return f"(?:{body})?" if "" in node else body
+
+        return build(trie)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Chuẩn hóa NFC, chuyển về chữ thường và gộp các khoảng trắng liên tiếp thành một dấu cách"""
+        if not unicodedata.is_normalized("NFC", text):
+            text = unicodedata.normalize("NFC", text)
+        return " ".join(text.lower().split())
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Tách văn bản thành token (âm tiết hoặc cụm đã biết) theo thứ tự xuất hiện
+
+        Args:
+            text: Văn bản cần tách
+
+        Returns:
+            list: Các token đã chuẩn hóa
+        """
+        if not text:
+            return []
+        return self._token.findall(self.normalize(text))
+
+    def keywords(self, text: str, max_keywords: int = 10) -> List[str]:
+        """
+        Các token xuất hiện nhiều nhất, bỏ stopword và token một ký tự
+
+        Args:
+            text: Văn bản cần trích xuất
+            max_keywords: Số lượng từ khóa tối đa
+
+        Returns:
+            list: Từ khóa giảm dần theo tần suất; cùng tần suất thì theo thứ tự xuất hiện
+        """
+        if not text:
+            return []
+
+        counts = Counter(self._keyword_token.findall(self.normalize(text)))
+        for stopword in self.stopwords.intersection(counts):
+            del counts[stopword]
+        # nlargest ổn định như sorted(..., reverse=True)[:n], không phải sắp xếp toàn bộ
+        return [token for token, _ in heapq.nlargest(max_keywords, counts.items(), key=itemgetter(1))]